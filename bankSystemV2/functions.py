@@ -1,24 +1,60 @@
+import sys
+from collections import deque
 from datetime import datetime, timedelta
 
+# `banco` é o pacote do V3 (bankSystemV2/banco aponta para bankSystemV3/banco): erros, valores em
+# centavos, numeração de contas e limitadores têm uma implementação só para as duas versões.
+from banco.erros import (LimiteSaqueExcedidoError, LimiteSaquesDiariosError, LimiteTransacoesDiariasError,
+                         SaldoInsuficienteError, ValorInvalidoError)
+from banco.moeda import converter_para_centavos, formatar_centavos
+from banco.numeracao import validar_agencia
 
-class SaldoInsuficienteError(Exception):
-    pass
 
+# Eventos de transação: (tipo, valor em centavos, data e hora). depositar e sacar não imprimem;
+# entregam o evento à saída ativa, que formata e escreve na hora (console), em lotes ou nunca (nula).
+_MENSAGENS = {'deposito': "Depósito de {} realizado com sucesso!", 'saque': "Saque de {} realizado com sucesso!"}
 
-class LimiteSaqueExcedidoError(Exception):
-    pass
 
+def mensagem_evento(tipo, valor_centavos):
+    return _MENSAGENS[tipo].format(formatar_centavos(valor_centavos))
 
-class LimiteSaquesDiariosError(Exception):
-    pass
 
+class SaidaConsole:
+    def emitir(self, tipo, valor_centavos, hora):
+        print(mensagem_evento(tipo, valor_centavos))
 
-class LimiteTransacoesDiariasError(Exception):
-    pass
 
+class SaidaNula:
+    def emitir(self, tipo, valor_centavos, hora):
+        pass
 
-class ValorInvalidoError(Exception):
-    pass
+
+class SaidaEmLote:
+    # Acumula eventos e escreve as mensagens de até `capacidade` deles numa única escrita.
+    def __init__(self, arquivo=None, capacidade=1024):
+        self.arquivo = arquivo
+        self.capacidade = capacidade
+        self.eventos = deque()
+
+    def emitir(self, tipo, valor_centavos, hora):
+        self.eventos.append((tipo, valor_centavos, hora))
+        if len(self.eventos) >= self.capacidade:
+            self.descarregar()
+
+    def descarregar(self):
+        retirar = self.eventos.popleft
+        eventos = [retirar() for _ in range(len(self.eventos))]
+        if eventos:
+            (self.arquivo or sys.stdout).write(''.join(f"{mensagem_evento(tipo, valor)}\n" for tipo, valor, _ in eventos))
+
+
+_saida = SaidaConsole()
+
+
+def definir_saida(saida):
+    global _saida
+    anterior, _saida = _saida, saida
+    return anterior
 
 
 def depositar(saldo_atual, extrato_movimentacoes, valor_deposito, transacoes_realizadas, fuso_horario, /):
@@ -29,8 +65,8 @@ def depositar(saldo_atual, extrato_movimentacoes, valor_deposito, transacoes_rea
 
     saldo_atual += valor_deposito
     hora_atual = datetime.now(fuso_horario)
-    extrato_movimentacoes.append(f"{hora_atual.strftime('%Y-%m-%d %H:%M:%S')} - Depósito: R$ {valor_deposito:.2f}")
-    print(f"Depósito de R$ {valor_deposito:.2f} realizado com sucesso!")
+    extrato_movimentacoes.append(f"{hora_atual.strftime('%Y-%m-%d %H:%M:%S')} - Depósito: {formatar_centavos(valor_deposito)}")
+    _saida.emitir('deposito', valor_deposito, hora_atual)
     transacoes_realizadas += 1
     return saldo_atual, extrato_movimentacoes, transacoes_realizadas, hora_atual
 
@@ -50,10 +86,10 @@ def sacar(*, saldo_atual, extrato_movimentacoes, valor_saque, limite_saque, saqu
 
     saldo_atual -= valor_saque
     hora_atual = datetime.now(fuso_horario)
-    extrato_movimentacoes.append(f"{hora_atual.strftime('%Y-%m-%d %H:%M:%S')} - Saque: R$ {valor_saque:.2f}")
+    extrato_movimentacoes.append(f"{hora_atual.strftime('%Y-%m-%d %H:%M:%S')} - Saque: {formatar_centavos(valor_saque)}")
     saques_realizados += 1
     transacoes_realizadas += 1
-    print(f"Saque de R$ {valor_saque:.2f} realizado com sucesso!")
+    _saida.emitir('saque', valor_saque, hora_atual)
     return saldo_atual, extrato_movimentacoes, saques_realizados, transacoes_realizadas, hora_atual
 
 
@@ -64,7 +100,7 @@ def mostrar_extrato(saldo_atual, *, extrato):
             print(movimentacao)
     else:
         print("Não foram realizadas movimentações.")
-    print(f"\nSaldo atual: R$ {saldo_atual:.2f}")
+    print(f"\nSaldo atual: {formatar_centavos(saldo_atual)}")
     print("==========================================")
 
 
@@ -104,12 +140,15 @@ def criar_usuario(usuarios):
         print("Estado inválido. Informe apenas as duas letras.")
 
     usuario = {'nome': nome, 'cpf': cpf, 'data_nascimento': data_nascimento,
-               'endereco': {'logradouro': logradouro, 'cep': cep, 'cidade': cidade, 'estado': estado}}
+               'endereco': {'logradouro': logradouro, 'cep': cep, 'cidade': cidade, 'estado': estado},
+               'contas': []}
     usuarios.append(usuario)
     print(f"Usuário {nome} criado com sucesso.")
 
 
-def criar_conta_corrente(contas, usuarios):
+def criar_conta_corrente(contas, usuarios, agencia='0001', alocador=None):
+    # Com `alocador` (numeracao.AlocadorNumeros) o número vem do bloco reservado pela thread;
+    # sem ele, segue o maior número já usado.
     if not usuarios:
         print("Nenhum usuário encontrado. Crie um usuário primeiro.")
         return
@@ -120,9 +159,18 @@ def criar_conta_corrente(contas, usuarios):
         print("Usuário não encontrado.")
         return
 
-    numero_conta = len(contas) + 1
-    conta = {'agencia': '0001', 'numero': numero_conta, 'usuario': usuario}
+    try:
+        if alocador is not None:
+            numero_conta = alocador.proximo(agencia)
+        else:
+            validar_agencia(agencia)
+            numero_conta = max((c['numero'] for c in contas), default=0) + 1
+    except ValueError as e:
+        print(e)
+        return
+    conta = {'agencia': agencia, 'numero': numero_conta, 'usuario': usuario}
     contas.append(conta)
+    usuario.setdefault('contas', []).append(conta)
     print(f"Conta corrente {numero_conta} criada para o usuário {usuario['nome']}.")
 
 
@@ -135,7 +183,10 @@ def identificar_usuario(usuarios):
 
 
 def listar_contas_usuario(usuario, contas):
-    contas_usuario = [c for c in contas if c['usuario'] == usuario]
+    if 'contas' in usuario:
+        contas_usuario = usuario['contas']
+    else:
+        contas_usuario = [c for c in contas if c['usuario'] == usuario]
     if len(contas_usuario) == 1:
         return contas_usuario[0]
     elif contas_usuario:
@@ -152,10 +203,24 @@ def listar_contas_usuario(usuario, contas):
         return None
 
 
-def verificar_limite_transacoes(hora_ultima_transacao, fuso_horario):
-    agora = datetime.now(fuso_horario)
-    proxima_meia_noite = (hora_ultima_transacao + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-    segundos_restantes = (proxima_meia_noite - agora).total_seconds()
-    horas_restantes = int(segundos_restantes // 3600)
-    minutos_restantes = int((segundos_restantes % 3600) // 60)
-    return max(0, horas_restantes), max(0, minutos_restantes)
+def para_microssegundos(data_hora):
+    return round(data_hora.timestamp() * 1_000_000)
+
+
+def fim_do_dia_no_fuso(fuso_horario):
+    # Fronteira do dia civil no fuso do banco, para LimitadorDiario(fim_do_dia=...).
+    def fim_do_dia(microssegundos):
+        amanha = datetime.fromtimestamp(microssegundos / 1_000_000, fuso_horario).date() + timedelta(days=1)
+        meia_noite = datetime(amanha.year, amanha.month, amanha.day)
+        if hasattr(fuso_horario, 'localize'):
+            meia_noite = fuso_horario.localize(meia_noite)
+        else:
+            meia_noite = meia_noite.replace(tzinfo=fuso_horario)
+        return para_microssegundos(meia_noite)
+    return fim_do_dia
+
+
+def tempo_restante(liberado_em, agora):
+    # (horas, minutos) entre dois instantes em microssegundos.
+    segundos = max(0, liberado_em - agora) // 1_000_000
+    return segundos // 3600, segundos % 3600 // 60
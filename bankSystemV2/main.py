@@ -1,14 +1,26 @@
+from datetime import datetime
+
 import pytz
 from functions import (depositar, sacar, mostrar_extrato, identificar_usuario,
                        SaldoInsuficienteError, LimiteSaqueExcedidoError,
                        LimiteSaquesDiariosError, ValorInvalidoError, LimiteTransacoesDiariasError,
-                       verificar_limite_transacoes, criar_usuario, criar_conta_corrente, listar_contas_usuario)
+                       criar_usuario, criar_conta_corrente, listar_contas_usuario, converter_para_centavos,
+                       fim_do_dia_no_fuso, para_microssegundos, tempo_restante)
+from banco.limitador import LimitadorDiario
+from banco.numeracao import AlocadorNumeros
 
 usuarios = []
 contas = []
 
 fuso_horario = pytz.timezone('America/Sao_Paulo')
 
+# As contas só existem em memória: não há números de uma execução anterior a preservar.
+alocador = AlocadorNumeros()
+
+# Limites diários por número de conta: valem entre sessões e zeram à meia-noite de São Paulo.
+limite_transacoes = LimitadorDiario(max_eventos=10, fim_do_dia=fim_do_dia_no_fuso(fuso_horario))
+limite_saques = LimitadorDiario(max_eventos=3, fim_do_dia=fim_do_dia_no_fuso(fuso_horario))
+
 
 def menu_principal():
     while True:
@@ -24,7 +36,8 @@ def menu_principal():
         if opcao == '1':
             criar_usuario(usuarios)
         elif opcao == '2':
-            criar_conta_corrente(contas, usuarios)
+            agencia = input("Informe a agência (Enter para 0001): ").strip() or '0001'
+            criar_conta_corrente(contas, usuarios, agencia, alocador)
         elif opcao == '3':
             usuario = login(usuarios)
             if usuario:
@@ -54,14 +67,10 @@ def login(usuarios):
 
 
 def menu_usuario(usuario, conta):
-    saldo_atual = 0.0
-    limite_saque = 500.0
+    saldo_atual = 0
+    limite_saque = 50_000
     extrato_movimentacoes = []
-    saques_realizados = 0
-    limite_saques_diarios = 3
-    transacoes_realizadas = 0
-    limite_transacoes_diarias = 10
-    hora_ultima_transacao = None
+    numero = conta['numero']
 
     menu = f"""
 Olá, {usuario['nome']}! Você está acessando a Conta: {conta['numero']}
@@ -77,48 +86,40 @@ Olá, {usuario['nome']}! Você está acessando a Conta: {conta['numero']}
 
         if opcao == 'd':
             try:
-                if transacoes_realizadas >= limite_transacoes_diarias:
-                    horas_restantes, minutos_restantes = verificar_limite_transacoes(hora_ultima_transacao,
-                                                                                     fuso_horario)
-                    if horas_restantes > 0 or minutos_restantes > 0:
-                        print(
-                            f"Limite de transações diárias atingido. Você poderá realizar transações novamente em {horas_restantes}h {minutos_restantes}min.")
-                        continue
-                    else:
-                        transacoes_realizadas = 0
-
-                valor_deposito = float(input("Informe o valor do depósito: "))
-                saldo_atual, extrato_movimentacoes, transacoes_realizadas, hora_ultima_transacao = depositar(
-                    saldo_atual, extrato_movimentacoes, valor_deposito, transacoes_realizadas, fuso_horario)
+                agora = para_microssegundos(datetime.now(fuso_horario))
+                if limite_transacoes.verificar(numero, agora):
+                    horas_restantes, minutos_restantes = tempo_restante(limite_transacoes.liberado_em(numero, agora), agora)
+                    print(
+                        f"Limite de transações diárias atingido. Você poderá realizar transações novamente em {horas_restantes}h {minutos_restantes}min.")
+                    continue
+
+                valor_deposito = converter_para_centavos(input("Informe o valor do depósito: "))
+                saldo_atual, extrato_movimentacoes, _, hora_transacao = depositar(
+                    saldo_atual, extrato_movimentacoes, valor_deposito, limite_transacoes.uso(numero, agora)[0],
+                    fuso_horario)
+                limite_transacoes.registrar(numero, para_microssegundos(hora_transacao))
             except ValorInvalidoError as e:
                 print(e)
 
         elif opcao == 's':
             try:
-                if transacoes_realizadas >= limite_transacoes_diarias:
-                    horas_restantes, minutos_restantes = verificar_limite_transacoes(hora_ultima_transacao,
-                                                                                     fuso_horario)
-                    if horas_restantes > 0 or minutos_restantes > 0:
-                        print(
-                            f"Limite de transações diárias atingido. Você poderá sacar novamente em {horas_restantes}h {minutos_restantes}min.")
-                        continue
-                    else:
-                        transacoes_realizadas = 0
-
-                if saques_realizados >= limite_saques_diarios:
-                    horas_restantes, minutos_restantes = verificar_limite_transacoes(hora_ultima_transacao,
-                                                                                     fuso_horario)
-                    if horas_restantes > 0 or minutos_restantes > 0:
+                agora = para_microssegundos(datetime.now(fuso_horario))
+                for limitador, descricao in ((limite_transacoes, 'transações diárias'), (limite_saques, 'saques diários')):
+                    if limitador.verificar(numero, agora):
+                        horas_restantes, minutos_restantes = tempo_restante(limitador.liberado_em(numero, agora), agora)
                         print(
-                            f"Limite de saques diários atingido. Você poderá sacar novamente em {horas_restantes}h {minutos_restantes}min.")
-                        continue
-
-                valor_saque = float(input("Informe o valor do saque: "))
-                saldo_atual, extrato_movimentacoes, saques_realizados, transacoes_realizadas, hora_ultima_transacao = sacar(
-                    saldo_atual=saldo_atual, extrato_movimentacoes=extrato_movimentacoes, valor_saque=valor_saque,
-                    limite_saque=limite_saque, saques_realizados=saques_realizados,
-                    limite_saques_diarios=limite_saques_diarios, transacoes_realizadas=transacoes_realizadas,
-                    fuso_horario=fuso_horario)
+                            f"Limite de {descricao} atingido. Você poderá sacar novamente em {horas_restantes}h {minutos_restantes}min.")
+                        break
+                else:
+                    valor_saque = converter_para_centavos(input("Informe o valor do saque: "))
+                    saldo_atual, extrato_movimentacoes, _, _, hora_transacao = sacar(
+                        saldo_atual=saldo_atual, extrato_movimentacoes=extrato_movimentacoes, valor_saque=valor_saque,
+                        limite_saque=limite_saque, saques_realizados=limite_saques.uso(numero, agora)[0],
+                        limite_saques_diarios=limite_saques.max_eventos,
+                        transacoes_realizadas=limite_transacoes.uso(numero, agora)[0], fuso_horario=fuso_horario)
+                    instante = para_microssegundos(hora_transacao)
+                    limite_saques.registrar(numero, instante)
+                    limite_transacoes.registrar(numero, instante)
             except (SaldoInsuficienteError, LimiteSaqueExcedidoError, LimiteSaquesDiariosError, ValorInvalidoError,
                     LimiteTransacoesDiariasError) as e:
                 print(e)
@@ -1,10 +1,15 @@
+import io
 import unittest
 from unittest.mock import patch
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from functions import (
     criar_usuario, criar_conta_corrente, depositar, sacar,
-    SaldoInsuficienteError, verificar_limite_transacoes
+    SaldoInsuficienteError, ValorInvalidoError, listar_contas_usuario,
+    converter_para_centavos, formatar_centavos, definir_saida, SaidaEmLote, SaidaNula, fim_do_dia_no_fuso,
+    para_microssegundos
 )
+from banco.limitador import EXCEDE_EVENTOS, LIVRE, LimitadorDiario, LimitadorMovel
+from banco.numeracao import AlocadorNumeros
 
 
 class TestBankSystem(unittest.TestCase):
@@ -13,7 +18,7 @@ class TestBankSystem(unittest.TestCase):
         # Configuração inicial para cada teste
         self.usuarios = []
         self.contas = []
-        self.saldo_atual = 1000.0
+        self.saldo_atual = 100_000
         self.extrato_movimentacoes = []
         self.transacoes_realizadas = 0
         self.saques_realizados = 0
@@ -40,37 +45,101 @@ class TestBankSystem(unittest.TestCase):
         self.assertEqual(self.contas[0]['usuario']['cpf'], '12345678901')
         self.assertEqual(self.contas[0]['numero'], 1)
 
+    @patch('builtins.input', side_effect=['12345678901', '98765432100', '12345678901', '2'])
+    def test_listar_contas_usuario_usa_indice_do_titular(self, _):
+        joao = {'nome': 'João Silva', 'cpf': '12345678901', 'contas': []}
+        maria = {'nome': 'Maria Souza', 'cpf': '98765432100', 'contas': []}
+        self.usuarios.extend([joao, maria])
+        for _ in range(3):
+            criar_conta_corrente(self.contas, self.usuarios)
+        self.assertEqual([c['numero'] for c in joao['contas']], [1, 3])
+        self.assertEqual([c['numero'] for c in maria['contas']], [2])
+        self.assertIs(listar_contas_usuario(joao, self.contas), self.contas[2])
+
     def test_depositar(self):
-        valor_deposito = 500.0
+        valor_deposito = 50_000
         self.saldo_atual, self.extrato_movimentacoes, self.transacoes_realizadas, _ = depositar(
             self.saldo_atual, self.extrato_movimentacoes, valor_deposito, self.transacoes_realizadas, self.fuso_horario)
-        self.assertEqual(self.saldo_atual, 1500.0)
+        self.assertEqual(self.saldo_atual, 150_000)
         self.assertEqual(len(self.extrato_movimentacoes), 1)
         self.assertIn("Depósito: R$ 500.00", self.extrato_movimentacoes[0])
 
     def test_sacar(self):
-        valor_saque = 200.0
+        valor_saque = 20_000
         self.saldo_atual, self.extrato_movimentacoes, self.saques_realizados, self.transacoes_realizadas, _ = sacar(
             saldo_atual=self.saldo_atual, extrato_movimentacoes=self.extrato_movimentacoes, valor_saque=valor_saque,
-            limite_saque=500.0, saques_realizados=self.saques_realizados,
+            limite_saque=50_000, saques_realizados=self.saques_realizados,
             limite_saques_diarios=3, transacoes_realizadas=self.transacoes_realizadas,
             fuso_horario=self.fuso_horario)
-        self.assertEqual(self.saldo_atual, 800.0)
+        self.assertEqual(self.saldo_atual, 80_000)
         self.assertEqual(len(self.extrato_movimentacoes), 1)
         self.assertEqual(self.saques_realizados, 1)
 
     def test_sacar_saldo_insuficiente(self):
         with self.assertRaises(SaldoInsuficienteError):
-            sacar(saldo_atual=self.saldo_atual, extrato_movimentacoes=self.extrato_movimentacoes, valor_saque=1500.0,
-                  limite_saque=500.0, saques_realizados=self.saques_realizados,
+            sacar(saldo_atual=self.saldo_atual, extrato_movimentacoes=self.extrato_movimentacoes, valor_saque=150_000,
+                  limite_saque=50_000, saques_realizados=self.saques_realizados,
                   limite_saques_diarios=3, transacoes_realizadas=self.transacoes_realizadas,
                   fuso_horario=self.fuso_horario)
 
-    def test_verificar_limite_transacoes(self):
-        hora_ultima_transacao = datetime.now(self.fuso_horario)
-        horas_restantes, minutos_restantes = verificar_limite_transacoes(hora_ultima_transacao, self.fuso_horario)
-        self.assertEqual(horas_restantes, 0)
-        self.assertEqual(minutos_restantes, 0)
+    def test_saida_em_lote_escreve_mensagens_ao_descarregar(self):
+        arquivo = io.StringIO()
+        saida = SaidaEmLote(arquivo, capacidade=10)
+        anterior = definir_saida(saida)
+        try:
+            self.saldo_atual, _, self.transacoes_realizadas, _ = depositar(
+                self.saldo_atual, self.extrato_movimentacoes, 5_000, self.transacoes_realizadas, self.fuso_horario)
+            sacar(saldo_atual=self.saldo_atual, extrato_movimentacoes=self.extrato_movimentacoes, valor_saque=2_000,
+                  limite_saque=50_000, saques_realizados=0, limite_saques_diarios=3,
+                  transacoes_realizadas=self.transacoes_realizadas, fuso_horario=self.fuso_horario)
+            self.assertEqual(arquivo.getvalue(), '')
+            self.assertEqual([evento[:2] for evento in saida.eventos], [('deposito', 5_000), ('saque', 2_000)])
+            saida.descarregar()
+            self.assertEqual(arquivo.getvalue(), "Depósito de R$ 50.00 realizado com sucesso!\n"
+                                                 "Saque de R$ 20.00 realizado com sucesso!\n")
+            definir_saida(SaidaNula())
+            depositar(self.saldo_atual, self.extrato_movimentacoes, 100, 0, self.fuso_horario)
+            self.assertEqual(len(saida.eventos), 0)
+        finally:
+            definir_saida(anterior)
+
+    def test_limitador_diario_zera_na_meia_noite_do_fuso(self):
+        fuso = timezone(timedelta(hours=-3))
+        limitador = LimitadorDiario(max_eventos=2, fim_do_dia=fim_do_dia_no_fuso(fuso))
+        noite = para_microssegundos(datetime(2024, 5, 17, 23, 0, tzinfo=fuso))
+        meia_noite = para_microssegundos(datetime(2024, 5, 18, tzinfo=fuso))
+        self.assertEqual([limitador.tentar(1, noite) for _ in range(3)], [LIVRE, LIVRE, EXCEDE_EVENTOS])
+        self.assertEqual(limitador.liberado_em(1, noite), meia_noite)
+        self.assertEqual(limitador.tentar(1, meia_noite), LIVRE)
+        self.assertEqual(limitador.uso(2, meia_noite), (0, 0))
+
+        movel = LimitadorMovel(max_eventos=2)
+        movel.registrar(1, noite)
+        movel.registrar(1, meia_noite)
+        self.assertEqual(movel.verificar(1, meia_noite + 1), EXCEDE_EVENTOS)
+        self.assertEqual(movel.liberado_em(1, meia_noite), noite + 86_400_000_000)
+
+    @patch('builtins.input', side_effect=['12345678901'] * 4)
+    def test_criar_conta_corrente_com_alocador_e_agencias(self, _):
+        joao = {'nome': 'João Silva', 'cpf': '12345678901', 'contas': []}
+        self.usuarios.append(joao)
+        alocador = AlocadorNumeros(tamanho_bloco=10)
+        with patch('sys.stdout', new_callable=io.StringIO):
+            criar_conta_corrente(self.contas, self.usuarios, '0001', alocador)
+            criar_conta_corrente(self.contas, self.usuarios, '0002', alocador)
+            criar_conta_corrente(self.contas, self.usuarios, '0001', alocador)
+            criar_conta_corrente(self.contas, self.usuarios, 'xyz', alocador)
+        self.assertEqual([(c['agencia'], c['numero']) for c in joao['contas']],
+                         [('0001', 1), ('0002', 11), ('0001', 2)])
+        self.assertEqual(alocador.reservas, 2)
+
+    def test_converter_para_centavos(self):
+        self.assertEqual(converter_para_centavos('100'), 10_000)
+        self.assertEqual(converter_para_centavos('1.234,56'), 123_456)
+        self.assertEqual(converter_para_centavos('0.1'), 10)
+        with self.assertRaises(ValorInvalidoError):
+            converter_para_centavos('10,001')
+        self.assertEqual(formatar_centavos(123_456), 'R$ 1234.56')
 
 
 if __name__ == '__main__':
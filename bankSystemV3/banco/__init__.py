@@ -0,0 +1,36 @@
+from .erros import (SaldoInsuficienteError, LimiteSaqueExcedidoError, LimiteSaquesDiariosError,
+                    ValorInvalidoError, LimiteTransacoesDiariasError, LimiteValorTransacoesError, CpfDuplicadoError,
+                    ERROS_TRANSACAO, ACEITA, SALDO_INSUFICIENTE, LIMITE_SAQUE_EXCEDIDO, LIMITE_SAQUES_DIARIOS_ATINGIDO,
+                    VALOR_INVALIDO, LIMITE_TRANSACOES_DIARIAS_ATINGIDO, LIMITE_VALOR_TRANSACOES_EXCEDIDO,
+                    CONTA_INEXISTENTE, codigo_do_erro)
+from .fuso import obter_fuso_horario
+from .limites import (LIMITE_TRANSACOES_DIARIAS, LIMITE_SAQUES_DIARIOS, LIMITE_VALOR_SAQUE,
+                      LIMITE_VALOR_SAQUE_CENTAVOS)
+from .moeda import converter_para_centavos, formatar_centavos, formatar_moeda, para_centavos
+from .relogio import Relogio, RelogioManual, definir_relogio, obter_relogio
+from .modelo import (Transacao, Saque, Deposito, Transferencia, TransferenciaRecebida, HistoricoBase, Historico,
+                     Conta, Cliente, PessoaFisica)
+
+# Carregados no primeiro acesso: o caminho de `import banco` não precisa deles. Os recursos
+# opcionais (eventos, extrato, limites, métricas) são lidos pelo modelo em banco.ganchos.
+_ADIADOS = {
+    'AlocadorNumeros': 'numeracao',
+    'Registro': 'registro',
+    'HistoricoColunar': 'historico_colunar',
+    **dict.fromkeys(('SaidaConsole', 'SaidaEmLote', 'SaidaNula', 'definir_saida', 'obter_saida'), 'eventos'),
+    **dict.fromkeys(('CacheExtrato', 'ativar_cache_extrato', 'desativar_cache_extrato', 'obter_cache_extrato'),
+                    'extrato'),
+    **dict.fromkeys(('LimitadorDiario', 'LimitadorMovel', 'LimitesConta', 'definir_limites', 'obter_limites'),
+                    'limitador'),
+    **dict.fromkeys(('Metricas', 'ativar_metricas', 'desativar_metricas', 'obter_metricas'), 'metricas'),
+}
+
+def __getattr__(nome):
+    if nome == 'fuso_horario':
+        return obter_fuso_horario()
+    if nome in _ADIADOS:
+        from importlib import import_module
+        valor = getattr(import_module(f"{__name__}.{_ADIADOS[nome]}"), nome)
+        globals()[nome] = valor
+        return valor
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
@@ -0,0 +1,62 @@
+from array import array
+
+from .relogio import dia_local
+
+# Posições nos totais por período: [depósitos (centavos), nº depósitos, saques (centavos), nº saques].
+# Transferências recebidas somam aos depósitos e transferências enviadas aos saques.
+DEPOSITOS, QTD_DEPOSITOS, SAQUES, QTD_SAQUES = range(4)
+
+class Agregados:
+    # Mantidos a cada movimentação: saldo acumulado alinhado às posições do histórico
+    # e totais por dia e por mês, para consultas sem percorrer o histórico.
+    __slots__ = ('saldo_inicial', 'saldos', 'por_dia', 'por_mes')
+
+    def __init__(self, saldo_inicial: int = 0):
+        self.saldo_inicial = saldo_inicial
+        self.saldos = array('q')
+        self.por_dia = {}
+        self.por_mes = {}
+
+    @property
+    def saldo_final(self) -> int:
+        return self.saldos[-1] if self.saldos else self.saldo_inicial
+
+    def registrar(self, transacao):
+        # Caminho quente de toda movimentação: sem laços nem chamadas além do dia local.
+        valor = transacao.valor_centavos
+        sinal = transacao.sinal
+        saldos = self.saldos
+        saldos.append((saldos[-1] if saldos else self.saldo_inicial) + sinal * valor)
+        dia = dia_local(transacao.microssegundos)
+        indice = DEPOSITOS if sinal > 0 else SAQUES
+        atuais = self.por_dia.get(dia)
+        if atuais is None:
+            atuais = self.por_dia[dia] = [0, 0, 0, 0]
+            mensais = self.por_mes.get((dia.year, dia.month))
+            if mensais is None:
+                self.por_mes[(dia.year, dia.month)] = [0, 0, 0, 0]
+        atuais[indice] += valor
+        atuais[indice + 1] += 1
+        mensais = self.por_mes[(dia.year, dia.month)]
+        mensais[indice] += valor
+        mensais[indice + 1] += 1
+
+    def inserir(self, transacao, posicao: int):
+        # Movimentação que entra antes da última: os totais não dependem da ordem, mas os
+        # saldos de `posicao` em diante mudam pelo valor dela.
+        self.registrar(transacao)
+        saldos = self.saldos
+        variacao = transacao.sinal * transacao.valor_centavos
+        saldos.pop()
+        saldos.insert(posicao, self.saldo_antes_de(posicao) + variacao)
+        for indice in range(posicao + 1, len(saldos)):
+            saldos[indice] += variacao
+
+    def saldo_antes_de(self, posicao: int) -> int:
+        return self.saldos[posicao - 1] if posicao > 0 else self.saldo_inicial
+
+    def totais_dia(self, dia) -> tuple:
+        return tuple(self.por_dia.get(dia, (0, 0, 0, 0)))
+
+    def totais_mes(self, ano: int, mes: int) -> tuple:
+        return tuple(self.por_mes.get((ano, mes), (0, 0, 0, 0)))
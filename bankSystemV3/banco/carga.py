@@ -0,0 +1,278 @@
+import argparse
+import csv
+import json
+import sys
+from datetime import date
+from itertools import islice
+from operator import itemgetter, mul
+
+from .modelo import Conta, PessoaFisica
+from .numeracao import validar_agencia
+from .registro import Registro
+from .relogio import obter_relogio
+
+# Carga em massa de clientes migrados, de CSV (com cabeçalho) ou JSONL, com as colunas
+# cpf, nome, data_nascimento (dd/mm/aaaa), endereco e, opcionais, conta e agencia: uma linha
+# com `conta` abre essa conta para o cliente, que pode já ter vindo numa linha anterior.
+# O arquivo é lido em lotes de `tamanho_lote` linhas, então a memória da carga em si não
+# depende do tamanho do arquivo; linhas inválidas são relatadas e puladas, sem abortar.
+
+_PESOS = (10, 9, 8, 7, 6, 5, 4, 3, 2)
+# Os dígitos chegam como bytes ASCII ('0' = 48): a soma ponderada desconta 48 vezes a soma dos pesos.
+_DESCONTO = 48 * sum(_PESOS)
+_REPETIDOS = frozenset(str(d) * 11 for d in range(10))
+_SEPARADORES_CPF = str.maketrans('', '', '.- ')
+
+def normalizar_cpf(cpf: str) -> str:
+    # CPF com 11 dígitos e dígitos verificadores corretos, sem pontuação; None se inválido.
+    if not cpf.isdecimal():
+        cpf = cpf.translate(_SEPARADORES_CPF)
+    if len(cpf) != 11 or not cpf.isascii() or not cpf.isdecimal() or cpf in _REPETIDOS:
+        return None
+    digitos = cpf.encode()
+    soma = sum(map(mul, digitos, _PESOS)) - _DESCONTO
+    if soma * 10 % 11 % 10 != digitos[9] - 48:
+        return None
+    # Os pesos do segundo dígito (11 a 2) são os do primeiro mais um, e o primeiro dígito pesa 2.
+    soma += sum(digitos[:9]) - 9 * 48 + 2 * (digitos[9] - 48)
+    if soma * 10 % 11 % 10 != digitos[10] - 48:
+        return None
+    return cpf
+
+_DIAS_NO_MES = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+# Datas já lidas: nascimentos se repetem muito e há no máximo ~73 mil datas entre 1900 e 2100.
+_datas = {}
+
+def ler_data(texto: str) -> date:
+    # dd/mm/aaaa sem strptime; None se inválida.
+    data = _datas.get(texto)
+    if data is not None:
+        return data
+    if len(texto) != 10 or texto[2] != '/' or texto[5] != '/' or not texto.isascii():
+        return None
+    dia, mes, ano = texto[:2], texto[3:5], texto[6:]
+    if not (dia.isdigit() and mes.isdigit() and ano.isdigit()):
+        return None
+    dia, mes, ano = int(dia), int(mes), int(ano)
+    if not (1900 <= ano <= 2100 and 1 <= mes <= 12 and 1 <= dia <= _DIAS_NO_MES[mes]):
+        return None
+    if mes == 2 and dia == 29 and not (ano % 4 == 0 and (ano % 100 != 0 or ano % 400 == 0)):
+        return None
+    data = _datas[texto] = date(ano, mes, dia)
+    return data
+
+class ResultadoCarga:
+    __slots__ = ('linhas', 'clientes', 'contas', 'rejeitadas', 'erros')
+
+    def __init__(self):
+        self.linhas = 0
+        self.clientes = 0
+        self.contas = 0
+        self.rejeitadas = 0
+        self.erros = []   # (linha, motivo), até `max_erros`
+
+    def __repr__(self):
+        return (f"ResultadoCarga(linhas={self.linhas}, clientes={self.clientes}, contas={self.contas}, "
+                f"rejeitadas={self.rejeitadas})")
+
+_COLUNAS = ('cpf', 'nome', 'data_nascimento', 'endereco', 'conta', 'agencia')
+
+def _linhas_csv(arquivo):
+    # (número da linha, tupla na ordem de _COLUNAS); colunas opcionais ausentes viram ''.
+    leitor = csv.reader(arquivo)
+    cabecalho = next(leitor, None)
+    if cabecalho is None:
+        return
+    posicoes = {nome.strip().lower(): i for i, nome in enumerate(cabecalho)}
+    faltando = [nome for nome in _COLUNAS[:4] if nome not in posicoes]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes no cabeçalho: {', '.join(faltando)}.")
+    # Coluna ausente lê a posição logo após o cabeçalho, preenchida com ''.
+    indices = [posicoes.get(nome, len(cabecalho)) for nome in _COLUNAS]
+    largura = max(indices) + 1
+    pegar = itemgetter(*indices)
+    for campos in leitor:
+        if not campos:
+            continue
+        if len(campos) < largura:
+            campos += [''] * (largura - len(campos))
+        yield leitor.line_num, pegar(campos)
+
+def _linhas_jsonl(arquivo):
+    for numero, linha in enumerate(arquivo, 1):
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+            yield numero, tuple('' if registro.get(nome) is None else str(registro[nome]) for nome in _COLUNAS)
+        except (ValueError, AttributeError):
+            yield numero, None
+
+def ler_linhas(arquivo, formato: str = 'csv'):
+    return _linhas_jsonl(arquivo) if formato == 'jsonl' else _linhas_csv(arquivo)
+
+class _NoRegistro:
+    # Destino padrão: clientes e contas entram no registro (e no diário dele, se houver).
+    def __init__(self, registro: Registro):
+        self.registro = registro
+        self.agencias = registro.alocador.agencias
+        # O CPF já chega normalizado: no Registro em memória basta o dicionário. Subclasses (ex.:
+        # RegistroInstantaneo, que hidrata sob demanda) passam pela busca completa.
+        if type(registro) is Registro:
+            self.cliente, self.tem_conta = registro._usuarios.get, registro._contas.__contains__
+        else:
+            self.cliente = registro.buscar_usuario
+            self.tem_conta = lambda numero: registro.buscar_conta(numero) is not None
+
+    def adicionar_cliente(self, cpf: str, nome: str, data_nascimento: date, endereco: str):
+        return self.registro.adicionar_usuario(PessoaFisica.de_campos(cpf, nome, data_nascimento, endereco))
+
+    def adicionar_conta(self, cliente, numero: int, agencia: str):
+        self.registro.adicionar_conta(Conta(cliente, numero, agencia))
+
+    def concluir_lote(self):
+        pass
+
+class _NoDiario:
+    # Destino direto no diário: nada do modelo fica em memória, só os CPFs e os números de
+    # conta já gravados (como inteiros), que bastam para deduplicar. Cada lote é uma escrita.
+    def __init__(self, diario):
+        self.diario = diario
+        self.agencias = None
+        self.cpfs, self.numeros = set(), set()
+        self.tem_conta = self.numeros.__contains__
+        self.usuarios, self.contas = [], []
+
+    def cliente(self, cpf: str):
+        return cpf if int(cpf) in self.cpfs else None
+
+    def adicionar_cliente(self, cpf: str, nome: str, data_nascimento: date, endereco: str):
+        self.cpfs.add(int(cpf))
+        self.usuarios.append((cpf, nome, data_nascimento, endereco))
+        return cpf
+
+    def adicionar_conta(self, cpf: str, numero: int, agencia: str):
+        self.numeros.add(numero)
+        self.contas.append((numero, agencia, cpf))
+
+    def concluir_lote(self):
+        if self.diario is not None:
+            self.diario.registrar_cadastros(self.usuarios, self.contas)
+        self.usuarios.clear()
+        self.contas.clear()
+
+def carregar(registro: Registro, arquivo, formato: str = 'csv', tamanho_lote: int = 10_000,
+             ao_rejeitar=None, max_erros: int = 1_000) -> ResultadoCarga:
+    # `arquivo` é um arquivo de texto aberto (ou qualquer iterável de linhas). `ao_rejeitar`,
+    # se dado, recebe (linha, motivo) de toda linha recusada; o resultado guarda só as primeiras.
+    return _carregar(_NoRegistro(registro), arquivo, formato, tamanho_lote, ao_rejeitar, max_erros)
+
+def carregar_no_diario(diario, arquivo, formato: str = 'csv', tamanho_lote: int = 10_000,
+                       ao_rejeitar=None, max_erros: int = 1_000) -> ResultadoCarga:
+    # Como `carregar`, mas grava clientes e contas direto no diário (banco.diario.Diario), sem
+    # montar o registro: a memória não cresce com os clientes, só com os CPFs e números vistos.
+    # Deduplica só dentro do arquivo; `recuperar` do diário devolve o registro carregado. Sem
+    # diário (None), só valida o arquivo.
+    return _carregar(_NoDiario(diario), arquivo, formato, tamanho_lote, ao_rejeitar, max_erros)
+
+def _carregar(destino, arquivo, formato: str, tamanho_lote: int, ao_rejeitar, max_erros: int) -> ResultadoCarga:
+    resultado = ResultadoCarga()
+    erros = resultado.erros
+    hoje = obter_relogio().hoje()
+    # Agências já conferidas nesta carga; as cadastradas no alocador, se ele as restringe.
+    agencias_aceitas, cadastradas = set(), destino.agencias
+    buscar_cliente, tem_conta = destino.cliente, destino.tem_conta
+
+    def rejeitar(linha: int, motivo: str):
+        resultado.rejeitadas += 1
+        if len(erros) < max_erros:
+            erros.append((linha, motivo))
+        if ao_rejeitar is not None:
+            ao_rejeitar(linha, motivo)
+
+    linhas = ler_linhas(arquivo, formato)
+    while True:
+        lote = list(islice(linhas, tamanho_lote))
+        if not lote:
+            break
+        resultado.linhas += len(lote)
+        for linha, campos in lote:
+            if campos is None:
+                rejeitar(linha, "Linha mal formada.")
+                continue
+            cpf, nome, nascimento, endereco, numero, agencia = campos
+            cpf = normalizar_cpf(cpf)
+            if cpf is None:
+                rejeitar(linha, "CPF inválido.")
+                continue
+            if numero:
+                if not (numero.isascii() and numero.isdigit()) or int(numero) <= 0:
+                    rejeitar(linha, "Número de conta inválido.")
+                    continue
+                numero = int(numero)
+                if tem_conta(numero):
+                    rejeitar(linha, f"Conta {numero} já existe.")
+                    continue
+                agencia = agencia.strip() or '0001'
+                if agencia not in agencias_aceitas:
+                    try:
+                        validar_agencia(agencia)
+                    except ValueError:
+                        rejeitar(linha, "Agência inválida.")
+                        continue
+                    if cadastradas is not None and agencia not in cadastradas:
+                        rejeitar(linha, f"Agência {agencia} não cadastrada.")
+                        continue
+                    agencias_aceitas.add(agencia)
+            cliente = buscar_cliente(cpf)
+            if cliente is None:
+                nome = nome.strip()
+                data_nascimento = ler_data(nascimento.strip())
+                if not nome:
+                    rejeitar(linha, "Nome vazio.")
+                    continue
+                if data_nascimento is None or data_nascimento > hoje:
+                    rejeitar(linha, "Data de nascimento inválida.")
+                    continue
+                cliente = destino.adicionar_cliente(cpf, nome, data_nascimento, endereco)
+                resultado.clientes += 1
+            elif not numero:
+                rejeitar(linha, "CPF duplicado.")
+                continue
+            if numero:
+                destino.adicionar_conta(cliente, numero, agencia)
+                resultado.contas += 1
+        destino.concluir_lote()
+    return resultado
+
+def main(argumentos=None):
+    from .diario import Diario
+
+    parser = argparse.ArgumentParser(description="Carga em massa de clientes e contas (CSV ou JSONL).")
+    parser.add_argument('arquivo')
+    parser.add_argument('--formato', choices=('csv', 'jsonl'), help="padrão: pela extensão do arquivo")
+    parser.add_argument('--diario', help="grava os clientes e contas carregados neste diário")
+    parser.add_argument('--erros', help="grava as linhas recusadas (linha, motivo) neste CSV")
+    opcoes = parser.parse_args(argumentos)
+    formato = opcoes.formato or ('jsonl' if opcoes.arquivo.endswith('.jsonl') else 'csv')
+
+    # Com --diario as linhas vão direto para o diário; sem ele, o arquivo só é validado.
+    diario = Diario(opcoes.diario, 'nunca') if opcoes.diario else None
+    saida_erros = open(opcoes.erros, 'w', newline='') if opcoes.erros else None
+    try:
+        escritor = csv.writer(saida_erros) if saida_erros is not None else None
+        ao_rejeitar = (lambda linha, motivo: escritor.writerow((linha, motivo))) if escritor is not None else None
+        with open(opcoes.arquivo, newline='', encoding='utf-8') as arquivo:
+            resultado = carregar_no_diario(diario, arquivo, formato, ao_rejeitar=ao_rejeitar)
+    finally:
+        if saida_erros is not None:
+            saida_erros.close()
+        if diario is not None:
+            diario.fechar()
+    print(f"{resultado.linhas} linhas: {resultado.clientes} clientes e {resultado.contas} contas carregados, "
+          f"{resultado.rejeitadas} linhas recusadas.")
+    for linha, motivo in resultado.erros[:20]:
+        print(f"  linha {linha}: {motivo}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
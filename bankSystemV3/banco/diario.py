@@ -0,0 +1,190 @@
+import json
+import os
+import threading
+
+from .modelo import TIPOS_TRANSACAO, Conta, PessoaFisica, Transferencia, TransferenciaRecebida
+from .registro import Registro
+from .relogio import obter_relogio
+
+# Políticas de durabilidade (em todas, cada registro vai para o sistema operacional antes de
+# a operação ser aceita: sem buffer no processo, uma queda do processo não perde nada):
+#   'sempre' - fsync a cada registro;
+#   'lote'   - fsync agrupado a cada `tamanho_lote` registros e, em segundo plano, a cada
+#              `intervalo` segundos com registros pendentes (group commit);
+#   'nunca'  - apenas grava no arquivo e deixa a descarga a cargo do sistema operacional.
+POLITICAS = ('sempre', 'lote', 'nunca')
+
+# Formato: um registro por linha, prefixado pelo tipo.
+#   U <json [cpf, nome, data_nascimento, endereco]>
+#   C <json [numero, agencia, cpf]>
+#   T <numero> <codigo do tipo> <centavos> <microssegundos>
+#   X <origem> <destino> <centavos> <microssegundos>   (transferência: uma linha, os dois lados)
+class Diario:
+    def __init__(self, caminho: str, politica: str = 'lote', tamanho_lote: int = 1000,
+                 intervalo: float = 0.01):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política de sincronização inválida: {politica!r}. Use uma de {POLITICAS}.")
+        self.caminho = caminho
+        self.politica = politica
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.sincronizacoes = 0
+        self._arquivo = open(caminho, 'ab', buffering=0)
+        self._pendentes = 0
+        # Contas diferentes gravam em paralelo (cada uma sob a sua trava); o arquivo é um só.
+        self._trava = threading.Lock()
+        self._parar = threading.Event()
+        self._descarregador = None
+        if politica == 'lote':
+            self._descarregador = threading.Thread(target=self._descarregar, name='diario-fsync', daemon=True)
+            self._descarregador.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+    def registrar_usuario(self, usuario: PessoaFisica):
+        self._gravar(_linha_usuario(usuario.cpf, usuario.nome, usuario.data_nascimento, usuario.endereco))
+
+    def registrar_conta(self, conta: Conta):
+        self._gravar(_linha_conta(conta.numero, conta.agencia, conta.cliente.cpf))
+
+    def registrar_cadastros(self, usuarios, contas):
+        # Clientes (cpf, nome, data de nascimento, endereço) e depois contas (número, agência, cpf)
+        # numa escrita só, sem objetos do modelo: a carga em massa grava assim cada lote.
+        linhas = [_linha_usuario(*usuario) for usuario in usuarios]
+        linhas += [_linha_conta(*conta) for conta in contas]
+        if linhas:
+            self._gravar(b''.join(linhas))
+
+    def registrar_transacao(self, conta: Conta, transacao):
+        self._gravar(f"T {conta.numero} {transacao.codigo} {transacao.valor_centavos} "
+                     f"{transacao.microssegundos}\n".encode())
+
+    def registrar_transferencia(self, origem: Conta, transferencia: Transferencia):
+        self._gravar(f"X {origem.numero} {transferencia.contraparte.numero} {transferencia.valor_centavos} "
+                     f"{transferencia.microssegundos}\n".encode())
+
+    def _gravar(self, linha: bytes):
+        with self._trava:
+            # Sem buffer, uma chamada write; um write curto só acontece em erro (ex.: disco cheio).
+            gravados = self._arquivo.write(linha)
+            if gravados != len(linha):
+                self._arquivo.write(linha[gravados:])
+            if self.politica == 'sempre':
+                self._sincronizar()
+            elif self.politica == 'lote':
+                self._pendentes += 1
+                if self._pendentes >= self.tamanho_lote:
+                    self._sincronizar()
+
+    def _descarregar(self):
+        # Descarga periódica da política 'lote': os últimos registros antes de uma pausa
+        # chegam ao disco em até `intervalo` segundos, sem esperar a próxima escrita. O fsync
+        # roda fora da trava; as escritas seguem enquanto ele espera o disco.
+        while not self._parar.wait(self.intervalo):
+            with self._trava:
+                pendentes, self._pendentes = self._pendentes, 0
+            if pendentes:
+                os.fsync(self._arquivo.fileno())
+                with self._trava:
+                    self.sincronizacoes += 1
+
+    def posicao(self) -> int:
+        with self._trava:
+            return self._arquivo.tell()
+
+    def sincronizar(self):
+        with self._trava:
+            self._sincronizar()
+
+    def _sincronizar(self):
+        os.fsync(self._arquivo.fileno())
+        self.sincronizacoes += 1
+        self._pendentes = 0
+
+    def fechar(self):
+        if self._descarregador is not None:
+            self._parar.set()
+            self._descarregador.join()
+        with self._trava:
+            if not self._arquivo.closed:
+                if self.politica != 'nunca':
+                    self._sincronizar()
+                self._arquivo.close()
+
+def _linha_usuario(cpf: str, nome: str, data_nascimento, endereco: str) -> bytes:
+    dados = [cpf, nome, data_nascimento.strftime('%d/%m/%Y'), endereco]
+    return b'U ' + json.dumps(dados, ensure_ascii=False).encode() + b'\n'
+
+def _linha_conta(numero: int, agencia: str, cpf: str) -> bytes:
+    return b'C ' + json.dumps([numero, agencia, cpf]).encode() + b'\n'
+
+def recuperar(caminho: str, historico=None) -> Registro:
+    registro = Registro()
+    reaplicar(registro, caminho, historico=historico)
+    return registro
+
+def reaplicar(registro: Registro, caminho: str, posicao: int = 0, historico=None):
+    # Reaplica no registro os registros do diário a partir de `posicao` (em bytes). Os
+    # contadores diários só consideram as movimentações do dia corrente do relógio. Um
+    # registro incompleto no final (escrita interrompida por uma queda) é descartado do arquivo.
+    relogio = obter_relogio()
+    hoje = relogio.hoje()
+    inicio_hoje = relogio.inicio_dia_microssegundos()
+    if not os.path.exists(caminho):
+        return
+
+    bytes_validos = posicao
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(posicao)
+        for linha in arquivo:
+            if not linha.endswith(b'\n'):
+                break
+            bytes_validos += len(linha)
+            tipo, _, dados = linha.rstrip(b'\n').partition(b' ')
+            if tipo == b'T':
+                numero, codigo, centavos, microssegundos = map(int, dados.split())
+                conta = registro.buscar_conta(numero)
+                transacao = TIPOS_TRANSACAO[codigo].de_centavos(centavos, microssegundos)
+                _reaplicar(conta, transacao, microssegundos >= inicio_hoje, hoje)
+            elif tipo == b'X':
+                numero_origem, numero_destino, centavos, microssegundos = map(int, dados.split())
+                origem, destino = registro.buscar_conta(numero_origem), registro.buscar_conta(numero_destino)
+                do_dia = microssegundos >= inicio_hoje
+                _reaplicar(origem, Transferencia.de_centavos(centavos, microssegundos, destino), do_dia, hoje)
+                _reaplicar(destino, TransferenciaRecebida.de_centavos(centavos, microssegundos, origem), do_dia, hoje)
+            elif tipo == b'U':
+                cpf, nome, data_nascimento, endereco = json.loads(dados)
+                registro.adicionar_usuario(PessoaFisica(cpf, nome, data_nascimento, endereco))
+            elif tipo == b'C':
+                numero, agencia, cpf = json.loads(dados)
+                conta = Conta(registro.buscar_usuario(cpf), numero, agencia,
+                              historico() if historico is not None else None)
+                registro.adicionar_conta(conta)
+            else:
+                raise ValueError(f"Registro de diário desconhecido: {linha[:40]!r}")
+    if bytes_validos < os.path.getsize(caminho):
+        os.truncate(caminho, bytes_validos)
+
+def _reaplicar(conta: Conta, transacao, do_dia: bool, hoje):
+    conta.historico.adicionar_transacao(transacao)
+    conta.saldo_centavos += transacao.sinal * transacao.valor_centavos
+    # A origem de uma transferência também conta como saque do dia.
+    if do_dia and transacao.sinal < 0:
+        if conta.ultima_data_saque != hoje:
+            conta.saques_realizados = 0
+        conta.saques_realizados += 1
+        conta.ultima_data_saque = hoje
+    if do_dia:
+        if conta.ultima_data_transacao != hoje:
+            conta.transacoes_realizadas = 0
+        conta.transacoes_realizadas += 1
+        conta.ultima_data_transacao = hoje
+
+def abrir(caminho: str, politica: str = 'lote', historico=None, **opcoes) -> Registro:
+    registro = recuperar(caminho, historico)
+    registro.anexar_diario(Diario(caminho, politica, **opcoes))
+    return registro
@@ -0,0 +1,32 @@
+class SaldoInsuficienteError(Exception):
+    pass
+
+class LimiteSaqueExcedidoError(Exception):
+    pass
+
+class LimiteSaquesDiariosError(Exception):
+    pass
+
+class ValorInvalidoError(Exception):
+    pass
+
+class LimiteTransacoesDiariasError(Exception):
+    pass
+
+class LimiteValorTransacoesError(Exception):
+    pass
+
+class CpfDuplicadoError(ValueError):
+    pass
+
+# Códigos de status das operações em lote: 0 = aceita; de 1 em diante, a exceção na posição
+# (código - 1) de ERROS_TRANSACAO; CONTA_INEXISTENTE quando o número não está cadastrado.
+ERROS_TRANSACAO = (SaldoInsuficienteError, LimiteSaqueExcedidoError, LimiteSaquesDiariosError,
+                   ValorInvalidoError, LimiteTransacoesDiariasError, LimiteValorTransacoesError)
+ACEITA = 0
+(SALDO_INSUFICIENTE, LIMITE_SAQUE_EXCEDIDO, LIMITE_SAQUES_DIARIOS_ATINGIDO, VALOR_INVALIDO,
+ LIMITE_TRANSACOES_DIARIAS_ATINGIDO, LIMITE_VALOR_TRANSACOES_EXCEDIDO) = range(1, len(ERROS_TRANSACAO) + 1)
+CONTA_INEXISTENTE = len(ERROS_TRANSACAO) + 1
+
+def codigo_do_erro(erro: Exception) -> int:
+    return ERROS_TRANSACAO.index(type(erro)) + 1
@@ -0,0 +1,81 @@
+import sys
+
+from . import ganchos as _ganchos
+from .moeda import formatar_centavos
+
+# Saídas de eventos: as transações não imprimem nada; ao concluir, entregam à saída ativa um
+# evento estruturado (número da conta, transação). A formatação da mensagem e a escrita ficam
+# com a saída: imediata (console), acumulada em lotes ou nenhuma (nula). Com a saída nula o
+# caminho quente só testa `ganchos.emitir is None`.
+
+def mensagem(transacao) -> str:
+    valor = formatar_centavos(transacao.valor_centavos)
+    if transacao.codigo == 0:
+        return f"Depósito de {valor} realizado com sucesso!"
+    if transacao.codigo == 1:
+        return f"Saque de {valor} realizado com sucesso!"
+    if transacao.codigo == 2:
+        return f"Transferência de {valor} para a conta {transacao.contraparte.numero} realizada com sucesso!"
+    return f"Transferência de {valor} recebida com sucesso!"
+
+class SaidaConsole:
+    # Padrão da CLI: imprime a mensagem na hora, como antes.
+    def emitir(self, numero: int, transacao):
+        print(mensagem(transacao))
+
+class SaidaNula:
+    def emitir(self, numero: int, transacao):
+        pass
+
+def escrever_mensagens(eventos, arquivo=None):
+    # Destino padrão de SaidaEmLote: uma única escrita por lote.
+    arquivo = arquivo if arquivo is not None else sys.stdout
+    arquivo.write(''.join(f"{mensagem(transacao)}\n" for _, transacao in eventos))
+
+class SaidaEmLote:
+    # Acumula os eventos e entrega listas de até `capacidade` ao `destino` (por padrão, as
+    # mensagens vão para stdout numa escrita só). `emitir` não trava: deque.append é atômico;
+    # a trava só serializa as descargas, que preservam a ordem de emissão.
+    def __init__(self, destino=None, capacidade: int = 1024):
+        self.destino = destino if destino is not None else escrever_mensagens
+        self.capacidade = capacidade
+        from collections import deque
+        from threading import Lock
+
+        self._fila = deque()
+        self._trava = Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.descarregar()
+
+    def __len__(self):
+        return len(self._fila)
+
+    def emitir(self, numero: int, transacao):
+        self._fila.append((numero, transacao))
+        if len(self._fila) >= self.capacidade:
+            self.descarregar()
+
+    def descarregar(self):
+        with self._trava:
+            retirar = self._fila.popleft
+            eventos = [retirar() for _ in range(len(self._fila))]
+            if eventos:
+                self.destino(eventos)
+
+_saida = SaidaConsole()
+_ganchos.emitir = _saida.emitir
+
+def definir_saida(saida):
+    # Retorna a saída anterior, para restaurá-la depois.
+    global _saida
+    anterior = _saida
+    _saida = saida if saida is not None else SaidaNula()
+    _ganchos.emitir = None if isinstance(_saida, SaidaNula) else _saida.emitir
+    return anterior
+
+def obter_saida():
+    return _saida
@@ -0,0 +1,174 @@
+from . import ganchos as _ganchos
+from .moeda import formatar_centavos
+
+# Cache de linhas do extrato: o histórico só cresce por acréscimo, então a linha de uma
+# movimentação, uma vez formatada, vale para sempre. Cada histórico consultado guarda as
+# linhas das suas últimas `max_linhas` movimentações (a cauda, onde caem os extratos); a
+# cada consulta só as movimentações novas desde a anterior são formatadas. Históricos que
+# ninguém consulta não entram no cache, e os frios saem primeiro quando a soma das linhas
+# passa de `orcamento` bytes. Desativado por padrão: o caminho quente só testa `ganchos.extrato is None`.
+# A trava do cache nunca fica presa enquanto o histórico é lido (num histórico em banco, SQL
+# e espera pelo escritor): a consulta copia o que está em cache, busca o resto sem a trava e
+# volta a travar só para juntar as linhas novas.
+
+# Custo aproximado de uma linha além dos caracteres: cabeçalho do str ASCII e a posição na lista.
+_CUSTO_LINHA = 49 + 8
+
+def linha(transacao) -> str:
+    return (f"{transacao.data_hora.strftime('%Y-%m-%d %H:%M:%S')} - "
+            f"{transacao.__class__.__name__}: {formatar_centavos(transacao.valor_centavos)}")
+
+class _Entrada:
+    # `linhas[i]` é a linha da posição `base + i` do histórico. A entrada segura o histórico:
+    # enquanto ela existe, o id() usado como chave não é reaproveitado.
+    __slots__ = ('historico', 'base', 'linhas', 'bytes')
+
+    def __init__(self, historico, base: int):
+        self.historico = historico
+        self.base = base
+        self.linhas = []
+        self.bytes = 0
+
+class CacheExtrato:
+    def __init__(self, orcamento: int = 64 * 1024 * 1024, max_linhas: int = 1_000):
+        self.orcamento = orcamento
+        self.max_linhas = max_linhas
+        from collections import OrderedDict
+        from threading import Lock
+
+        self._entradas = OrderedDict()   # id(histórico) -> _Entrada, da menos para a mais recente
+        self._bytes = 0
+        self._trava = Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.formatadas = 0
+        self.despejos = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def linhas(self, historico, posicoes) -> list:
+        # Linhas das `posicoes` (crescentes) do histórico. As da cauda vêm do cache; as mais
+        # antigas são formatadas na hora, sem entrar nele.
+        posicoes = list(posicoes)
+        if not posicoes:
+            return []
+        total = len(historico)
+        na_cauda = posicoes[-1] >= total - self.max_linhas
+        chave = id(historico)
+        guardadas = {}
+        with self._trava:
+            # Só copia o que já está guardado; nada do histórico é lido sob a trava.
+            cobertura = novas_desde = total
+            if na_cauda:
+                # Uma entrada nova (ou atrasada) começa na primeira posição pedida: não formata
+                # a cauda inteira para servir uma página curta.
+                cobertura = novas_desde = min(max(posicoes[0], total - self.max_linhas, 0), total)
+                entrada = self._entradas.get(chave)
+                if entrada is not None and entrada.historico is historico:
+                    fim = entrada.base + len(entrada.linhas)
+                    if total - fim <= self.max_linhas:
+                        cobertura, novas_desde = entrada.base, min(fim, total)
+                        base, cache = entrada.base, entrada.linhas
+                        guardadas = {posicao: cache[posicao - base] for posicao in posicoes
+                                     if base <= posicao < novas_desde}
+        # Fora da trava: as movimentações novas da cauda e as antigas pedidas, cada grupo de uma vez.
+        novas = list(map(linha, historico._transacoes_nas(range(novas_desde, total)))) if na_cauda else []
+        antigas = iter(map(linha, historico._transacoes_nas([p for p in posicoes if p < cobertura])))
+        resultado = []
+        for posicao in posicoes:
+            if posicao < cobertura:
+                resultado.append(next(antigas))
+            elif posicao < novas_desde:
+                resultado.append(guardadas[posicao])
+            else:
+                resultado.append(novas[posicao - novas_desde])
+        formatadas = len(novas) + sum(1 for posicao in posicoes if posicao < cobertura)
+        with self._trava:
+            if na_cauda:
+                self._juntar(historico, novas_desde, novas)
+            # Falta: linha que precisou ser formatada nesta consulta (antiga ou recém-acrescentada).
+            self.acertos += len(guardadas)
+            self.faltas += len(posicoes) - len(guardadas)
+            self.formatadas += formatadas
+        return resultado
+
+    def _juntar(self, historico, desde: int, novas: list):
+        # Acrescenta à entrada as linhas das posições `desde` em diante; outra consulta pode ter
+        # juntado parte delas (ou mais) enquanto estas eram buscadas.
+        chave = id(historico)
+        entrada = self._entradas.get(chave)
+        if entrada is None or entrada.historico is not historico:
+            entrada = self._entradas[chave] = _Entrada(historico, desde)
+        else:
+            self._entradas.move_to_end(chave)
+        fim = entrada.base + len(entrada.linhas)
+        if fim < desde:
+            # Atrasada: as linhas guardadas não emendam com as novas.
+            self._descontar(entrada, len(entrada.linhas))
+            entrada.base = fim = desde
+        novas = novas[fim - desde:]
+        if not novas:
+            return
+        tamanho = sum(map(len, novas)) + _CUSTO_LINHA * len(novas)
+        entrada.linhas += novas
+        entrada.bytes += tamanho
+        self._bytes += tamanho
+        # Descarta o excesso da frente em blocos de um quarto, para não mover a lista a cada consulta.
+        excesso = len(entrada.linhas) - self.max_linhas
+        if excesso > self.max_linhas // 4:
+            self._descontar(entrada, excesso)
+        self._despejar()
+
+    def _descontar(self, entrada: _Entrada, quantidade: int):
+        removidas = entrada.linhas[:quantidade]
+        tamanho = sum(map(len, removidas)) + _CUSTO_LINHA * len(removidas)
+        del entrada.linhas[:quantidade]
+        entrada.base += quantidade
+        entrada.bytes -= tamanho
+        self._bytes -= tamanho
+
+    def _despejar(self):
+        # Tira as entradas menos recentes até caber no orçamento; a última usada (no fim) fica.
+        while self._bytes > self.orcamento and len(self._entradas) > 1:
+            _, entrada = self._entradas.popitem(last=False)
+            self._bytes -= entrada.bytes
+            self.despejos += 1
+
+    def esquecer(self, historico):
+        with self._trava:
+            entrada = self._entradas.get(id(historico))
+            if entrada is not None and entrada.historico is historico:
+                del self._entradas[id(historico)]
+                self._bytes -= entrada.bytes
+
+    def limpar(self):
+        # Necessário se o fuso horário mudar: as linhas guardadas trazem a hora local.
+        with self._trava:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def estatisticas(self) -> dict:
+        consultadas = self.acertos + self.faltas
+        return {
+            'historicos': len(self._entradas),
+            'linhas': sum(len(entrada.linhas) for entrada in list(self._entradas.values())),
+            'bytes': self._bytes,
+            'orcamento': self.orcamento,
+            'acertos': self.acertos,
+            'faltas': self.faltas,
+            'taxa_acerto': self.acertos / consultadas if consultadas else 0.0,
+            'formatadas': self.formatadas,
+            'despejos': self.despejos,
+        }
+
+def ativar_cache_extrato(cache: CacheExtrato = None) -> CacheExtrato:
+    _ganchos.extrato = cache if cache is not None else CacheExtrato()
+    return _ganchos.extrato
+
+def desativar_cache_extrato() -> CacheExtrato:
+    anterior, _ganchos.extrato = _ganchos.extrato, None
+    return anterior
+
+def obter_cache_extrato() -> CacheExtrato:
+    return _ganchos.extrato
@@ -0,0 +1,20 @@
+NOME_FUSO_HORARIO = 'America/Sao_Paulo'
+
+_fuso_horario = None
+
+def obter_fuso_horario():
+    # Carregado no primeiro uso: importar o pacote não deve pagar pela base de fusos.
+    global _fuso_horario
+    if _fuso_horario is None:
+        try:
+            from zoneinfo import ZoneInfo
+            _fuso_horario = ZoneInfo(NOME_FUSO_HORARIO)
+        except (ImportError, KeyError):
+            import pytz
+            _fuso_horario = pytz.timezone(NOME_FUSO_HORARIO)
+    return _fuso_horario
+
+def __getattr__(nome):
+    if nome == 'fuso_horario':
+        return obter_fuso_horario()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
@@ -0,0 +1,13 @@
+# Estado dos recursos opcionais lido no caminho quente: métricas, limites, cache de extrato e a
+# emissão de eventos. Fica num módulo mínimo para que `import banco` não carregue os módulos que
+# os implementam; cada um grava aqui ao ser ativado, e o caminho quente só testa `is None`.
+metricas = None
+limites = None
+extrato = None
+
+def _emitir_no_console(numero: int, transacao):
+    # Saída padrão até a primeira emissão: importar banco.eventos troca `emitir` pela saída ativa.
+    from . import eventos
+    eventos.obter_saida().emitir(numero, transacao)
+
+emitir = _emitir_no_console
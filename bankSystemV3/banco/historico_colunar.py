@@ -0,0 +1,91 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+from .modelo import TIPOS_TRANSACAO, HistoricoBase, Transacao
+
+class _TransacoesColunares:
+    # Sequência só de leitura; sem herdar de collections.abc.Sequence, que sairia caro na importação.
+    __slots__ = ('_historico',)
+
+    def __init__(self, historico: 'HistoricoColunar'):
+        self._historico = historico
+
+    def __len__(self):
+        return len(self._historico)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+        return self._historico.materializar(indice)
+
+    def __iter__(self):
+        return map(self._historico.materializar, range(len(self)))
+
+    def __reversed__(self):
+        return map(self._historico.materializar, range(len(self) - 1, -1, -1))
+
+class HistoricoColunar(HistoricoBase):
+    # Contrapartes (só existem em transferências) ficam num dicionário esparso por posição.
+    __slots__ = ('_tipos', '_centavos', '_microssegundos', '_contrapartes', '_agregados')
+
+    def __init__(self):
+        self._tipos = array('b')
+        self._centavos = array('q')
+        self._microssegundos = array('q')
+        self._contrapartes = None
+        self._agregados = None
+
+    @property
+    def transacoes(self) -> _TransacoesColunares:
+        return _TransacoesColunares(self)
+
+    def adicionar_transacao(self, transacao: Transacao):
+        microssegundos = self._microssegundos
+        if microssegundos and transacao.microssegundos < microssegundos[-1]:
+            self._inserir(transacao, bisect_right(microssegundos, transacao.microssegundos))
+            return
+        contraparte = getattr(transacao, 'contraparte', None)
+        if contraparte is not None:
+            if self._contrapartes is None:
+                self._contrapartes = {}
+            self._contrapartes[len(self._tipos)] = contraparte
+        self._tipos.append(transacao.codigo)
+        self._centavos.append(transacao.valor_centavos)
+        self._microssegundos.append(transacao.microssegundos)
+        self._agregar(transacao)
+
+    def _inserir(self, transacao: Transacao, posicao: int):
+        # Fora de ordem: as colunas abrem espaço em `posicao` e as contrapartes seguintes andam uma posição.
+        if self._contrapartes is not None:
+            self._contrapartes = {indice + (indice >= posicao): contraparte
+                                  for indice, contraparte in self._contrapartes.items()}
+        contraparte = getattr(transacao, 'contraparte', None)
+        if contraparte is not None:
+            if self._contrapartes is None:
+                self._contrapartes = {}
+            self._contrapartes[posicao] = contraparte
+        self._tipos.insert(posicao, transacao.codigo)
+        self._centavos.insert(posicao, transacao.valor_centavos)
+        self._microssegundos.insert(posicao, transacao.microssegundos)
+        self._agregar_inserida(transacao, posicao)
+
+    def materializar(self, indice: int) -> Transacao:
+        tipo = TIPOS_TRANSACAO[self._tipos[indice]]
+        transacao = tipo.de_centavos(self._centavos[indice], self._microssegundos[indice])
+        if self._contrapartes is not None:
+            contraparte = self._contrapartes.get(indice % len(self._tipos))
+            if contraparte is not None:
+                transacao.contraparte = contraparte
+        return transacao
+
+    def __len__(self):
+        return len(self._tipos)
+
+    def _posicao(self, microssegundos: int) -> int:
+        return bisect_left(self._microssegundos, microssegundos)
+
+    def _codigo_em(self, posicao: int) -> int:
+        return self._tipos[posicao]
+
+    def _transacao_em(self, posicao: int) -> Transacao:
+        return self.materializar(posicao)
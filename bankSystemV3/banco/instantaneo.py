@@ -0,0 +1,313 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import date
+
+from . import ganchos as _ganchos
+from .diario import Diario, reaplicar
+from .erros import CpfDuplicadoError
+from .modelo import Conta, PessoaFisica
+from .registro import Registro
+from .relogio import obter_relogio
+from .travas import obter_travas
+
+# Layout do arquivo (little-endian):
+#   cabeçalho | contas (registros de largura fixa, ordenados por número)
+#   | índice de usuários (cpf, deslocamento; ordenado por cpf) | dados dos usuários (tamanho + json)
+# As datas são gravadas como ordinal (date.toordinal); 0 representa "nunca".
+_MAGICO = b'BSV3'
+_VERSAO = 1
+_CABECALHO = struct.Struct('<4sHQQQQQ')
+_CONTA = struct.Struct('<q4s11sqHHii')
+_NUMERO = struct.Struct('<q')
+_INDICE_USUARIO = struct.Struct('<11sQ')
+_TAMANHO = struct.Struct('<I')
+
+def _ordinal(data):
+    return data.toordinal() if data is not None else 0
+
+def _data(ordinal):
+    return date.fromordinal(ordinal) if ordinal else None
+
+def _registro_conta(conta: Conta) -> bytes:
+    return _CONTA.pack(conta.numero, conta.agencia.encode(), conta.cliente.cpf.encode(),
+                       conta.saldo_centavos, conta.saques_realizados, conta.transacoes_realizadas,
+                       _ordinal(conta.ultima_data_saque), _ordinal(conta.ultima_data_transacao))
+
+def _dados_usuario(usuario: PessoaFisica) -> bytes:
+    return json.dumps([usuario.nome, usuario.data_nascimento.strftime('%d/%m/%Y'), usuario.endereco,
+                       [c.numero for c in usuario.contas]], ensure_ascii=False).encode()
+
+def gravar_instantaneo(registro: Registro, caminho: str):
+    # A posição do diário permite retomar a partir do instantâneo reaplicando só a cauda. Ela
+    # e o estado dos objetos são lidos com todas as travas de faixa obtidas: nenhuma movimentação
+    # (nem cadastro) fica pela metade, e o que estiver no instantâneo não é reaplicado depois.
+    travas = obter_travas().todas()
+    for trava in travas:
+        trava.acquire()
+    try:
+        posicao_diario = 0
+        if registro.diario is not None:
+            registro.diario.sincronizar()
+            posicao_diario = registro.diario.posicao()
+        # Só os objetos já criados (registro._contas, não registro.contas(), que hidrataria tudo).
+        contas = {conta.numero: _registro_conta(conta) for conta in list(registro._contas.values())}
+        usuarios = {usuario.cpf: _dados_usuario(usuario) for usuario in list(registro._usuarios.values())}
+    finally:
+        for trava in reversed(travas):
+            trava.release()
+    if isinstance(registro, RegistroInstantaneo):
+        # Os registros ainda não hidratados vão do mapa para o novo arquivo sem virar objetos;
+        # sem hidratação, ninguém os alterou desde o instantâneo de origem.
+        for numero, dados in registro.instantaneo.registros_contas():
+            contas.setdefault(numero, dados)
+        for cpf, dados in registro.instantaneo.registros_usuarios():
+            usuarios.setdefault(cpf, dados)
+    contas = [contas[numero] for numero in sorted(contas)]
+    usuarios = sorted(usuarios.items())
+
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'wb') as arquivo:
+        deslocamento_indice = _CABECALHO.size + len(contas) * _CONTA.size
+        deslocamento_dados = deslocamento_indice + len(usuarios) * _INDICE_USUARIO.size
+        arquivo.write(_CABECALHO.pack(_MAGICO, _VERSAO, len(contas), len(usuarios), posicao_diario,
+                                      deslocamento_indice, deslocamento_dados))
+        arquivo.writelines(contas)
+
+        bloco = bytearray()
+        dados = []
+        deslocamento = 0
+        for cpf, conteudo in usuarios:
+            bloco += _INDICE_USUARIO.pack(cpf.encode(), deslocamento)
+            dados.append(_TAMANHO.pack(len(conteudo)) + conteudo)
+            deslocamento += _TAMANHO.size + len(conteudo)
+        arquivo.write(bloco)
+        arquivo.writelines(dados)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    os.replace(temporario, caminho)
+
+class Instantaneo:
+    def __init__(self, caminho: str):
+        with open(caminho, 'rb') as arquivo:
+            self._mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        (magico, versao, self.total_contas, self.total_usuarios, self.posicao_diario,
+         self._deslocamento_indice, self._deslocamento_dados) = _CABECALHO.unpack_from(self._mapa, 0)
+        if magico != _MAGICO or versao != _VERSAO:
+            self._mapa.close()
+            raise ValueError(f"Arquivo de instantâneo inválido: {caminho}")
+
+    def __len__(self):
+        return self.total_contas
+
+    def fechar(self):
+        self._mapa.close()
+
+    def _posicao_conta(self, numero: int):
+        mapa, inicio, tamanho = self._mapa, _CABECALHO.size, _CONTA.size
+        baixo, alto = 0, self.total_contas
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            atual = _NUMERO.unpack_from(mapa, inicio + meio * tamanho)[0]
+            if atual < numero:
+                baixo = meio + 1
+            elif atual > numero:
+                alto = meio
+            else:
+                return inicio + meio * tamanho
+        return None
+
+    def contem_conta(self, numero: int) -> bool:
+        return self._posicao_conta(numero) is not None
+
+    def saldo_centavos(self, numero: int):
+        posicao = self._posicao_conta(numero)
+        if posicao is None:
+            return None
+        return _CONTA.unpack_from(self._mapa, posicao)[3]
+
+    def ler_conta(self, numero: int):
+        posicao = self._posicao_conta(numero)
+        if posicao is None:
+            return None
+        numero, agencia, cpf, saldo, saques, transacoes, dia_saque, dia_transacao = \
+            _CONTA.unpack_from(self._mapa, posicao)
+        return {'numero': numero, 'agencia': agencia.decode(), 'cpf': cpf.decode(), 'saldo_centavos': saldo,
+                'saques_realizados': saques, 'transacoes_realizadas': transacoes,
+                'ultima_data_saque': _data(dia_saque), 'ultima_data_transacao': _data(dia_transacao)}
+
+    def ultimo_numero(self) -> int:
+        return _NUMERO.unpack_from(self._mapa, _CABECALHO.size + (self.total_contas - 1) * _CONTA.size)[0]
+
+    def numeros(self):
+        mapa, inicio, tamanho = self._mapa, _CABECALHO.size, _CONTA.size
+        for i in range(self.total_contas):
+            yield _NUMERO.unpack_from(mapa, inicio + i * tamanho)[0]
+
+    def registros_contas(self):
+        # (número, registro cru) de cada conta, na ordem do arquivo.
+        mapa, inicio, tamanho = self._mapa, _CABECALHO.size, _CONTA.size
+        for i in range(self.total_contas):
+            posicao = inicio + i * tamanho
+            yield _NUMERO.unpack_from(mapa, posicao)[0], mapa[posicao:posicao + tamanho]
+
+    def registros_usuarios(self):
+        # (cpf, json cru) de cada usuário, na ordem do índice.
+        mapa, inicio, tamanho = self._mapa, self._deslocamento_indice, _INDICE_USUARIO.size
+        for i in range(self.total_usuarios):
+            cpf, deslocamento = _INDICE_USUARIO.unpack_from(mapa, inicio + i * tamanho)
+            posicao = self._deslocamento_dados + deslocamento
+            comprimento = _TAMANHO.unpack_from(mapa, posicao)[0]
+            yield cpf.decode(), mapa[posicao + _TAMANHO.size:posicao + _TAMANHO.size + comprimento]
+
+    def ler_usuario(self, cpf: str):
+        chave = cpf.encode()
+        mapa, inicio, tamanho = self._mapa, self._deslocamento_indice, _INDICE_USUARIO.size
+        baixo, alto = 0, self.total_usuarios
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            atual, deslocamento = _INDICE_USUARIO.unpack_from(mapa, inicio + meio * tamanho)
+            if atual < chave:
+                baixo = meio + 1
+            elif atual > chave:
+                alto = meio
+            else:
+                posicao = self._deslocamento_dados + deslocamento
+                comprimento = _TAMANHO.unpack_from(mapa, posicao)[0]
+                inicio_dados = posicao + _TAMANHO.size
+                return json.loads(mapa[inicio_dados:inicio_dados + comprimento])
+        return None
+
+    def cpfs(self):
+        mapa, inicio, tamanho = self._mapa, self._deslocamento_indice, _INDICE_USUARIO.size
+        for i in range(self.total_usuarios):
+            yield _INDICE_USUARIO.unpack_from(mapa, inicio + i * tamanho)[0].decode()
+
+class RegistroInstantaneo(Registro):
+    # Registro servido a partir de um instantâneo: usuários e contas só viram objetos
+    # quando consultados. As contas hidratadas começam com histórico vazio.
+    def __init__(self, instantaneo: Instantaneo, diario=None, alocador=None):
+        super().__init__(diario, alocador)
+        self.instantaneo = instantaneo
+        self._usuarios_novos = 0
+        self._contas_novas = 0
+        # Duas buscas simultâneas pelo mesmo usuário não criam duas cópias das contas dele.
+        self._trava_hidratacao = threading.Lock()
+        # As contas do instantâneo estão em ordem de número: a última é a maior.
+        if instantaneo.total_contas:
+            self.alocador.avancar(instantaneo.ultimo_numero())
+
+    def __len__(self):
+        return self.instantaneo.total_usuarios + self._usuarios_novos
+
+    @property
+    def total_contas(self) -> int:
+        return self.instantaneo.total_contas + self._contas_novas
+
+    def _hidratar_usuario(self, cpf: str):
+        with self._trava_hidratacao:
+            usuario = self._usuarios.get(cpf)
+            if usuario is not None:
+                return usuario
+            dados = self.instantaneo.ler_usuario(cpf)
+            if dados is None:
+                return None
+            nome, data_nascimento, endereco, numeros = dados
+            usuario = PessoaFisica(cpf, nome, data_nascimento, endereco)
+            # Contadores de um dia que já passou (instantâneo de ontem) não valem mais hoje.
+            hoje = obter_relogio().hoje()
+            for numero in numeros:
+                estado = self.instantaneo.ler_conta(numero)
+                conta = Conta(usuario, numero, estado['agencia'])
+                conta.saldo_centavos = estado['saldo_centavos']
+                conta.historico.definir_saldo_inicial(estado['saldo_centavos'])
+                conta.ultima_data_saque = estado['ultima_data_saque']
+                conta.ultima_data_transacao = estado['ultima_data_transacao']
+                if conta.ultima_data_saque == hoje:
+                    conta.saques_realizados = estado['saques_realizados']
+                if conta.ultima_data_transacao == hoje:
+                    conta.transacoes_realizadas = estado['transacoes_realizadas']
+                conta.diario = self.diario
+                self._contas[numero] = conta
+                usuario.adicionar_conta(conta)
+            # Publicado por último: quem o encontra no dicionário encontra também as contas.
+            self._usuarios[cpf] = usuario
+            return usuario
+
+    def _buscar_normalizado(self, cpf: str):
+        try:
+            cpf = PessoaFisica._validar_cpf(cpf)
+        except ValueError:
+            return None
+        usuario = self._usuarios.get(cpf)
+        return usuario if usuario is not None else self._hidratar_usuario(cpf)
+
+    def buscar_conta(self, numero: int):
+        conta = self._contas.get(numero)
+        if conta is None:
+            estado = self.instantaneo.ler_conta(numero)
+            if estado is not None:
+                self._hidratar_usuario(estado['cpf'])
+                conta = self._contas.get(numero)
+        metricas = _ganchos.metricas
+        if metricas is not None:
+            metricas.contar_busca('conta', conta is not None)
+        return conta
+
+    def saldo_centavos(self, numero: int):
+        conta = self._contas.get(numero)
+        if conta is not None:
+            return conta.saldo_centavos
+        return self.instantaneo.saldo_centavos(numero)
+
+    def adicionar_usuario(self, usuario: PessoaFisica) -> PessoaFisica:
+        if usuario.cpf not in self._usuarios and self.instantaneo.ler_usuario(usuario.cpf) is not None:
+            raise CpfDuplicadoError("Já existe um usuário cadastrado com este CPF.")
+        super().adicionar_usuario(usuario)
+        self._usuarios_novos += 1
+        return usuario
+
+    def adicionar_conta(self, conta: Conta) -> Conta:
+        if conta.numero not in self._contas and self.instantaneo.contem_conta(conta.numero):
+            raise ValueError(f"Já existe uma conta com o número {conta.numero}.")
+        super().adicionar_conta(conta)
+        self._contas_novas += 1
+        return conta
+
+    def _hidratar_tudo(self):
+        for cpf in self.instantaneo.cpfs():
+            if cpf not in self._usuarios:
+                self._hidratar_usuario(cpf)
+
+    def usuarios(self):
+        self._hidratar_tudo()
+        return super().usuarios()
+
+    def contas(self):
+        self._hidratar_tudo()
+        return super().contas()
+
+def restaurar(caminho_instantaneo: str, caminho_diario: str = None, politica: str = 'lote',
+              **opcoes) -> RegistroInstantaneo:
+    registro = RegistroInstantaneo(Instantaneo(caminho_instantaneo))
+    if caminho_diario is not None:
+        reaplicar(registro, caminho_diario, registro.instantaneo.posicao_diario)
+        registro.anexar_diario(Diario(caminho_diario, politica, **opcoes))
+    return registro
+
+class InstantaneoPeriodico:
+    def __init__(self, registro: Registro, caminho: str, intervalo: float = 300.0):
+        self.registro = registro
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self._ultimo = time.monotonic()
+
+    def verificar(self) -> bool:
+        if time.monotonic() - self._ultimo < self.intervalo:
+            return False
+        gravar_instantaneo(self.registro, self.caminho)
+        self._ultimo = time.monotonic()
+        return True
@@ -0,0 +1,227 @@
+from .erros import (ACEITA, LIMITE_SAQUES_DIARIOS_ATINGIDO,
+                    LIMITE_TRANSACOES_DIARIAS_ATINGIDO, LIMITE_VALOR_TRANSACOES_EXCEDIDO)
+from . import ganchos as _ganchos
+from .moeda import formatar_centavos
+from .relogio import fim_do_dia_local
+
+# Limitadores de contagem e de valor por chave (ex.: número da conta), em dia civil ou em janela
+# móvel. Instantes em microssegundos. Verificar e registrar são O(1) amortizados e o estado de
+# cada chave é uma lista curta: [eventos, valor, ...]. As classes Limitador* não dependem do
+# modelo e o V2 as importa daqui; o fim do dia de LimitadorDiario vem por parâmetro.
+UM_DIA = 86_400_000_000
+
+# Resultado de Limitador.verificar.
+LIVRE, EXCEDE_EVENTOS, EXCEDE_VALOR = 0, 1, 2
+
+class Limitador:
+    __slots__ = ('max_eventos', 'max_valor', '_estados')
+
+    def __init__(self, max_eventos: int = None, max_valor: int = None):
+        self.max_eventos = max_eventos
+        self.max_valor = max_valor
+        self._estados = {}
+
+    def __len__(self):
+        return len(self._estados)
+
+    def verificar(self, chave, agora: int, valor: int = 0) -> int:
+        estado = self._estados.get(chave)
+        if estado is None:
+            eventos = total = 0
+        else:
+            self._expirar(estado, agora)
+            eventos, total = estado[0], estado[1]
+        if self.max_eventos is not None and eventos >= self.max_eventos:
+            return EXCEDE_EVENTOS
+        if self.max_valor is not None and total + valor > self.max_valor:
+            return EXCEDE_VALOR
+        return LIVRE
+
+    def tentar(self, chave, agora: int, valor: int = 0) -> int:
+        resultado = self.verificar(chave, agora, valor)
+        if resultado == LIVRE:
+            self.registrar(chave, agora, valor)
+        return resultado
+
+    def uso(self, chave, agora: int) -> tuple:
+        # (eventos, valor) que ainda contam no instante `agora`.
+        estado = self._estados.get(chave)
+        if estado is None:
+            return 0, 0
+        self._expirar(estado, agora)
+        return estado[0], estado[1]
+
+    def esquecer(self, chave):
+        self._estados.pop(chave, None)
+
+    def compactar(self, agora: int) -> int:
+        # Descarta as chaves sem nada dentro da janela; retorna quantas saíram.
+        vazias = [chave for chave, estado in self._estados.items() if not self._expirar(estado, agora)[0]]
+        for chave in vazias:
+            del self._estados[chave]
+        return len(vazias)
+
+class LimitadorDiario(Limitador):
+    # Dia civil: tudo zera na virada. Estado: [eventos, valor, fim do dia em microssegundos].
+    # `fim_do_dia(instante)` devolve o início do dia seguinte; o padrão é o fuso local do banco.
+    __slots__ = ('fim_do_dia',)
+
+    def __init__(self, max_eventos: int = None, max_valor: int = None, fim_do_dia=fim_do_dia_local):
+        super().__init__(max_eventos, max_valor)
+        self.fim_do_dia = fim_do_dia
+
+    def _expirar(self, estado: list, agora: int) -> list:
+        if agora >= estado[2]:
+            estado[0] = estado[1] = 0
+            estado[2] = self.fim_do_dia(agora)
+        return estado
+
+    def registrar(self, chave, agora: int, valor: int = 0):
+        estado = self._estados.get(chave)
+        if estado is None:
+            self._estados[chave] = [1, valor, self.fim_do_dia(agora)]
+            return
+        self._expirar(estado, agora)
+        estado[0] += 1
+        estado[1] += valor
+
+    def liberado_em(self, chave, agora: int, valor: int = 0) -> int:
+        # Primeiro instante em que `verificar(chave, instante, valor)` passa (None se nunca passa).
+        if self.max_valor is not None and valor > self.max_valor:
+            return None
+        if self.verificar(chave, agora, valor) == LIVRE:
+            return agora
+        estado = self._estados.get(chave)
+        return estado[2] if estado is not None else None
+
+class LimitadorMovel(Limitador):
+    # Janela móvel de `janela` microssegundos. Estado: [eventos, valor] seguido de entradas
+    # (último instante, eventos, valor) em ordem cronológica; eventos no mesmo balde de
+    # `resolucao` microssegundos dividem uma entrada, que só expira quando o mais recente
+    # deles sai da janela (nunca libera antes da hora). Com limite de eventos a resolução
+    # padrão é exata (1 us) e há no máximo `max_eventos` entradas; só com limite de valor,
+    # um minuto por balde em 24 h dá no máximo 1441 entradas.
+    __slots__ = ('janela', 'resolucao')
+
+    def __init__(self, max_eventos: int = None, max_valor: int = None, janela: int = UM_DIA,
+                 resolucao: int = None):
+        super().__init__(max_eventos, max_valor)
+        self.janela = janela
+        if resolucao is None:
+            resolucao = 1 if max_eventos is not None else max(janela // 1440, 1)
+        self.resolucao = resolucao
+
+    def _expirar(self, estado: list, agora: int) -> list:
+        limite = agora - self.janela
+        fim = 2
+        while fim < len(estado) and estado[fim] <= limite:
+            estado[0] -= estado[fim + 1]
+            estado[1] -= estado[fim + 2]
+            fim += 3
+        if fim > 2:
+            del estado[2:fim]
+        return estado
+
+    def registrar(self, chave, agora: int, valor: int = 0):
+        estado = self._estados.get(chave)
+        if estado is None:
+            self._estados[chave] = [1, valor, agora, 1, valor]
+            return
+        self._expirar(estado, agora)
+        estado[0] += 1
+        estado[1] += valor
+        if len(estado) > 2 and estado[-3] // self.resolucao == agora // self.resolucao:
+            estado[-3] = agora
+            estado[-2] += 1
+            estado[-1] += valor
+        else:
+            estado += (agora, 1, valor)
+
+    def liberado_em(self, chave, agora: int, valor: int = 0) -> int:
+        if self.max_valor is not None and valor > self.max_valor:
+            return None
+        if self.verificar(chave, agora, valor) == LIVRE:
+            return agora
+        # Percorre as entradas da mais antiga até que as que saírem da janela abram espaço.
+        estado = self._estados[chave]
+        eventos, total = estado[0], estado[1]
+        for posicao in range(2, len(estado), 3):
+            eventos -= estado[posicao + 1]
+            total -= estado[posicao + 2]
+            if ((self.max_eventos is None or eventos < self.max_eventos)
+                    and (self.max_valor is None or total + valor <= self.max_valor)):
+                return estado[posicao] + self.janela
+        return None
+
+def _periodo(limitador: Limitador) -> str:
+    if isinstance(limitador, LimitadorMovel):
+        return f"nas últimas {limitador.janela / 3_600_000_000:g} h"
+    return "por dia"
+
+class LimitesConta:
+    # Limites adicionais por conta, além dos contadores diários de Conta: `saques` vale para
+    # todo débito (Saque e a origem de uma Transferencia: eventos e valor) e `transacoes` para
+    # toda movimentação (numa transferência, nas duas contas). Consultados por
+    # Transacao.verificar e gravados quando a transação é aceita; desativados por padrão,
+    # quando o caminho quente só testa `ganchos.limites is None`.
+    __slots__ = ('saques', 'transacoes')
+
+    def __init__(self, saques: Limitador = None, transacoes: Limitador = None):
+        self.saques = saques
+        self.transacoes = transacoes
+
+    def verificar(self, conta, transacao) -> int:
+        agora = transacao.microssegundos
+        if self.saques is not None and transacao.sinal < 0:
+            resultado = self.saques.verificar(conta.numero, agora, transacao.valor_centavos)
+            if resultado:
+                # Pelo valor, é o total sacado no período, não o limite por saque.
+                return (LIMITE_SAQUES_DIARIOS_ATINGIDO if resultado == EXCEDE_EVENTOS
+                        else LIMITE_VALOR_TRANSACOES_EXCEDIDO)
+        if self.transacoes is not None:
+            resultado = self.transacoes.verificar(conta.numero, agora, transacao.valor_centavos)
+            if not resultado and transacao.codigo == 2:
+                resultado = self.transacoes.verificar(transacao.contraparte.numero, agora, transacao.valor_centavos)
+            if resultado:
+                return (LIMITE_TRANSACOES_DIARIAS_ATINGIDO if resultado == EXCEDE_EVENTOS
+                        else LIMITE_VALOR_TRANSACOES_EXCEDIDO)
+        return ACEITA
+
+    def registrar(self, conta, transacao):
+        agora, valor = transacao.microssegundos, transacao.valor_centavos
+        if self.saques is not None and transacao.sinal < 0:
+            self.saques.registrar(conta.numero, agora, valor)
+        if self.transacoes is not None:
+            self.transacoes.registrar(conta.numero, agora, valor)
+            if transacao.codigo == 2:
+                self.transacoes.registrar(transacao.contraparte.numero, agora, valor)
+
+    def motivo_valor(self, conta, transacao) -> str:
+        # Mensagem de LIMITE_VALOR_TRANSACOES_EXCEDIDO: refaz a verificação para dizer qual
+        # limite (o de saques ou o de movimentações) a transação ultrapassou.
+        agora, valor = transacao.microssegundos, transacao.valor_centavos
+        saques = self.saques
+        if (saques is not None and transacao.sinal < 0 and conta is not None
+                and saques.verificar(conta.numero, agora, valor) == EXCEDE_VALOR):
+            return (f"O total sacado excederia o limite de {formatar_centavos(saques.max_valor)} "
+                    f"{_periodo(saques)}.")
+        if self.transacoes is not None and self.transacoes.max_valor is not None:
+            return (f"O valor movimentado excederia o limite de {formatar_centavos(self.transacoes.max_valor)} "
+                    f"{_periodo(self.transacoes)}.")
+        return "Limite de valor movimentado atingido."
+
+    def liberado_em(self, conta, agora: int, codigo: int):
+        # Instante em que a recusa `codigo` deixa de valer para a conta (None se não depende destes limites).
+        if codigo == LIMITE_SAQUES_DIARIOS_ATINGIDO and self.saques is not None:
+            return self.saques.liberado_em(conta.numero, agora)
+        if codigo == LIMITE_TRANSACOES_DIARIAS_ATINGIDO and self.transacoes is not None:
+            return self.transacoes.liberado_em(conta.numero, agora)
+        return None
+
+def definir_limites(limites: LimitesConta) -> LimitesConta:
+    # Retorna os limites anteriores; None desativa.
+    anteriores, _ganchos.limites = _ganchos.limites, limites
+    return anteriores
+
+def obter_limites() -> LimitesConta:
+    return _ganchos.limites
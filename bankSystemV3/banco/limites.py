@@ -0,0 +1,4 @@
+LIMITE_TRANSACOES_DIARIAS = 10
+LIMITE_SAQUES_DIARIOS = 3
+LIMITE_VALOR_SAQUE_CENTAVOS = 50_000
+LIMITE_VALOR_SAQUE = LIMITE_VALOR_SAQUE_CENTAVOS / 100
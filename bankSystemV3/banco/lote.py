@@ -0,0 +1,122 @@
+from array import array
+
+from .erros import (CONTA_INEXISTENTE, LIMITE_SAQUE_EXCEDIDO, LIMITE_SAQUES_DIARIOS_ATINGIDO,
+                    LIMITE_TRANSACOES_DIARIAS_ATINGIDO, SALDO_INSUFICIENTE, VALOR_INVALIDO)
+from . import ganchos as _ganchos
+from .limites import LIMITE_SAQUES_DIARIOS, LIMITE_TRANSACOES_DIARIAS, LIMITE_VALOR_SAQUE_CENTAVOS
+from .modelo import TIPOS_TRANSACAO, Deposito, Saque, Transferencia
+from .relogio import obter_relogio
+from .travas import obter_travas, trava_da_conta
+
+_SAQUE, _DEPOSITO = Saque.codigo, Deposito.codigo
+
+def aplicar_lote(registro, numeros, codigos, centavos) -> array:
+    # Aplica depósitos e saques dados em arrays paralelos (número da conta, código do tipo,
+    # centavos) e devolve um status por linha (ver banco.erros) em vez de exceções. As linhas
+    # são agrupadas por conta: cada conta é travada uma vez, os contadores e o saldo ficam em
+    # variáveis locais e só as linhas aceitas viram objetos no histórico. Dentro de uma conta
+    # vale a ordem de entrada, e a precedência das validações é a mesma de Saque/Deposito.
+    total = len(numeros)
+    status = array('b', bytes(total))
+    grupos = {}
+    for posicao, numero in enumerate(numeros):
+        posicoes = grupos.get(numero)
+        if posicoes is None:
+            grupos[numero] = [posicao]
+        else:
+            posicoes.append(posicao)
+
+    relogio = obter_relogio()
+    hoje = relogio.hoje()
+    agora = relogio.agora_microssegundos()
+    limites = _ganchos.limites
+    emitir = _ganchos.emitir
+    for numero, posicoes in grupos.items():
+        conta = registro.buscar_conta(numero)
+        if conta is None:
+            for posicao in posicoes:
+                status[posicao] = CONTA_INEXISTENTE
+            continue
+        with trava_da_conta(numero):
+            conta._renovar_contadores(hoje, saque=True)
+            saldo, saques, transacoes = conta.saldo_centavos, conta.saques_realizados, conta.transacoes_realizadas
+            diario, adicionar = conta.diario, conta.historico.adicionar_transacao
+            # Os eventos das linhas aceitas saem depois da trava, como em Saque/Deposito.
+            aceitas = [] if emitir is not None else None
+            try:
+                for posicao in posicoes:
+                    codigo, valor = codigos[posicao], centavos[posicao]
+                    if codigo == _SAQUE:
+                        if valor > saldo:
+                            status[posicao] = SALDO_INSUFICIENTE
+                            continue
+                        if valor > LIMITE_VALOR_SAQUE_CENTAVOS:
+                            status[posicao] = LIMITE_SAQUE_EXCEDIDO
+                            continue
+                        if saques >= LIMITE_SAQUES_DIARIOS:
+                            status[posicao] = LIMITE_SAQUES_DIARIOS_ATINGIDO
+                            continue
+                    elif codigo != _DEPOSITO:
+                        status[posicao] = VALOR_INVALIDO
+                        continue
+                    if valor <= 0:
+                        status[posicao] = VALOR_INVALIDO
+                        continue
+                    if transacoes >= LIMITE_TRANSACOES_DIARIAS:
+                        status[posicao] = LIMITE_TRANSACOES_DIARIAS_ATINGIDO
+                        continue
+                    transacao = TIPOS_TRANSACAO[codigo].de_centavos(valor, agora)
+                    if limites is not None:
+                        recusa = limites.verificar(conta, transacao)
+                        if recusa:
+                            status[posicao] = recusa
+                            continue
+                    if diario is not None:
+                        diario.registrar_transacao(conta, transacao)
+                    if codigo == _SAQUE:
+                        saldo -= valor
+                        saques += 1
+                    else:
+                        saldo += valor
+                    transacoes += 1
+                    adicionar(transacao)
+                    if limites is not None:
+                        limites.registrar(conta, transacao)
+                    if aceitas is not None:
+                        aceitas.append(transacao)
+            finally:
+                # Mesmo se o diário falhar no meio, o estado reflete as linhas já aplicadas.
+                conta.saldo_centavos, conta.saques_realizados, conta.transacoes_realizadas = saldo, saques, transacoes
+        if aceitas:
+            for transacao in aceitas:
+                emitir(numero, transacao)
+    metricas = _ganchos.metricas
+    if metricas is not None:
+        # Linhas com tipo desconhecido não têm tipo a que somar a recusa.
+        metricas.contar_lote((TIPOS_TRANSACAO[codigo], resultado) for codigo, resultado in zip(codigos, status)
+                             if codigo == _SAQUE or codigo == _DEPOSITO)
+    return status
+
+def executar_transferencias(transferencias) -> array:
+    # Recebe (origem, destino, centavos) de uma lista ou iterador e devolve um status por
+    # transferência (ver banco.erros), sem exceções nem mensagens. As duas travas de cada transferência
+    # são obtidas em ordem de faixa, então lotes concorrentes nunca entram em impasse.
+    travas = obter_travas()
+    relogio = obter_relogio()
+    emitir = _ganchos.emitir
+    status = array('b')
+    for origem, destino, centavos in transferencias:
+        transferencia = Transferencia.de_centavos(centavos, relogio.agora_microssegundos(), destino)
+        primeira, segunda = travas.par(origem.numero, destino.numero)
+        with primeira, segunda:
+            hoje = relogio.hoje()
+            origem._renovar_contadores(hoje, saque=True)
+            destino._renovar_contadores(hoje)
+            resultado = transferencia._aplicar(origem)
+        status.append(resultado)
+        if not resultado and emitir is not None:
+            emitir(origem.numero, transferencia)
+    metricas = _ganchos.metricas
+    if metricas is not None:
+        metricas.contar_lote((Transferencia, resultado) for resultado in status)
+    return status
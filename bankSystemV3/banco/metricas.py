@@ -0,0 +1,207 @@
+import os
+from bisect import bisect_left
+from time import perf_counter_ns
+
+from . import ganchos as _ganchos
+from .erros import ERROS_TRANSACAO
+
+# Métricas de operação: contadores por operação e resultado e histogramas de latência de
+# Transacao.registrar/tentar_registrar, exportáveis no formato de exposição de texto do Prometheus.
+# Desativadas por padrão: o caminho quente só testa `ganchos.metricas is None`. As buscas no registro
+# e as linhas das operações em lote são só contadas; cronometrar uma busca de ~100 ns custaria
+# mais que a própria busca.
+
+# Limites superiores dos baldes de latência, em segundos.
+LIMITES_LATENCIA = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2)
+
+# Rótulo `resultado` de cada código de status (ver banco.erros): a posição é o código.
+RESULTADOS = ('ok',) + tuple(erro.__name__ for erro in ERROS_TRANSACAO) + ('ContaInexistente',)
+# Depois dos códigos, cada lista de contagens guarda quantas chamadas faltam para a próxima
+# amostra (0: a próxima é cronometrada) e o histograma de latência do tipo (None até a primeira).
+_RESTANTES = len(RESULTADOS)
+_HISTOGRAMA = _RESTANTES + 1
+
+# Uma chamada cronometrada a cada 64: o relógio e o histograma custam mais que a própria
+# contagem, e diluídos assim ficam abaixo de META_METRICAS no benchmark `metricas`.
+AMOSTRAGEM_PADRAO = 64
+
+class Histograma:
+    __slots__ = ('limites', 'contagens', 'soma', 'total')
+
+    def __init__(self, limites=LIMITES_LATENCIA):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def acumulado(self):
+        # Contagens cumulativas por limite (o último é +Inf), como o Prometheus espera.
+        total = 0
+        for limite, contagem in zip(self.limites + (float('inf'),), self.contagens):
+            total += contagem
+            yield limite, total
+
+class _Fatia:
+    # Parte das métricas gravada por uma única thread: o caminho quente não precisa de trava.
+    __slots__ = ('transacoes', 'falhas', 'buscas')
+
+    def __init__(self):
+        self.transacoes = {}   # classe da transação -> [contagem por código..., chamadas, histograma]
+        self.falhas = {}       # (classe, nome da exceção inesperada) -> contagem
+        self.buscas = {}       # (alvo, resultado) -> contagem
+
+class Metricas:
+    # Os contadores são exatos; a latência é cronometrada em uma a cada `amostragem` chamadas
+    # de cada tipo e thread, aceitas ou recusadas (1 cronometra todas), porque ler o relógio
+    # duas vezes custa mais que contar.
+    __slots__ = ('limites', 'amostragem', '_local', '_fatias')
+
+    def __init__(self, limites=LIMITES_LATENCIA, amostragem: int = AMOSTRAGEM_PADRAO):
+        self.limites = limites
+        self.amostragem = amostragem
+        from threading import local
+
+        self._local = local()
+        self._fatias = []
+
+    def _fatia(self) -> _Fatia:
+        fatia = self._local.__dict__.get('fatia')
+        if fatia is None:
+            fatia = self._local.fatia = _Fatia()
+            self._local.transacoes = fatia.transacoes
+            self._fatias.append(fatia)
+        return fatia
+
+    def _contagens(self, classe) -> list:
+        transacoes = self._fatia().transacoes
+        contagens = transacoes.get(classe)
+        if contagens is None:
+            contagens = transacoes[classe] = [0] * (_RESTANTES + 1) + [None]
+        return contagens
+
+    def registrar_transacao(self, transacao, conta) -> int:
+        # Envolve Transacao._tentar_registrar: conta o código devolvido e, nas chamadas
+        # amostradas, a latência. Fora da amostra o custo é uma busca e dois incrementos.
+        classe = transacao.__class__
+        try:
+            contagens = self._local.transacoes[classe]
+        except (AttributeError, KeyError):
+            contagens = self._contagens(classe)
+        restantes = contagens[_RESTANTES]
+        try:
+            if restantes:
+                contagens[_RESTANTES] = restantes - 1
+                codigo = transacao._tentar_registrar(conta)
+            else:
+                contagens[_RESTANTES] = self.amostragem - 1
+                inicio = perf_counter_ns()
+                codigo = transacao._tentar_registrar(conta)
+                duracao = perf_counter_ns() - inicio
+                histograma = contagens[_HISTOGRAMA]
+                if histograma is None:
+                    histograma = contagens[_HISTOGRAMA] = Histograma(self.limites)
+                histograma.observar(duracao / 1e9)
+        except Exception as erro:
+            self._contar_falha(classe, type(erro).__name__)
+            raise
+        contagens[codigo] += 1
+        return codigo
+
+    def _contar_falha(self, classe, nome: str):
+        falhas = self._fatia().falhas
+        falhas[classe, nome] = falhas.get((classe, nome), 0) + 1
+
+    def contar_lote(self, resultados):
+        # Linhas de uma operação em lote, como pares (classe da transação, código de status).
+        # Só contadas: as linhas não são chamadas individuais, não há latência por linha nem
+        # avançam a amostragem.
+        totais = {}
+        for par in resultados:
+            totais[par] = totais.get(par, 0) + 1
+        for (classe, codigo), total in totais.items():
+            contagens = self._contagens(classe)
+            contagens[codigo] += total
+
+    def contar_busca(self, alvo: str, encontrado: bool):
+        try:
+            fatia = self._local.fatia
+        except AttributeError:
+            fatia = self._fatia()
+        chave = (alvo, 'encontrado' if encontrado else 'ausente')
+        fatia.buscas[chave] = fatia.buscas.get(chave, 0) + 1
+
+    def _somar(self):
+        # Junta as fatias de todas as threads (cópias: as threads seguem gravando nas suas).
+        transacoes, buscas, latencias = {}, {}, {}
+        for fatia in list(self._fatias):
+            for classe, contagens in dict(fatia.transacoes).items():
+                contagens = list(contagens)
+                for resultado, total in zip(RESULTADOS, contagens):
+                    if total:
+                        chave = (classe.__name__, resultado)
+                        transacoes[chave] = transacoes.get(chave, 0) + total
+                histograma = contagens[_HISTOGRAMA]
+                if histograma is not None:
+                    soma = latencias.get(classe.__name__)
+                    if soma is None:
+                        soma = latencias[classe.__name__] = Histograma(self.limites)
+                    soma.contagens = [a + b for a, b in zip(soma.contagens, histograma.contagens)]
+                    soma.soma += histograma.soma
+                    soma.total += histograma.total
+            for (classe, nome), total in dict(fatia.falhas).items():
+                chave = (classe.__name__, nome)
+                transacoes[chave] = transacoes.get(chave, 0) + total
+            for chave, total in dict(fatia.buscas).items():
+                buscas[chave] = buscas.get(chave, 0) + total
+        return transacoes, buscas, latencias
+
+    def exportar(self) -> str:
+        transacoes, buscas, latencias = self._somar()
+        transacoes, buscas = sorted(transacoes.items()), sorted(buscas.items())
+        latencias = sorted((tipo, list(h.acumulado()), h.soma, h.total) for tipo, h in latencias.items())
+        linhas = [
+            "# HELP banco_transacoes_total Transações registradas por tipo e resultado.",
+            "# TYPE banco_transacoes_total counter",
+        ]
+        linhas += [f'banco_transacoes_total{{tipo="{tipo}",resultado="{resultado}"}} {total}'
+                   for (tipo, resultado), total in transacoes]
+        linhas += [
+            "# HELP banco_registrar_segundos Latência de Transacao.registrar/tentar_registrar por tipo (chamadas amostradas).",
+            "# TYPE banco_registrar_segundos histogram",
+        ]
+        for tipo, baldes, soma, total in latencias:
+            for limite, acumulado in baldes:
+                le = '+Inf' if limite == float('inf') else repr(limite)
+                linhas.append(f'banco_registrar_segundos_bucket{{tipo="{tipo}",le="{le}"}} {acumulado}')
+            linhas.append(f'banco_registrar_segundos_sum{{tipo="{tipo}"}} {soma!r}')
+            linhas.append(f'banco_registrar_segundos_count{{tipo="{tipo}"}} {total}')
+        linhas += [
+            "# HELP banco_buscas_total Buscas no registro por alvo e resultado.",
+            "# TYPE banco_buscas_total counter",
+        ]
+        linhas += [f'banco_buscas_total{{alvo="{alvo}",resultado="{resultado}"}} {total}'
+                   for (alvo, resultado), total in buscas]
+        return '\n'.join(linhas) + '\n'
+
+    def gravar(self, caminho: str):
+        # Escrita atômica: um coletor (ex.: textfile do node_exporter) nunca lê um arquivo pela metade.
+        temporario = f"{caminho}.tmp"
+        with open(temporario, 'w') as arquivo:
+            arquivo.write(self.exportar())
+        os.replace(temporario, caminho)
+
+def ativar_metricas(metricas: Metricas = None) -> Metricas:
+    _ganchos.metricas = metricas if metricas is not None else Metricas()
+    return _ganchos.metricas
+
+def desativar_metricas() -> Metricas:
+    anteriores, _ganchos.metricas = _ganchos.metricas, None
+    return anteriores
+
+def obter_metricas() -> Metricas:
+    return _ganchos.metricas
@@ -0,0 +1,540 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from datetime import datetime, date
+from itertools import islice
+from operator import attrgetter
+
+from .erros import (ACEITA, ERROS_TRANSACAO, LIMITE_SAQUE_EXCEDIDO, LIMITE_SAQUES_DIARIOS_ATINGIDO,
+                    LIMITE_TRANSACOES_DIARIAS_ATINGIDO, LIMITE_VALOR_TRANSACOES_EXCEDIDO, SALDO_INSUFICIENTE,
+                    VALOR_INVALIDO)
+from .limites import (LIMITE_TRANSACOES_DIARIAS, LIMITE_SAQUES_DIARIOS, LIMITE_VALOR_SAQUE,
+                      LIMITE_VALOR_SAQUE_CENTAVOS)
+from . import ganchos as _ganchos
+from .agregados import Agregados
+from .moeda import formatar_centavos, para_centavos
+from .relogio import de_microssegundos, instante_microssegundos, obter_relogio, para_microssegundos
+from .travas import obter_travas, trava_da_conta
+
+class Transacao(ABC):
+    __slots__ = ()
+
+    @classmethod
+    def de_centavos(cls, centavos: int, microssegundos: int = None):
+        transacao = cls.__new__(cls)
+        transacao.valor_centavos = centavos
+        transacao.microssegundos = (microssegundos if microssegundos is not None
+                                    else obter_relogio().agora_microssegundos())
+        return transacao
+
+    @property
+    def valor(self) -> float:
+        return self.valor_centavos / 100
+
+    @property
+    def data_hora(self) -> datetime:
+        return de_microssegundos(self.microssegundos)
+
+    def registrar(self, conta):
+        # Caminho com exceções: o mesmo de tentar_registrar, e a mensagem só é montada na recusa.
+        metricas = _ganchos.metricas
+        codigo = (self._tentar_registrar(conta) if metricas is None
+                  else metricas.registrar_transacao(self, conta))
+        if codigo:
+            raise self.erro(codigo, conta)
+
+    def tentar_registrar(self, conta) -> int:
+        # Registra na conta e devolve ACEITA ou o código da recusa (ver banco.erros), sem exceções.
+        metricas = _ganchos.metricas
+        if metricas is None:
+            return self._tentar_registrar(conta)
+        return metricas.registrar_transacao(self, conta)
+
+    @abstractmethod
+    def _tentar_registrar(self, conta) -> int:
+        pass
+
+    def erro(self, codigo: int, conta=None) -> Exception:
+        # `verificar` e `motivo` ficam nas subclasses: o código é barato, a mensagem só quando pedida.
+        if codigo == LIMITE_VALOR_TRANSACOES_EXCEDIDO:
+            # Só os limites configurados em banco.limitador recusam pelo valor movimentado.
+            limites = _ganchos.limites
+            motivo = (limites.motivo_valor(conta, self) if limites is not None
+                      else "Limite de valor movimentado atingido.")
+            return ERROS_TRANSACAO[codigo - 1](motivo)
+        return ERROS_TRANSACAO[codigo - 1](self.motivo(codigo, conta))
+
+    def _calcular_tempo_restante(self, conta=None):
+        relogio = obter_relogio()
+        segundos = relogio.segundos_ate_virada()
+        limites = _ganchos.limites
+        if limites is not None and conta is not None:
+            # Com limites de janela móvel a liberação não coincide com a virada do dia.
+            agora = relogio.agora_microssegundos()
+            liberado = limites.liberado_em(conta, agora, LIMITE_SAQUES_DIARIOS_ATINGIDO)
+            if liberado is not None and conta.saques_realizados < LIMITE_SAQUES_DIARIOS:
+                segundos = max(liberado - agora, 0) // 1_000_000
+        horas, resto = divmod(segundos, 3600)
+        minutos, segundos = divmod(resto, 60)
+        return f"{horas:02d}:{minutos:02d}:{segundos:02d}"
+
+class Saque(Transacao):
+    __slots__ = ('valor_centavos', 'microssegundos')
+    codigo = 1
+    sinal = -1
+
+    def __init__(self, valor: float, data_hora: datetime = None):
+        self.valor_centavos = para_centavos(valor)
+        self.microssegundos = (para_microssegundos(data_hora) if data_hora is not None
+                               else obter_relogio().agora_microssegundos())
+
+    def _tentar_registrar(self, conta) -> int:
+        # Validação e atualização sob a trava da conta: duas threads não passam juntas pela validação.
+        with trava_da_conta(conta.numero):
+            codigo = self.verificar(conta)
+            if codigo:
+                return codigo
+            if conta.diario is not None:
+                conta.diario.registrar_transacao(conta, self)
+            conta.saldo_centavos -= self.valor_centavos
+            conta.saques_realizados += 1
+            conta.transacoes_realizadas += 1
+            conta.historico.adicionar_transacao(self)
+            if _ganchos.limites is not None:
+                _ganchos.limites.registrar(conta, self)
+        emitir = _ganchos.emitir
+        if emitir is not None:
+            emitir(conta.numero, self)
+        return ACEITA
+
+    def verificar(self, conta) -> int:
+        valor = self.valor_centavos
+        if valor > conta.saldo_centavos:
+            return SALDO_INSUFICIENTE
+        if valor > LIMITE_VALOR_SAQUE_CENTAVOS:
+            return LIMITE_SAQUE_EXCEDIDO
+        if conta.saques_realizados >= LIMITE_SAQUES_DIARIOS:
+            return LIMITE_SAQUES_DIARIOS_ATINGIDO
+        if valor <= 0:
+            return VALOR_INVALIDO
+        if conta.transacoes_realizadas >= LIMITE_TRANSACOES_DIARIAS:
+            return LIMITE_TRANSACOES_DIARIAS_ATINGIDO
+        limites = _ganchos.limites
+        return limites.verificar(conta, self) if limites is not None else ACEITA
+
+    def motivo(self, codigo: int, conta=None) -> str:
+        if codigo == SALDO_INSUFICIENTE:
+            return "Saldo insuficiente para realizar o saque."
+        if codigo == LIMITE_SAQUE_EXCEDIDO:
+            return f"O valor do saque excede o limite permitido de {formatar_centavos(LIMITE_VALOR_SAQUE_CENTAVOS)}."
+        if codigo == LIMITE_SAQUES_DIARIOS_ATINGIDO:
+            return f"Limite de saques diários atingido. Tente novamente em {self._calcular_tempo_restante(conta)}."
+        if codigo == VALOR_INVALIDO:
+            return "O valor do saque deve ser positivo."
+        return "Limite de transações diárias atingido."
+
+class Deposito(Transacao):
+    __slots__ = ('valor_centavos', 'microssegundos')
+    codigo = 0
+    sinal = 1
+
+    def __init__(self, valor: float, data_hora: datetime = None):
+        self.valor_centavos = para_centavos(valor)
+        self.microssegundos = (para_microssegundos(data_hora) if data_hora is not None
+                               else obter_relogio().agora_microssegundos())
+
+    def _tentar_registrar(self, conta) -> int:
+        with trava_da_conta(conta.numero):
+            codigo = self.verificar(conta)
+            if codigo:
+                return codigo
+            if conta.diario is not None:
+                conta.diario.registrar_transacao(conta, self)
+            conta.saldo_centavos += self.valor_centavos
+            conta.transacoes_realizadas += 1
+            conta.historico.adicionar_transacao(self)
+            if _ganchos.limites is not None:
+                _ganchos.limites.registrar(conta, self)
+        emitir = _ganchos.emitir
+        if emitir is not None:
+            emitir(conta.numero, self)
+        return ACEITA
+
+    def verificar(self, conta) -> int:
+        if self.valor_centavos <= 0:
+            return VALOR_INVALIDO
+        if conta.transacoes_realizadas >= LIMITE_TRANSACOES_DIARIAS:
+            return LIMITE_TRANSACOES_DIARIAS_ATINGIDO
+        limites = _ganchos.limites
+        return limites.verificar(conta, self) if limites is not None else ACEITA
+
+    def motivo(self, codigo: int, conta=None) -> str:
+        if codigo == VALOR_INVALIDO:
+            return "O valor do depósito deve ser positivo."
+        return "Limite de transações diárias atingido."
+
+class Transferencia(Transacao):
+    # Débito na conta de origem; `contraparte` é a conta de destino. O crédito correspondente
+    # entra no histórico do destino como TransferenciaRecebida, com o mesmo valor e instante.
+    __slots__ = ('valor_centavos', 'microssegundos', 'contraparte')
+    codigo = 2
+    sinal = -1
+
+    def __init__(self, valor: float, destino: 'Conta', data_hora: datetime = None):
+        self.valor_centavos = para_centavos(valor)
+        self.microssegundos = (para_microssegundos(data_hora) if data_hora is not None
+                               else obter_relogio().agora_microssegundos())
+        self.contraparte = destino
+
+    @classmethod
+    def de_centavos(cls, centavos: int, microssegundos: int = None, contraparte: 'Conta' = None):
+        transacao = super().de_centavos(centavos, microssegundos)
+        transacao.contraparte = contraparte
+        return transacao
+
+    def _tentar_registrar(self, conta) -> int:
+        primeira, segunda = obter_travas().par(conta.numero, self.contraparte.numero)
+        with primeira, segunda:
+            codigo = self._aplicar(conta)
+        if not codigo:
+            emitir = _ganchos.emitir
+            if emitir is not None:
+                emitir(conta.numero, self)
+        return codigo
+
+    def _aplicar(self, conta) -> int:
+        # Débito e crédito juntos: ou as duas contas mudam, ou nenhuma. Quem chama já detém
+        # as travas das duas contas (obtidas com TravasPorFaixa.par).
+        codigo = self.verificar(conta)
+        if codigo:
+            return codigo
+        destino = self.contraparte
+        credito = TransferenciaRecebida.de_centavos(self.valor_centavos, self.microssegundos, conta)
+        if conta.diario is not None:
+            conta.diario.registrar_transferencia(conta, self)
+        conta.saldo_centavos -= self.valor_centavos
+        conta.saques_realizados += 1
+        conta.transacoes_realizadas += 1
+        destino.saldo_centavos += self.valor_centavos
+        destino.transacoes_realizadas += 1
+        conta.historico.adicionar_transacao(self)
+        destino.historico.adicionar_transacao(credito)
+        if _ganchos.limites is not None:
+            _ganchos.limites.registrar(conta, self)
+        return ACEITA
+
+    def verificar(self, conta) -> int:
+        valor, destino = self.valor_centavos, self.contraparte
+        if valor <= 0 or destino is conta:
+            return VALOR_INVALIDO
+        if valor > conta.saldo_centavos:
+            return SALDO_INSUFICIENTE
+        if valor > LIMITE_VALOR_SAQUE_CENTAVOS:
+            return LIMITE_SAQUE_EXCEDIDO
+        # Para a origem a transferência é um saque: conta no mesmo limite diário.
+        if conta.saques_realizados >= LIMITE_SAQUES_DIARIOS:
+            return LIMITE_SAQUES_DIARIOS_ATINGIDO
+        if (conta.transacoes_realizadas >= LIMITE_TRANSACOES_DIARIAS
+                or destino.transacoes_realizadas >= LIMITE_TRANSACOES_DIARIAS):
+            return LIMITE_TRANSACOES_DIARIAS_ATINGIDO
+        limites = _ganchos.limites
+        return limites.verificar(conta, self) if limites is not None else ACEITA
+
+    def motivo(self, codigo: int, conta=None) -> str:
+        if codigo == VALOR_INVALIDO:
+            if self.valor_centavos <= 0:
+                return "O valor da transferência deve ser positivo."
+            return "A conta de destino deve ser diferente da conta de origem."
+        if codigo == SALDO_INSUFICIENTE:
+            return "Saldo insuficiente para realizar a transferência."
+        if codigo == LIMITE_SAQUE_EXCEDIDO:
+            return f"O valor da transferência excede o limite permitido de {formatar_centavos(LIMITE_VALOR_SAQUE_CENTAVOS)}."
+        if codigo == LIMITE_SAQUES_DIARIOS_ATINGIDO:
+            return f"Limite de saques diários atingido. Tente novamente em {self._calcular_tempo_restante(conta)}."
+        return "Limite de transações diárias atingido."
+
+class TransferenciaRecebida(Transacao):
+    # Crédito de uma Transferencia; `contraparte` é a conta de origem.
+    __slots__ = ('valor_centavos', 'microssegundos', 'contraparte')
+    codigo = 3
+    sinal = 1
+
+    @classmethod
+    def de_centavos(cls, centavos: int, microssegundos: int = None, contraparte: 'Conta' = None):
+        transacao = super().de_centavos(centavos, microssegundos)
+        transacao.contraparte = contraparte
+        return transacao
+
+    def _tentar_registrar(self, conta) -> int:
+        raise TypeError("Transferências recebidas são registradas pela Transferencia de origem.")
+
+# A posição na tupla é o código usado no histórico colunar e no diário.
+TIPOS_TRANSACAO = (Deposito, Saque, Transferencia, TransferenciaRecebida)
+
+_microssegundos_da_transacao = attrgetter('microssegundos')
+
+class HistoricoBase:
+    # Consultas por período sobre um histórico em ordem cronológica: a busca binária
+    # localiza o início e o fim, e a iteração é preguiçosa a partir daí. A ordem é garantida
+    # no acréscimo: o instante é tomado antes da trava da conta, então uma movimentação pode
+    # chegar depois de outra mais recente; ela entra na posição do seu instante.
+    __slots__ = ()
+
+    def consultar(self, inicio=None, fim=None, tipo=None, cursor: int = None):
+        for _, transacao in self._percorrer(inicio, fim, tipo, cursor):
+            yield transacao
+
+    def pagina(self, inicio=None, fim=None, tipo=None, cursor: int = None, tamanho: int = 50):
+        itens = []
+        for posicao, transacao in self._percorrer(inicio, fim, tipo, cursor):
+            if len(itens) == tamanho:
+                return itens, posicao
+            itens.append(transacao)
+        return itens, None
+
+    def _posicoes(self, inicio, fim, tipo, cursor):
+        baixo = self._posicao(instante_microssegundos(inicio)) if inicio is not None else 0
+        if cursor is not None:
+            baixo = max(baixo, cursor)
+        alto = self._posicao(instante_microssegundos(fim)) if fim is not None else len(self)
+        if tipo is None:
+            return range(baixo, alto)
+        codigo, codigo_em = tipo.codigo, self._codigo_em
+        return (posicao for posicao in range(baixo, alto) if codigo_em(posicao) == codigo)
+
+    def _transacoes_nas(self, posicoes) -> list:
+        # Transações das `posicoes` (crescentes); um histórico fora da memória as busca de uma vez.
+        return list(map(self._transacao_em, posicoes))
+
+    def _percorrer(self, inicio, fim, tipo, cursor):
+        transacao_em = self._transacao_em
+        for posicao in self._posicoes(inicio, fim, tipo, cursor):
+            yield posicao, transacao_em(posicao)
+
+    def _agregar(self, transacao: Transacao):
+        if self._agregados is None:
+            self._agregados = Agregados()
+        self._agregados.registrar(transacao)
+
+    def _agregar_inserida(self, transacao: Transacao, posicao: int):
+        self.agregados.inserir(transacao, posicao)
+        cache = _ganchos.extrato
+        if cache is not None:
+            # As linhas guardadas seguem posições que acabaram de se deslocar.
+            cache.esquecer(self)
+
+    @property
+    def agregados(self) -> Agregados:
+        if self._agregados is None:
+            self._agregados = Agregados()
+        return self._agregados
+
+    def definir_saldo_inicial(self, centavos: int):
+        # Saldo anterior à primeira movimentação registrada (ex.: conta restaurada de um instantâneo).
+        if len(self):
+            raise ValueError("O saldo inicial só pode ser definido em um histórico vazio.")
+        self.agregados.saldo_inicial = centavos
+
+    def saldo_em(self, instante) -> int:
+        # Saldo em centavos imediatamente antes de `instante` (uma data indica o início do dia).
+        return self.agregados.saldo_antes_de(self._posicao(instante_microssegundos(instante)))
+
+    def totais_dia(self, dia) -> tuple:
+        return self.agregados.totais_dia(dia)
+
+    def totais_mes(self, ano: int, mes: int) -> tuple:
+        return self.agregados.totais_mes(ano, mes)
+
+    def listar_transacoes(self, inicio=None, fim=None, tipo=None, cursor: int = None, tamanho: int = None):
+        cache = _ganchos.extrato
+        if cache is not None:
+            # Com o cache, só as posições são resolvidas aqui; as linhas vêm prontas.
+            posicoes, proximo = self._posicoes(inicio, fim, tipo, cursor), None
+            if tamanho is not None:
+                posicoes = list(islice(posicoes, tamanho + 1))
+                if len(posicoes) > tamanho:
+                    proximo = posicoes.pop()
+            linhas = cache.linhas(self, posicoes)
+        else:
+            if tamanho is None:
+                transacoes, proximo = self.consultar(inicio, fim, tipo, cursor), None
+            else:
+                transacoes, proximo = self.pagina(inicio, fim, tipo, cursor, tamanho)
+            from .extrato import linha
+            linhas = [linha(transacao) for transacao in transacoes]
+        print('\n'.join(linhas) if linhas else "Não foram realizadas movimentações.")
+        return proximo
+
+class Historico(HistoricoBase):
+    __slots__ = ('transacoes', '_agregados')
+
+    def __init__(self):
+        self.transacoes = []
+        self._agregados = None
+
+    def __len__(self):
+        return len(self.transacoes)
+
+    def adicionar_transacao(self, transacao: Transacao):
+        transacoes = self.transacoes
+        if transacoes and transacao.microssegundos < transacoes[-1].microssegundos:
+            posicao = bisect_right(transacoes, transacao.microssegundos, key=_microssegundos_da_transacao)
+            transacoes.insert(posicao, transacao)
+            self._agregar_inserida(transacao, posicao)
+            return
+        transacoes.append(transacao)
+        self._agregar(transacao)
+
+    def _posicao(self, microssegundos: int) -> int:
+        return bisect_left(self.transacoes, microssegundos, key=_microssegundos_da_transacao)
+
+    def _codigo_em(self, posicao: int) -> int:
+        return self.transacoes[posicao].codigo
+
+    def _transacao_em(self, posicao: int) -> Transacao:
+        return self.transacoes[posicao]
+
+class Conta:
+    __slots__ = ('cliente', 'numero', 'agencia', 'saldo_centavos', 'limite_saque', 'limite_saques_diarios',
+                 'saques_realizados', 'transacoes_realizadas', 'historico', 'ultima_data_saque',
+                 'ultima_data_transacao', 'diario')
+
+    def __init__(self, cliente, numero: int, agencia: str = '0001', historico=None):
+        self.cliente = cliente
+        self.numero = numero
+        self.agencia = agencia
+        self.saldo_centavos = 0
+        self.limite_saque = LIMITE_VALOR_SAQUE
+        self.limite_saques_diarios = LIMITE_SAQUES_DIARIOS
+        self.saques_realizados = 0
+        self.transacoes_realizadas = 0
+        self.historico = historico if historico is not None else Historico()
+        self.ultima_data_saque = None
+        self.ultima_data_transacao = None
+        self.diario = None
+
+    @property
+    def saldo(self) -> float:
+        return self.saldo_centavos / 100
+
+    @saldo.setter
+    def saldo(self, valor: float):
+        self.saldo_centavos = para_centavos(valor)
+
+    def sacar(self, valor: float):
+        self.sacar_centavos(para_centavos(valor))
+
+    def sacar_centavos(self, centavos: int):
+        saque = Saque.de_centavos(centavos)
+        with trava_da_conta(self.numero):
+            self._renovar_contadores(obter_relogio().hoje(), saque=True)
+            saque.registrar(self)
+
+    def tentar_sacar_centavos(self, centavos: int) -> int:
+        # Como sacar_centavos, mas devolve ACEITA ou o código da recusa em vez de levantar.
+        saque = Saque.de_centavos(centavos)
+        with trava_da_conta(self.numero):
+            self._renovar_contadores(obter_relogio().hoje(), saque=True)
+            return saque.tentar_registrar(self)
+
+    def depositar(self, valor: float):
+        self.depositar_centavos(para_centavos(valor))
+
+    def depositar_centavos(self, centavos: int):
+        deposito = Deposito.de_centavos(centavos)
+        with trava_da_conta(self.numero):
+            self._renovar_contadores(obter_relogio().hoje())
+            deposito.registrar(self)
+
+    def tentar_depositar_centavos(self, centavos: int) -> int:
+        deposito = Deposito.de_centavos(centavos)
+        with trava_da_conta(self.numero):
+            self._renovar_contadores(obter_relogio().hoje())
+            return deposito.tentar_registrar(self)
+
+    def transferir(self, destino: 'Conta', valor: float):
+        self.transferir_centavos(destino, para_centavos(valor))
+
+    def transferir_centavos(self, destino: 'Conta', centavos: int):
+        transferencia = Transferencia.de_centavos(centavos, contraparte=destino)
+        primeira, segunda = obter_travas().par(self.numero, destino.numero)
+        with primeira, segunda:
+            hoje = obter_relogio().hoje()
+            self._renovar_contadores(hoje, saque=True)
+            destino._renovar_contadores(hoje)
+            transferencia.registrar(self)
+
+    def tentar_transferir_centavos(self, destino: 'Conta', centavos: int) -> int:
+        transferencia = Transferencia.de_centavos(centavos, contraparte=destino)
+        primeira, segunda = obter_travas().par(self.numero, destino.numero)
+        with primeira, segunda:
+            hoje = obter_relogio().hoje()
+            self._renovar_contadores(hoje, saque=True)
+            destino._renovar_contadores(hoje)
+            return transferencia.tentar_registrar(self)
+
+    def _renovar_contadores(self, hoje: date, saque: bool = False):
+        # Zera os contadores diários na primeira movimentação de um novo dia (chamado sob a trava).
+        if saque:
+            if self.ultima_data_saque is None or hoje > self.ultima_data_saque:
+                self.saques_realizados = 0
+            self.ultima_data_saque = hoje
+        
+        if self.ultima_data_transacao is None or hoje > self.ultima_data_transacao:
+            self.transacoes_realizadas = 0
+        self.ultima_data_transacao = hoje
+
+    def mostrar_extrato(self, inicio=None, fim=None, cursor: int = None, tamanho: int = None):
+        print(f"================ EXTRATO - Conta {self.numero} ================")
+        proximo = self.historico.listar_transacoes(inicio, fim, cursor=cursor, tamanho=tamanho)
+        print(f"Saldo atual: {formatar_centavos(self.saldo_centavos)}")
+        print("==============================================================")
+        return proximo
+
+    def verificar_consistencia(self) -> bool:
+        return self.historico.agregados.saldo_final == self.saldo_centavos
+
+class Cliente:
+    __slots__ = ('pessoa', 'endereco', 'contas')
+
+    def __init__(self, pessoa, endereco: str):
+        self.pessoa = pessoa
+        self.endereco = endereco
+        self.contas = []
+
+    @staticmethod
+    def realizar_transacao(conta: Conta, transacao: Transacao):
+        transacao.registrar(conta)
+
+    def adicionar_conta(self, conta: Conta):
+        self.contas.append(conta)
+
+class PessoaFisica(Cliente):
+    __slots__ = ('cpf', 'nome', 'data_nascimento')
+
+    def __init__(self, cpf: str, nome: str, data_nascimento: str, endereco: str):
+        super().__init__(self, endereco)
+        self.cpf = self._validar_cpf(cpf)
+        self.nome = nome
+        self.data_nascimento = self._validar_data_nascimento(data_nascimento)
+
+    @classmethod
+    def de_campos(cls, cpf: str, nome: str, data_nascimento: date, endereco: str):
+        # Campos já validados e normalizados (ex.: pela carga em massa): dispensa a validação.
+        pessoa = cls.__new__(cls)
+        Cliente.__init__(pessoa, pessoa, endereco)
+        pessoa.cpf, pessoa.nome, pessoa.data_nascimento = cpf, nome, data_nascimento
+        return pessoa
+
+    @staticmethod
+    def _validar_cpf(cpf: str) -> str:
+        cpf_limpo = cpf if cpf.isdecimal() else ''.join(c for c in cpf if c.isdecimal())
+        if len(cpf_limpo) != 11:
+            raise ValueError("CPF inválido. Deve conter 11 dígitos.")
+        return cpf_limpo
+
+    @staticmethod
+    def _validar_data_nascimento(data_nascimento: str) -> date:
+        try:
+            return datetime.strptime(data_nascimento, "%d/%m/%Y").date()
+        except ValueError:
+            raise ValueError("Data de nascimento inválida. Use o formato dd/mm/aaaa.")
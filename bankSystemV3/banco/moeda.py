@@ -0,0 +1,35 @@
+from .erros import ValorInvalidoError
+
+def para_centavos(valor: float) -> int:
+    return round(valor * 100)
+
+def converter_para_centavos(texto: str) -> int:
+    # Aceita "1234.56", "1234,56" e "1.234,56"; o último separador é o decimal.
+    texto = texto.strip().removeprefix('R$').strip()
+    negativo = texto.startswith('-')
+    if negativo or texto.startswith('+'):
+        texto = texto[1:]
+    if not any(c.isdigit() for c in texto):
+        raise ValorInvalidoError(f"Valor inválido: {texto!r}.")
+    posicao = max(texto.rfind(','), texto.rfind('.'))
+    if posicao == -1:
+        inteiros, decimais = texto, ''
+    else:
+        inteiros, decimais = texto[:posicao], texto[posicao + 1:]
+        separador_milhar = '.' if texto[posicao] == ',' else ','
+        inteiros = inteiros.replace(separador_milhar, '')
+    if not inteiros:
+        inteiros = '0'
+    if not (inteiros.isascii() and inteiros.isdigit()) or len(decimais) > 2 \
+            or (decimais and not (decimais.isascii() and decimais.isdigit())):
+        raise ValorInvalidoError(f"Valor inválido: {texto!r}. Use até duas casas decimais.")
+    centavos = int(inteiros) * 100 + int(decimais.ljust(2, '0'))
+    return -centavos if negativo else centavos
+
+def formatar_centavos(centavos: int) -> str:
+    sinal = '-' if centavos < 0 else ''
+    reais, resto = divmod(abs(centavos), 100)
+    return f"R$ {sinal}{reais}.{resto:02d}"
+
+def formatar_moeda(valor: float) -> str:
+    return formatar_centavos(para_centavos(valor))
@@ -0,0 +1,89 @@
+import os
+
+# Numeração de contas em blocos: cada thread reserva um bloco contíguo de `tamanho_bloco`
+# números por agência e distribui dali sem trava; só a reserva do bloco seguinte passa pela
+# trava. Com `caminho`, o fim da última reserva é gravado (escrita atômica com fsync) antes de
+# o bloco ser usado, e processos que dividem o arquivo serializam as reservas com um lock de
+# arquivo: nenhum número se repete, nem depois de reiniciar. O resto de um bloco não usado
+# quando o processo termina é pulado, não reaproveitado.
+# Os números são únicos no banco todo (o Registro, o diário e o instantâneo identificam a
+# conta só pelo número); a agência define de que bloco o número sai.
+
+def validar_agencia(agencia: str) -> str:
+    if not (isinstance(agencia, str) and len(agencia) == 4 and agencia.isascii() and agencia.isdigit()):
+        raise ValueError(f"Agência inválida: {agencia!r}. Use 4 dígitos (ex.: '0001').")
+    return agencia
+
+def _travar_arquivo(arquivo):
+    # Exclusivo entre processos até o arquivo ser fechado.
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        arquivo.seek(0)
+        msvcrt.locking(arquivo.fileno(), msvcrt.LK_LOCK, 1)
+    else:
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+
+class AlocadorNumeros:
+    def __init__(self, caminho: str = None, tamanho_bloco: int = 1_000, primeiro: int = 1, agencias=None):
+        self.caminho = caminho
+        self.tamanho_bloco = tamanho_bloco
+        # Agências aceitas; None aceita qualquer código de 4 dígitos.
+        self.agencias = frozenset(map(validar_agencia, agencias)) if agencias is not None else None
+        self.reservas = 0
+        self._proximo = primeiro   # início do próximo bloco, se o arquivo não disser mais
+        import threading
+
+        self._trava = threading.Lock()
+        self._local = threading.local()
+
+    def proximo(self, agencia: str = '0001') -> int:
+        blocos = self._local.__dict__.get('blocos')
+        if blocos is None:
+            blocos = self._local.blocos = {}
+        bloco = blocos.get(agencia)
+        if bloco is None or bloco[0] == bloco[1]:
+            # A agência é validada ao reservar: uma inválida nunca chega a ter bloco.
+            if self.agencias is not None and agencia not in self.agencias:
+                raise ValueError(f"Agência {agencia!r} não cadastrada.")
+            validar_agencia(agencia)
+            bloco = blocos[agencia] = self._reservar()
+        numero = bloco[0]
+        bloco[0] += 1
+        return numero
+
+    def avancar(self, numero: int):
+        # Garante que as próximas reservas comecem depois de `numero` (conta criada com número
+        # explícito, restaurada de um diário ou de um instantâneo).
+        if numero >= self._proximo:
+            with self._trava:
+                if numero >= self._proximo:
+                    self._proximo = numero + 1
+
+    def _reservar(self) -> list:
+        with self._trava:
+            inicio = self._proximo
+            if self.caminho is not None:
+                with open(f"{self.caminho}.trava", 'a+b') as trava:
+                    _travar_arquivo(trava)
+                    inicio = max(inicio, self._ler())
+                    self._gravar(inicio + self.tamanho_bloco)
+            self._proximo = inicio + self.tamanho_bloco
+            self.reservas += 1
+        return [inicio, inicio + self.tamanho_bloco]
+
+    def _ler(self) -> int:
+        try:
+            with open(self.caminho) as arquivo:
+                return int(arquivo.read())
+        except FileNotFoundError:
+            return 0
+
+    def _gravar(self, proximo: int):
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w') as arquivo:
+            arquivo.write(f"{proximo}\n")
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self.caminho)
@@ -0,0 +1,153 @@
+import multiprocessing
+import os
+from array import array
+
+from .erros import CONTA_INEXISTENTE, VALOR_INVALIDO
+from .eventos import SaidaNula, definir_saida
+from .modelo import TIPOS_TRANSACAO, Conta, Deposito, Saque
+
+# Livro particionado: as contas são distribuídas por `numero % particoes` entre processos
+# trabalhadores, cada um dono exclusivo das suas contas. O processo principal só roteia
+# lotes de operações (arrays de número, código do tipo e centavos) e junta os resultados,
+# então o trabalho sobre o modelo roda em paralelo, sem disputar o GIL.
+
+def _abrir(contas: dict, numeros, agencia: str):
+    for numero in numeros:
+        if numero not in contas:
+            contas[numero] = Conta(None, numero, agencia)
+    return len(contas)
+
+def _executar(contas: dict, numeros, codigos, centavos):
+    status = array('b', bytes(len(numeros)))
+    for i, numero in enumerate(numeros):
+        conta = contas.get(numero)
+        if conta is None:
+            status[i] = CONTA_INEXISTENTE
+            continue
+        if codigos[i] == Saque.codigo:
+            status[i] = conta.tentar_sacar_centavos(centavos[i])
+        elif codigos[i] == Deposito.codigo:
+            status[i] = conta.tentar_depositar_centavos(centavos[i])
+        else:
+            # Transferências envolvem duas contas, possivelmente em partições diferentes.
+            status[i] = VALOR_INVALIDO
+    return status
+
+def _saldo(contas: dict, numero: int):
+    conta = contas.get(numero)
+    return conta.saldo_centavos if conta is not None else None
+
+def _extrato(contas: dict, numero: int, cursor, tamanho: int):
+    conta = contas.get(numero)
+    if conta is None:
+        return None
+    itens, proximo = conta.historico.pagina(cursor=cursor, tamanho=tamanho)
+    return [(t.codigo, t.valor_centavos, t.microssegundos) for t in itens], proximo
+
+def _resumo(contas: dict):
+    return len(contas), sum(conta.saldo_centavos for conta in contas.values())
+
+_COMANDOS = {
+    'abrir': _abrir,
+    'executar': _executar,
+    'saldo': _saldo,
+    'extrato': _extrato,
+    'resumo': _resumo,
+}
+
+def _trabalhador(conexao):
+    contas = {}
+    # O resultado volta como status; os eventos das transações são descartados.
+    definir_saida(SaidaNula())
+    while True:
+        mensagem = conexao.recv()
+        if mensagem is None:
+            break
+        comando, argumentos = mensagem
+        conexao.send(_COMANDOS[comando](contas, *argumentos))
+    conexao.close()
+
+class LivroParticionado:
+    def __init__(self, particoes: int = None):
+        particoes = particoes or os.cpu_count() or 1
+        self._conexoes = []
+        self._processos = []
+        for _ in range(particoes):
+            local, remota = multiprocessing.Pipe()
+            processo = multiprocessing.Process(target=_trabalhador, args=(remota,), daemon=True)
+            processo.start()
+            remota.close()
+            self._conexoes.append(local)
+            self._processos.append(processo)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+    @property
+    def particoes(self) -> int:
+        return len(self._conexoes)
+
+    def particao(self, numero: int) -> int:
+        return numero % len(self._conexoes)
+
+    def _pedir(self, numero: int, comando: str, *argumentos):
+        conexao = self._conexoes[self.particao(numero)]
+        conexao.send((comando, argumentos))
+        return conexao.recv()
+
+    def _difundir(self, comando: str, argumentos_por_particao):
+        # Envia a todas as partições antes de esperar a primeira resposta: elas trabalham em paralelo.
+        for conexao, argumentos in zip(self._conexoes, argumentos_por_particao):
+            conexao.send((comando, argumentos))
+        return [conexao.recv() for conexao in self._conexoes]
+
+    def abrir_contas(self, numeros, agencia: str = '0001'):
+        lotes = [array('q') for _ in self._conexoes]
+        for numero in numeros:
+            lotes[numero % len(lotes)].append(numero)
+        self._difundir('abrir', [(lote, agencia) for lote in lotes])
+
+    def executar(self, numeros, codigos, centavos) -> array:
+        # Retorna um status por operação (ver banco.erros); a ordem entre operações da mesma
+        # conta é preservada porque todas vão, na ordem original, para a mesma partição.
+        total = len(self._conexoes)
+        lotes = [(array('q'), array('b'), array('q'), array('q')) for _ in range(total)]
+        for posicao, numero in enumerate(numeros):
+            lote_numeros, lote_codigos, lote_centavos, posicoes = lotes[numero % total]
+            lote_numeros.append(numero)
+            lote_codigos.append(codigos[posicao])
+            lote_centavos.append(centavos[posicao])
+            posicoes.append(posicao)
+        respostas = self._difundir('executar', [lote[:3] for lote in lotes])
+        status = array('b', bytes(len(numeros)))
+        for (_, _, _, posicoes), resposta in zip(lotes, respostas):
+            for posicao, codigo in zip(posicoes, resposta):
+                status[posicao] = codigo
+        return status
+
+    def saldo_centavos(self, numero: int):
+        return self._pedir(numero, 'saldo', numero)
+
+    def extrato(self, numero: int, cursor: int = None, tamanho: int = 50):
+        # Devolve (transações, próximo cursor), reconstruindo Deposito/Saque a partir da partição.
+        resposta = self._pedir(numero, 'extrato', numero, cursor, tamanho)
+        if resposta is None:
+            return None
+        itens, proximo = resposta
+        return [TIPOS_TRANSACAO[codigo].de_centavos(valor, us) for codigo, valor, us in itens], proximo
+
+    def resumo(self):
+        # (total de contas, soma dos saldos em centavos) somando todas as partições.
+        respostas = self._difundir('resumo', [() for _ in self._conexoes])
+        return sum(contas for contas, _ in respostas), sum(saldo for _, saldo in respostas)
+
+    def fechar(self):
+        for conexao in self._conexoes:
+            if not conexao.closed:
+                conexao.send(None)
+                conexao.close()
+        for processo in self._processos:
+            processo.join()
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from . import ganchos as _ganchos
+from .erros import CpfDuplicadoError
+from .modelo import Conta, PessoaFisica
+from .numeracao import AlocadorNumeros
+from .travas import obter_travas, trava_da_conta
+
+class Registro:
+    # Buscas e cadastros que podem esperar E/S (banco, fila do escritor): quem atende muitas
+    # sessões num laço de eventos (servidor) os roda fora do laço.
+    consultas_bloqueiam = False
+
+    def __init__(self, diario=None, alocador: AlocadorNumeros = None):
+        self._usuarios: dict[str, PessoaFisica] = {}
+        self._contas: dict[int, Conta] = {}
+        self.diario = diario
+        self.alocador = alocador if alocador is not None else AlocadorNumeros()
+
+    def __len__(self):
+        return len(self._usuarios)
+
+    @property
+    def total_contas(self) -> int:
+        return len(self._contas)
+
+    def adicionar_usuario(self, usuario: PessoaFisica) -> PessoaFisica:
+        # Sob a trava da faixa do CPF (como se fosse um número de conta), para que o registro
+        # no diário e a entrada no dicionário caiam do mesmo lado de um instantâneo.
+        with obter_travas().trava(int(usuario.cpf)):
+            if usuario.cpf in self._usuarios:
+                raise CpfDuplicadoError("Já existe um usuário cadastrado com este CPF.")
+            if self.diario is not None:
+                self.diario.registrar_usuario(usuario)
+            self._usuarios[usuario.cpf] = usuario
+        return usuario
+
+    def buscar_usuario(self, cpf: str) -> PessoaFisica | None:
+        usuario = self._usuarios.get(cpf)
+        if usuario is None:
+            usuario = self._buscar_normalizado(cpf)
+        metricas = _ganchos.metricas
+        if metricas is not None:
+            metricas.contar_busca('usuario', usuario is not None)
+        return usuario
+
+    def _buscar_normalizado(self, cpf: str) -> PessoaFisica | None:
+        try:
+            return self._usuarios.get(PessoaFisica._validar_cpf(cpf))
+        except ValueError:
+            return None
+
+    def adicionar_conta(self, conta: Conta) -> Conta:
+        with trava_da_conta(conta.numero):
+            if conta.numero in self._contas:
+                raise ValueError(f"Já existe uma conta com o número {conta.numero}.")
+            if self.diario is not None:
+                self.diario.registrar_conta(conta)
+                conta.diario = self.diario
+            self._contas[conta.numero] = conta
+            conta.cliente.adicionar_conta(conta)
+        self.alocador.avancar(conta.numero)
+        return conta
+
+    def criar_conta(self, usuario: PessoaFisica, agencia: str = '0001') -> Conta:
+        # Sem trava global: o número vem do bloco da thread. Um número já ocupado (conta
+        # adicionada com número explícito dentro de um bloco já reservado) é pulado.
+        numero = self.alocador.proximo(agencia)
+        while numero in self._contas:
+            numero = self.alocador.proximo(agencia)
+        return self.adicionar_conta(Conta(usuario, numero, agencia))
+
+    def buscar_conta(self, numero: int) -> Conta | None:
+        conta = self._contas.get(numero)
+        metricas = _ganchos.metricas
+        if metricas is not None:
+            metricas.contar_busca('conta', conta is not None)
+        return conta
+
+    def usuarios(self):
+        return self._usuarios.values()
+
+    def contas(self):
+        return self._contas.values()
+
+    def anexar_diario(self, diario):
+        self.diario = diario
+        for conta in self._contas.values():
+            conta.diario = diario
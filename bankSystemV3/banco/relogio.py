@@ -0,0 +1,110 @@
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from .fuso import obter_fuso_horario
+
+_EPOCA = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_UM_MICROSSEGUNDO = timedelta(microseconds=1)
+
+def para_microssegundos(data_hora: datetime) -> int:
+    return (data_hora - _EPOCA) // _UM_MICROSSEGUNDO
+
+def de_microssegundos(microssegundos: int) -> datetime:
+    return (_EPOCA + timedelta(microseconds=microssegundos)).astimezone(obter_fuso_horario())
+
+def instante_microssegundos(valor) -> int:
+    # Aceita microssegundos, datetime (sem fuso = horário de São Paulo) ou date (início do dia).
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, datetime):
+        if valor.tzinfo is None:
+            valor = valor.replace(tzinfo=obter_fuso_horario())
+        return para_microssegundos(valor)
+    return para_microssegundos(datetime(valor.year, valor.month, valor.day, tzinfo=obter_fuso_horario()))
+
+def limites_do_dia(microssegundos: int):
+    # Retorna (início, fim) do dia local em microssegundos e a data correspondente.
+    fuso = obter_fuso_horario()
+    dia = de_microssegundos(microssegundos).date()
+    amanha = dia + timedelta(days=1)
+    inicio = para_microssegundos(datetime(dia.year, dia.month, dia.day, tzinfo=fuso))
+    fim = para_microssegundos(datetime(amanha.year, amanha.month, amanha.day, tzinfo=fuso))
+    return inicio, fim, dia
+
+_ultimo_dia = (0, 0, None)
+
+def dia_local(microssegundos: int) -> date:
+    # Cache de um único dia: movimentações consecutivas costumam cair no mesmo dia.
+    global _ultimo_dia
+    inicio, fim, dia = _ultimo_dia
+    if not inicio <= microssegundos < fim:
+        _ultimo_dia = inicio, fim, dia = limites_do_dia(microssegundos)
+    return dia
+
+def fim_do_dia_local(microssegundos: int) -> int:
+    # Início do dia local seguinte, com o mesmo cache de dia_local.
+    global _ultimo_dia
+    inicio, fim, dia = _ultimo_dia
+    if not inicio <= microssegundos < fim:
+        _ultimo_dia = inicio, fim, dia = limites_do_dia(microssegundos)
+    return fim
+
+class Relogio:
+    __slots__ = ('_fonte', '_hoje', '_inicio_dia_ns', '_fim_dia_ns')
+
+    def __init__(self, fonte=time.time_ns):
+        self._fonte = fonte
+        self._hoje = None
+        self._inicio_dia_ns = 0
+        self._fim_dia_ns = 0
+
+    def _recalcular_dia(self, agora_ns: int):
+        inicio, fim, self._hoje = limites_do_dia(agora_ns // 1000)
+        self._inicio_dia_ns = inicio * 1000
+        self._fim_dia_ns = fim * 1000
+
+    def agora_microssegundos(self) -> int:
+        return self._fonte() // 1000
+
+    def agora(self) -> datetime:
+        return de_microssegundos(self.agora_microssegundos())
+
+    def hoje(self) -> date:
+        # A fronteira do dia útil só é recalculada quando o instante sai do dia em cache.
+        agora_ns = self._fonte()
+        if not self._inicio_dia_ns <= agora_ns < self._fim_dia_ns:
+            self._recalcular_dia(agora_ns)
+        return self._hoje
+
+    def inicio_dia_microssegundos(self) -> int:
+        self.hoje()
+        return self._inicio_dia_ns // 1000
+
+    def segundos_ate_virada(self) -> int:
+        agora_ns = self._fonte()
+        if not self._inicio_dia_ns <= agora_ns < self._fim_dia_ns:
+            self._recalcular_dia(agora_ns)
+        return (self._fim_dia_ns - agora_ns) // 1_000_000_000
+
+class RelogioManual(Relogio):
+    __slots__ = ('_agora_ns',)
+
+    def __init__(self, data_hora: datetime):
+        super().__init__(self._ler)
+        self._agora_ns = para_microssegundos(data_hora) * 1000
+
+    def _ler(self) -> int:
+        return self._agora_ns
+
+    def avancar(self, **intervalo):
+        self._agora_ns += timedelta(**intervalo) // _UM_MICROSSEGUNDO * 1000
+
+_relogio = Relogio()
+
+def obter_relogio() -> Relogio:
+    return _relogio
+
+def definir_relogio(relogio: Relogio) -> Relogio:
+    global _relogio
+    anterior, _relogio = _relogio, relogio
+    return anterior
@@ -0,0 +1,616 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+from queue import Empty, LifoQueue, Queue
+
+from . import extrato as _extrato
+from . import ganchos as _ganchos
+from .erros import CpfDuplicadoError
+from .modelo import TIPOS_TRANSACAO, Conta, HistoricoBase, PessoaFisica
+from .registro import Registro
+from .relogio import instante_microssegundos, obter_relogio
+from .travas import trava_da_conta
+
+# Armazenamento em SQLite (modo WAL) de usuários, contas e movimentações. Um único escritor,
+# numa thread própria, recebe as mudanças pela interface do diário (Registro.diario e
+# Conta.diario) e as grava em lotes: cada lote é uma transação com um executemany por
+# tabela, então sob carga as mudanças enfileiradas enquanto um lote grava entram juntas no
+# seguinte. O saldo da conta é atualizado na mesma transação das movimentações e os
+# contadores diários são recontados do dia corrente ao carregar a conta. As leituras usam
+# um pool de conexões e só consultas indexadas: usuário pelo CPF, contas pelo CPF do
+# titular e extrato por (conta, instante), com cursor pela chave e não por posição. Cada
+# mudança recebe um número de sequência: uma leitura espera só as mudanças que precisa ver.
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    cpf TEXT PRIMARY KEY,
+    nome TEXT NOT NULL,
+    data_nascimento TEXT NOT NULL,
+    endereco TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS contas (
+    numero INTEGER PRIMARY KEY,
+    agencia TEXT NOT NULL,
+    cpf TEXT NOT NULL,
+    saldo_centavos INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS contas_por_cpf ON contas (cpf);
+CREATE TABLE IF NOT EXISTS movimentos (
+    conta INTEGER NOT NULL,
+    microssegundos INTEGER NOT NULL,
+    codigo INTEGER NOT NULL,
+    centavos INTEGER NOT NULL,
+    contraparte INTEGER
+);
+CREATE INDEX IF NOT EXISTS movimentos_por_conta ON movimentos (conta, microssegundos);
+"""
+
+_INSERIR_USUARIO = "INSERT INTO usuarios (cpf, nome, data_nascimento, endereco) VALUES (?, ?, ?, ?)"
+_INSERIR_CONTA = "INSERT INTO contas (numero, agencia, cpf) VALUES (?, ?, ?)"
+_INSERIR_MOVIMENTO = ("INSERT INTO movimentos (conta, microssegundos, codigo, centavos, contraparte) "
+                      "VALUES (?, ?, ?, ?, ?)")
+_ATUALIZAR_SALDO = "UPDATE contas SET saldo_centavos = saldo_centavos + ? WHERE numero = ?"
+
+_SINAIS = tuple(tipo.sinal for tipo in TIPOS_TRANSACAO)
+_TRANSFERENCIA, _TRANSFERENCIA_RECEBIDA = 2, 3
+
+def _conectar(caminho: str) -> sqlite3.Connection:
+    # Autocommit: as transações do escritor são abertas e fechadas explicitamente.
+    conexao = sqlite3.connect(caminho, isolation_level=None, check_same_thread=False)
+    conexao.execute("PRAGMA busy_timeout = 5000")
+    return conexao
+
+class EscritorSqlite:
+    # Implementa a interface do diário. `esperar(sequencia)` bloqueia só até a mudança com
+    # aquele número estar gravada, e `ultima_da_conta` diz qual foi a última mudança de uma
+    # conta: quem lê o extrato espera as gravações daquela conta, não a fila inteira. Um lote
+    # que falha é desfeito e regravado mudança a mudança; só a que falhar de novo fica de fora,
+    # e o erro fica preso à sequência dela: só `confirmar(sequencia)` o levanta (`acompanhar`
+    # junta as sequências que um trecho de código enfileira). Erros que ninguém confirmou saem
+    # em `fechar`. synchronous=NORMAL no WAL: uma queda de energia pode perder os últimos
+    # lotes, nunca deixar o banco inconsistente; 'FULL' sincroniza a cada lote.
+    def __init__(self, caminho: str, tamanho_lote: int = 10_000, sincronismo: str = 'NORMAL'):
+        self.caminho = caminho
+        self.tamanho_lote = tamanho_lote
+        self.lotes = 0
+        self.enviadas = 0    # sequência da última mudança enfileirada
+        self.gravadas = 0    # todas as mudanças até esta sequência já foram processadas
+        self._conexao = _conectar(caminho)
+        self._conexao.execute("PRAGMA journal_mode = WAL")
+        self._conexao.execute(f"PRAGMA synchronous = {sincronismo}")
+        self._conexao.executescript(ESQUEMA)
+        self._fila = Queue()
+        # A sequência é atribuída e enfileirada sob a mesma trava: a fila fica em ordem de sequência.
+        self._trava = threading.Lock()
+        self._gravou = threading.Condition()
+        self._ultima_por_conta = {}
+        self._erros = {}     # sequência -> exceção
+        self._local = threading.local()
+        self._thread = threading.Thread(target=self._executar, name='escritor-sqlite', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+    def registrar_usuario(self, usuario: PessoaFisica) -> int:
+        return self._enfileirar(('U', usuario.cpf, usuario.nome, usuario.data_nascimento.strftime('%d/%m/%Y'),
+                                 usuario.endereco))
+
+    def registrar_conta(self, conta: Conta) -> int:
+        return self._enfileirar(('C', conta.numero, conta.agencia, conta.cliente.cpf), conta.numero)
+
+    def registrar_transacao(self, conta: Conta, transacao) -> int:
+        return self._enfileirar(('T', conta.numero, transacao.microssegundos, transacao.codigo,
+                                 transacao.valor_centavos), conta.numero)
+
+    def registrar_transferencia(self, origem: Conta, transferencia) -> int:
+        destino = transferencia.contraparte.numero
+        return self._enfileirar(('X', origem.numero, destino, transferencia.valor_centavos,
+                                 transferencia.microssegundos), origem.numero, destino)
+
+    def _enfileirar(self, item: tuple, *contas) -> int:
+        with self._trava:
+            self.enviadas += 1
+            sequencia = self.enviadas
+            for numero in contas:
+                self._ultima_por_conta[numero] = sequencia
+            self._fila.put((sequencia, item))
+        acompanhadas = self._local.__dict__.get('acompanhadas')
+        if acompanhadas is not None:
+            acompanhadas.append(sequencia)
+        return sequencia
+
+    @contextmanager
+    def acompanhar(self):
+        # Lista das sequências enfileiradas por esta thread dentro do bloco (uma chamada
+        # síncrona roda inteira numa thread, então são exatamente as mudanças dela).
+        anteriores = self._local.__dict__.get('acompanhadas')
+        acompanhadas = self._local.acompanhadas = []
+        try:
+            yield acompanhadas
+        finally:
+            self._local.acompanhadas = anteriores
+
+    def ultima_da_conta(self, numero: int) -> int:
+        return self._ultima_por_conta.get(numero, 0)
+
+    def esperar(self, sequencia: int):
+        if self.gravadas >= sequencia:
+            return
+        with self._gravou:
+            while self.gravadas < sequencia:
+                self._gravou.wait()
+
+    def confirmar(self, sequencia: int):
+        # Espera a mudança e levanta o erro dela, se a gravação falhou.
+        self.esperar(sequencia)
+        erro = self._erros.pop(sequencia, None)
+        if erro is not None:
+            raise erro
+
+    def sincronizar(self):
+        # Espera tudo o que já foi enfileirado; os erros continuam com as suas sequências.
+        self.esperar(self.enviadas)
+
+    def fechar(self):
+        if self._thread.is_alive():
+            self._fila.put(None)
+            self._thread.join()
+            self._conexao.close()
+        # O primeiro erro que ninguém confirmou; os demais são descartados.
+        if self._erros:
+            erros, self._erros = self._erros, {}
+            raise erros[min(erros)]
+
+    def _executar(self):
+        fila = self._fila
+        while True:
+            lote = [fila.get()]
+            # Tudo o que chegou enquanto o lote anterior gravava vai junto, até `tamanho_lote`.
+            try:
+                while len(lote) < self.tamanho_lote:
+                    lote.append(fila.get_nowait())
+            except Empty:
+                pass
+            fim = None in lote
+            if fim:
+                lote = [item for item in lote if item is not None]
+            if lote:
+                self._gravar_lote(lote)
+                with self._gravou:
+                    self.gravadas = lote[-1][0]
+                    self._gravou.notify_all()
+            if fim:
+                return
+
+    def _gravar_lote(self, lote: list):
+        try:
+            self._gravar([item for _, item in lote])
+        except Exception:
+            # Uma mudança ruim não derruba as outras: cada uma vai na sua própria transação.
+            for sequencia, item in lote:
+                try:
+                    self._gravar([item])
+                except Exception as erro:
+                    self._erros[sequencia] = erro
+
+    def _gravar(self, lote: list):
+        usuarios, contas, movimentos, saldos = [], [], [], {}
+        for item in lote:
+            tipo = item[0]
+            if tipo == 'T':
+                _, numero, microssegundos, codigo, centavos = item
+                movimentos.append((numero, microssegundos, codigo, centavos, None))
+                saldos[numero] = saldos.get(numero, 0) + _SINAIS[codigo] * centavos
+            elif tipo == 'X':
+                _, origem, destino, centavos, microssegundos = item
+                movimentos.append((origem, microssegundos, _TRANSFERENCIA, centavos, destino))
+                movimentos.append((destino, microssegundos, _TRANSFERENCIA_RECEBIDA, centavos, origem))
+                saldos[origem] = saldos.get(origem, 0) - centavos
+                saldos[destino] = saldos.get(destino, 0) + centavos
+            elif tipo == 'C':
+                contas.append(item[1:])
+            else:
+                usuarios.append(item[1:])
+        conexao = self._conexao
+        conexao.execute("BEGIN")
+        try:
+            # Nesta ordem, um lote pode trazer o usuário, a conta e as movimentações dela.
+            if usuarios:
+                conexao.executemany(_INSERIR_USUARIO, usuarios)
+            if contas:
+                conexao.executemany(_INSERIR_CONTA, contas)
+            if movimentos:
+                conexao.executemany(_INSERIR_MOVIMENTO, movimentos)
+                conexao.executemany(_ATUALIZAR_SALDO, [(delta, numero) for numero, delta in saldos.items()])
+            conexao.execute("COMMIT")
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+        self.lotes += 1
+
+class PoolConexoes:
+    # Conexões de leitura reaproveitadas entre threads; cada uma é usada por uma thread por vez.
+    def __init__(self, caminho: str, tamanho: int = 4):
+        self.caminho = caminho
+        self._livres = LifoQueue()
+        self._conexoes = []
+        for _ in range(tamanho):
+            conexao = _conectar(caminho)
+            conexao.execute("PRAGMA query_only = 1")
+            self._conexoes.append(conexao)
+            self._livres.put(conexao)
+
+    @contextmanager
+    def conexao(self):
+        conexao = self._livres.get()
+        try:
+            yield conexao
+        finally:
+            self._livres.put(conexao)
+
+    def fechar(self):
+        for conexao in self._conexoes:
+            conexao.close()
+
+class Repositorio:
+    # Consultas de leitura; devolvem tuplas, sem montar objetos do modelo.
+    def __init__(self, caminho: str, leitores: int = 4):
+        self.pool = PoolConexoes(caminho, leitores)
+
+    def fechar(self):
+        self.pool.fechar()
+
+    def usuario(self, cpf: str):
+        # (cpf, nome, data_nascimento, endereco) ou None.
+        with self.pool.conexao() as conexao:
+            return conexao.execute("SELECT cpf, nome, data_nascimento, endereco FROM usuarios WHERE cpf = ?",
+                                   (cpf,)).fetchone()
+
+    def contas_do_usuario(self, cpf: str) -> list:
+        # [(numero, agencia, saldo_centavos)] em ordem de número.
+        with self.pool.conexao() as conexao:
+            return conexao.execute("SELECT numero, agencia, saldo_centavos FROM contas WHERE cpf = ? "
+                                   "ORDER BY numero", (cpf,)).fetchall()
+
+    def conta(self, numero: int):
+        # (numero, agencia, cpf, saldo_centavos) ou None.
+        with self.pool.conexao() as conexao:
+            return conexao.execute("SELECT numero, agencia, cpf, saldo_centavos FROM contas WHERE numero = ?",
+                                   (numero,)).fetchone()
+
+    def maior_numero(self) -> int:
+        with self.pool.conexao() as conexao:
+            return conexao.execute("SELECT max(numero) FROM contas").fetchone()[0] or 0
+
+    def cpfs(self) -> list:
+        with self.pool.conexao() as conexao:
+            return [cpf for cpf, in conexao.execute("SELECT cpf FROM usuarios")]
+
+    def total_movimentos(self, numero: int) -> int:
+        with self.pool.conexao() as conexao:
+            return conexao.execute("SELECT count(*) FROM movimentos WHERE conta = ?", (numero,)).fetchone()[0]
+
+    def contadores_desde(self, numero: int, microssegundos: int) -> tuple:
+        # (movimentações, saques) da conta a partir de `microssegundos`; transferências enviadas contam como saques.
+        with self.pool.conexao() as conexao:
+            total, saques = conexao.execute(
+                "SELECT count(*), sum(codigo IN (1, 2)) FROM movimentos WHERE conta = ? AND microssegundos >= ?",
+                (numero, microssegundos)).fetchone()
+        return total, saques or 0
+
+    def posicao(self, numero: int, microssegundos: int) -> int:
+        # Movimentações da conta antes de `microssegundos`: a posição do instante no histórico.
+        with self.pool.conexao() as conexao:
+            return conexao.execute("SELECT count(*) FROM movimentos WHERE conta = ? AND microssegundos < ?",
+                                   (numero, microssegundos)).fetchone()[0]
+
+    def posicao_da_chave(self, numero: int, chave) -> int:
+        # Posição do item de chave [microssegundos, rowid] (um cursor de `movimentos`).
+        with self.pool.conexao() as conexao:
+            return conexao.execute("SELECT count(*) FROM movimentos WHERE conta = ? "
+                                   "AND (microssegundos, rowid) < (?, ?)", (numero, *chave)).fetchone()[0]
+
+    def movimentos_nas(self, numero: int, primeira: int, ultima: int, total: int) -> list:
+        # Linhas (codigo, centavos, microssegundos, contraparte, rowid) das posições de `primeira`
+        # a `ultima` de um histórico com `total` movimentações. O OFFSET anda pelo índice a
+        # partir da ponta mais próxima: a cauda, onde caem os extratos, sai pelo fim.
+        quantidade = ultima - primeira + 1
+        with self.pool.conexao() as conexao:
+            if primeira <= total - 1 - ultima:
+                return conexao.execute(
+                    "SELECT codigo, centavos, microssegundos, contraparte, rowid FROM movimentos WHERE conta = ? "
+                    "ORDER BY microssegundos, rowid LIMIT ? OFFSET ?", (numero, quantidade, primeira)).fetchall()
+            linhas = conexao.execute(
+                "SELECT codigo, centavos, microssegundos, contraparte, rowid FROM movimentos WHERE conta = ? "
+                "ORDER BY microssegundos DESC, rowid DESC LIMIT ? OFFSET ?",
+                (numero, quantidade, total - 1 - ultima)).fetchall()
+        linhas.reverse()
+        return linhas
+
+    def variacao_desde(self, numero: int, microssegundos: int) -> int:
+        # Soma com sinal (créditos menos débitos) das movimentações a partir de `microssegundos`.
+        with self.pool.conexao() as conexao:
+            return conexao.execute(
+                "SELECT coalesce(sum(CASE WHEN codigo IN (0, 3) THEN centavos ELSE -centavos END), 0) "
+                "FROM movimentos WHERE conta = ? AND microssegundos >= ?", (numero, microssegundos)).fetchone()[0]
+
+    def totais(self, numero: int, inicio: int, fim: int) -> tuple:
+        # (depósitos, nº depósitos, saques, nº saques) no intervalo, como Agregados.totais_dia.
+        with self.pool.conexao() as conexao:
+            return tuple(conexao.execute(
+                "SELECT coalesce(sum(CASE WHEN codigo IN (0, 3) THEN centavos END), 0), "
+                "count(CASE WHEN codigo IN (0, 3) THEN 1 END), "
+                "coalesce(sum(CASE WHEN codigo IN (1, 2) THEN centavos END), 0), "
+                "count(CASE WHEN codigo IN (1, 2) THEN 1 END) "
+                "FROM movimentos WHERE conta = ? AND microssegundos >= ? AND microssegundos < ?",
+                (numero, inicio, fim)).fetchone())
+
+    def movimentos(self, numero: int, inicio: int = None, fim: int = None, codigo: int = None,
+                   cursor=None, tamanho: int = 50) -> tuple:
+        # Página de (codigo, centavos, microssegundos, contraparte) em ordem cronológica, com
+        # instantes em microssegundos. O cursor é a chave [microssegundos, rowid] do próximo item.
+        condicoes, parametros = ["conta = ?"], [numero]
+        if inicio is not None:
+            condicoes.append("microssegundos >= ?")
+            parametros.append(inicio)
+        if fim is not None:
+            condicoes.append("microssegundos < ?")
+            parametros.append(fim)
+        if cursor is not None:
+            condicoes.append("(microssegundos, rowid) >= (?, ?)")
+            parametros += cursor
+        if codigo is not None:
+            condicoes.append("codigo = ?")
+            parametros.append(codigo)
+        parametros.append(tamanho + 1)
+        with self.pool.conexao() as conexao:
+            linhas = conexao.execute(
+                f"SELECT codigo, centavos, microssegundos, contraparte, rowid FROM movimentos "
+                f"WHERE {' AND '.join(condicoes)} ORDER BY microssegundos, rowid LIMIT ?", parametros).fetchall()
+        proximo = None
+        if len(linhas) > tamanho:
+            proximo = [linhas[tamanho][2], linhas[tamanho][4]]
+            del linhas[tamanho:]
+        return [linha[:4] for linha in linhas], proximo
+
+class HistoricoSqlite(HistoricoBase):
+    # Histórico de uma conta guardada no SQLite. As posições são as do índice (conta, instante)
+    # e as consultas vão ao banco depois de esperar só as gravações desta conta (ler as
+    # próprias escritas sem esperar a fila inteira). Em memória ficam o total de movimentações
+    # e os agregados das movimentações desde que a conta foi carregada, como nas contas
+    # hidratadas do instantâneo; saldo_em e os totais por período vêm do banco. O cursor das
+    # páginas é a chave devolvida pelo Repositorio, não uma posição.
+    __slots__ = ('repositorio', 'escritor', 'numero', '_agregados', '_total')
+
+    def __init__(self, repositorio: Repositorio, numero: int, escritor: EscritorSqlite = None,
+                 total: int = None):
+        self.repositorio = repositorio
+        self.escritor = escritor
+        self.numero = numero
+        self._agregados = None
+        self._total = total   # None: contado no banco no primeiro uso
+
+    def __len__(self):
+        if self._total is None:
+            # Sob a trava da conta, nenhuma movimentação está entre o diário e o histórico.
+            with trava_da_conta(self.numero):
+                if self._total is None:
+                    self._esperar()
+                    self._total = self.repositorio.total_movimentos(self.numero)
+        return self._total
+
+    def _esperar(self):
+        if self.escritor is not None:
+            self.escritor.esperar(self.escritor.ultima_da_conta(self.numero))
+
+    def adicionar_transacao(self, transacao):
+        self._agregar(transacao)
+        if self._total is not None:
+            self._total += 1
+
+    def definir_saldo_inicial(self, centavos: int):
+        # Saldo ao carregar a conta: as movimentações anteriores ficam só no banco.
+        self.agregados.saldo_inicial = centavos
+
+    def _posicao(self, microssegundos: int) -> int:
+        with trava_da_conta(self.numero):
+            self._esperar()
+            return self.repositorio.posicao(self.numero, microssegundos)
+
+    def _linhas_nas(self, posicoes) -> list:
+        posicoes = list(posicoes)
+        if not posicoes:
+            return []
+        # Sob a trava da conta, o banco tem exatamente len(self) movimentações desta conta.
+        with trava_da_conta(self.numero):
+            total = len(self)
+            self._esperar()
+            linhas = self.repositorio.movimentos_nas(self.numero, posicoes[0], posicoes[-1], total)
+        return [linhas[posicao - posicoes[0]] for posicao in posicoes]
+
+    def _transacoes_nas(self, posicoes) -> list:
+        return [TIPOS_TRANSACAO[codigo].de_centavos(centavos, microssegundos)
+                for codigo, centavos, microssegundos, _, _ in self._linhas_nas(posicoes)]
+
+    def _transacao_em(self, posicao: int):
+        return self._transacoes_nas((posicao,))[0]
+
+    def _codigo_em(self, posicao: int) -> int:
+        return self._linhas_nas((posicao,))[0][0]
+
+    def saldo_em(self, instante) -> int:
+        with trava_da_conta(self.numero):
+            self._esperar()
+            return self.agregados.saldo_final - self.repositorio.variacao_desde(
+                self.numero, instante_microssegundos(instante))
+
+    def totais_dia(self, dia) -> tuple:
+        self._esperar()
+        return self.repositorio.totais(self.numero, instante_microssegundos(dia),
+                                       instante_microssegundos(dia + timedelta(days=1)))
+
+    def totais_mes(self, ano: int, mes: int) -> tuple:
+        self._esperar()
+        seguinte = date(ano + 1, 1, 1) if mes == 12 else date(ano, mes + 1, 1)
+        return self.repositorio.totais(self.numero, instante_microssegundos(date(ano, mes, 1)),
+                                       instante_microssegundos(seguinte))
+
+    def pagina(self, inicio=None, fim=None, tipo=None, cursor=None, tamanho: int = 50):
+        self._esperar()
+        linhas, proximo = self.repositorio.movimentos(
+            self.numero, instante_microssegundos(inicio) if inicio is not None else None,
+            instante_microssegundos(fim) if fim is not None else None,
+            tipo.codigo if tipo is not None else None, cursor, tamanho)
+        return [TIPOS_TRANSACAO[codigo].de_centavos(centavos, microssegundos)
+                for codigo, centavos, microssegundos, _ in linhas], proximo
+
+    def consultar(self, inicio=None, fim=None, tipo=None, cursor=None):
+        # Percorre em páginas: nenhuma conexão fica presa a um iterador não consumido.
+        while True:
+            itens, cursor = self.pagina(inicio, fim, tipo, cursor, 1_000)
+            yield from itens
+            if cursor is None:
+                return
+
+    def listar_transacoes(self, inicio=None, fim=None, tipo=None, cursor=None, tamanho: int = None):
+        cache = _ganchos.extrato
+        if cache is None or tipo is not None:
+            # Sem cache (ou filtrando por tipo, que não forma um intervalo de posições): páginas pela chave.
+            if tamanho is None:
+                transacoes, proximo = self.consultar(inicio, fim, tipo, cursor), None
+            else:
+                transacoes, proximo = self.pagina(inicio, fim, tipo, cursor, tamanho)
+            linhas = [_extrato.linha(transacao) for transacao in transacoes]
+            print('\n'.join(linhas) if linhas else "Não foram realizadas movimentações.")
+            return proximo
+        # Com o cache, o período vira um intervalo de posições (duas contagens no índice) e as
+        # linhas vêm do cache; o cursor de entrada e o de saída continuam sendo chaves.
+        baixo = self._posicao(instante_microssegundos(inicio)) if inicio is not None else 0
+        if cursor is not None:
+            baixo = max(baixo, self.repositorio.posicao_da_chave(self.numero, cursor))
+        alto = self._posicao(instante_microssegundos(fim)) if fim is not None else len(self)
+        proximo = None
+        if tamanho is not None and alto - baixo > tamanho:
+            alto = baixo + tamanho
+            seguinte = self._linhas_nas((alto,))[0]
+            proximo = [seguinte[2], seguinte[4]]
+        linhas = cache.linhas(self, range(baixo, alto))
+        print('\n'.join(linhas) if linhas else "Não foram realizadas movimentações.")
+        return proximo
+
+class RegistroSqlite(Registro):
+    # Registro servido pelo SQLite: usuários e contas viram objetos quando consultados (login,
+    # busca de conta) e as mudanças seguem para o banco pelo escritor, que é o diário do registro.
+    consultas_bloqueiam = True
+
+    def __init__(self, caminho: str, leitores: int = 4, tamanho_lote: int = 10_000,
+                 sincronismo: str = 'NORMAL', alocador=None):
+        super().__init__(EscritorSqlite(caminho, tamanho_lote, sincronismo), alocador)
+        self.repositorio = Repositorio(caminho, leitores)
+        self.alocador.avancar(self.repositorio.maior_numero())
+        # Duas buscas simultâneas pelo mesmo usuário não criam duas cópias das contas dele.
+        self._trava_hidratacao = threading.Lock()
+
+    def fechar(self):
+        self.diario.fechar()
+        self.repositorio.fechar()
+
+    def __len__(self):
+        self.diario.sincronizar()
+        with self.repositorio.pool.conexao() as conexao:
+            return conexao.execute("SELECT count(*) FROM usuarios").fetchone()[0]
+
+    @property
+    def total_contas(self) -> int:
+        self.diario.sincronizar()
+        with self.repositorio.pool.conexao() as conexao:
+            return conexao.execute("SELECT count(*) FROM contas").fetchone()[0]
+
+    def _historico(self, numero: int, total: int = None) -> HistoricoSqlite:
+        return HistoricoSqlite(self.repositorio, numero, self.diario, total)
+
+    def _hidratar_usuario(self, cpf: str):
+        with self._trava_hidratacao:
+            usuario = self._usuarios.get(cpf)
+            if usuario is not None:
+                return usuario
+            dados = self.repositorio.usuario(cpf)
+            if dados is None:
+                return None
+            usuario = PessoaFisica(*dados)
+            relogio = obter_relogio()
+            hoje, inicio_hoje = relogio.hoje(), relogio.inicio_dia_microssegundos()
+            for numero, agencia, saldo in self.repositorio.contas_do_usuario(cpf):
+                conta = Conta(usuario, numero, agencia, self._historico(numero))
+                conta.saldo_centavos = saldo
+                conta.historico.definir_saldo_inicial(saldo)
+                transacoes, saques = self.repositorio.contadores_desde(numero, inicio_hoje)
+                conta.transacoes_realizadas, conta.saques_realizados = transacoes, saques
+                if transacoes:
+                    conta.ultima_data_transacao = hoje
+                if saques:
+                    conta.ultima_data_saque = hoje
+                conta.diario = self.diario
+                self._contas[numero] = conta
+                usuario.adicionar_conta(conta)
+            # Publicado por último: quem o encontra no dicionário encontra também as contas.
+            self._usuarios[cpf] = usuario
+        return usuario
+
+    def _buscar_normalizado(self, cpf: str):
+        try:
+            cpf = PessoaFisica._validar_cpf(cpf)
+        except ValueError:
+            return None
+        usuario = self._usuarios.get(cpf)
+        if usuario is None:
+            # Sem esperar a fila do escritor: um usuário criado por este registro já está no
+            # dicionário, então o que falta só pode vir do banco.
+            usuario = self._hidratar_usuario(cpf)
+        return usuario
+
+    def buscar_conta(self, numero: int):
+        conta = self._contas.get(numero)
+        if conta is None:
+            dados = self.repositorio.conta(numero)
+            if dados is not None:
+                self._hidratar_usuario(dados[2])
+                conta = self._contas.get(numero)
+        metricas = _ganchos.metricas
+        if metricas is not None:
+            metricas.contar_busca('conta', conta is not None)
+        return conta
+
+    def adicionar_usuario(self, usuario: PessoaFisica) -> PessoaFisica:
+        if usuario.cpf not in self._usuarios and self.repositorio.usuario(usuario.cpf) is not None:
+            raise CpfDuplicadoError("Já existe um usuário cadastrado com este CPF.")
+        return super().adicionar_usuario(usuario)
+
+    def adicionar_conta(self, conta: Conta) -> Conta:
+        if conta.numero not in self._contas and self.repositorio.conta(conta.numero) is not None:
+            raise ValueError(f"Já existe uma conta com o número {conta.numero}.")
+        return super().adicionar_conta(conta)
+
+    def criar_conta(self, usuario: PessoaFisica, agencia: str = '0001') -> Conta:
+        numero = self.alocador.proximo(agencia)
+        while numero in self._contas:
+            numero = self.alocador.proximo(agencia)
+        return self.adicionar_conta(Conta(usuario, numero, agencia, self._historico(numero, 0)))
+
+    def _hidratar_tudo(self):
+        self.diario.sincronizar()
+        for cpf in self.repositorio.cpfs():
+            if cpf not in self._usuarios:
+                self._hidratar_usuario(cpf)
+
+    def usuarios(self):
+        self._hidratar_tudo()
+        return super().usuarios()
+
+    def contas(self):
+        self._hidratar_tudo()
+        return super().contas()
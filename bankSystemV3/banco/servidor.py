@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import json
+import sys
+
+from .erros import (SaldoInsuficienteError, LimiteSaqueExcedidoError, LimiteSaquesDiariosError,
+                    ValorInvalidoError, LimiteTransacoesDiariasError, LimiteValorTransacoesError)
+from .eventos import SaidaNula, definir_saida
+from .moeda import converter_para_centavos
+from .metricas import ativar_metricas, obter_metricas
+from .modelo import PessoaFisica
+from .registro import Registro
+
+# Protocolo: uma requisição JSON por linha, uma resposta JSON por linha, na mesma ordem.
+#   {"op": "criar_usuario", "cpf": ..., "nome": ..., "data_nascimento": "dd/mm/aaaa", "endereco": ...}
+#   {"op": "login", "cpf": ...}                      -> {"ok": true, "contas": [numeros]}
+#   {"op": "criar_conta"}                            -> {"ok": true, "conta": numero}
+#   {"op": "depositar" | "sacar", "conta": n, "valor": "12,34" | "centavos": 1234}
+#   {"op": "extrato", "conta": n, "cursor": c, "tamanho": t}
+#   {"op": "metricas"}                               -> {"ok": true, "texto": <formato Prometheus>}
+# Erros: {"ok": false, "erro": <nome da exceção>, "mensagem": ...}. A sessão (usuário
+# logado) vale para a conexão; operações sobre contas exigem login e conta do próprio usuário.
+TAMANHO_EXTRATO = 50
+
+# Erros de negócio devolvidos ao cliente com o nome da exceção; ValueError cobre CPF e data
+# inválidos e CpfDuplicadoError.
+_ERROS_NEGOCIO = (SaldoInsuficienteError, LimiteSaqueExcedidoError, LimiteSaquesDiariosError,
+                  ValorInvalidoError, LimiteTransacoesDiariasError, LimiteValorTransacoesError, ValueError)
+
+class ErroProtocolo(Exception):
+    pass
+
+class ErroPersistencia(Exception):
+    pass
+
+_DESCRICAO_TIPO = {str: 'um texto', int: 'um inteiro'}
+
+def _campo(requisicao: dict, nome: str, tipo, padrao=None, obrigatorio: bool = True):
+    # Valor do campo, conferido antes de chegar ao modelo: um tipo errado vira ErroProtocolo.
+    if nome not in requisicao:
+        if obrigatorio:
+            raise ErroProtocolo(f"Campo obrigatório ausente: '{nome}'.")
+        return padrao
+    valor = requisicao[nome]
+    # type() e não isinstance: true/false do JSON não passam por inteiro.
+    if type(valor) is not tipo:
+        raise ErroProtocolo(f"O campo '{nome}' deve ser {_DESCRICAO_TIPO[tipo]}.")
+    return valor
+
+class Sessao:
+    __slots__ = ('usuario',)
+
+    def __init__(self):
+        self.usuario = None
+
+class ServidorBanco:
+    def __init__(self, registro: Registro = None):
+        self.registro = registro if registro is not None else Registro()
+        # Com um registro que espera E/S (SQLite), cada requisição roda numa thread do executor
+        # padrão, e o laço segue atendendo as outras sessões enquanto ela espera o banco.
+        self.em_threads = self.registro.consultas_bloqueiam
+        # Escritor com sequências (SQLite): a resposta só sai depois de as mudanças da própria
+        # requisição estarem gravadas, e uma falha de gravação volta para quem a causou.
+        diario = self.registro.diario
+        self._acompanhar = getattr(diario, 'acompanhar', None) if self.em_threads else None
+        self.sessoes_ativas = 0
+        self.requisicoes = 0
+        self._servidor = None
+        self._operacoes = {
+            'criar_usuario': self._criar_usuario,
+            'login': self._login,
+            'criar_conta': self._criar_conta,
+            'depositar': self._depositar,
+            'sacar': self._sacar,
+            'extrato': self._extrato,
+            'metricas': self._metricas,
+        }
+
+    async def iniciar(self, host: str = '127.0.0.1', porta: int = 0, backlog: int = 4096):
+        self._servidor = await asyncio.start_server(self._atender, host, porta, backlog=backlog)
+        return self._servidor.sockets[0].getsockname()[1]
+
+    async def servir(self):
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    async def encerrar(self):
+        self._servidor.close()
+        await self._servidor.wait_closed()
+
+    async def _atender(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        sessao = Sessao()
+        self.sessoes_ativas += 1
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                self.requisicoes += 1
+                if self.em_threads:
+                    resposta = await asyncio.to_thread(self.processar, sessao, linha)
+                else:
+                    resposta = self.processar(sessao, linha)
+                escritor.write(resposta)
+                # Só aguarda o envio quando o buffer cresce; respostas pequenas seguem sem ceder o laço.
+                if escritor.transport.get_write_buffer_size() > 65536:
+                    await escritor.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            self.sessoes_ativas -= 1
+            escritor.close()
+
+    def processar(self, sessao: Sessao, linha: bytes) -> bytes:
+        # As operações sobre o modelo são síncronas. Em memória são curtas e rodam inteiras no
+        # laço de eventos; em threads (em_threads), as travas das contas mantêm cada movimentação
+        # atômica. As requisições de uma mesma sessão são atendidas uma de cada vez.
+        try:
+            requisicao = json.loads(linha)
+            if not isinstance(requisicao, dict):
+                raise ErroProtocolo("A requisição deve ser um objeto JSON.")
+            operacao = self._operacoes.get(requisicao.get('op'))
+            if operacao is None:
+                raise ErroProtocolo(f"Operação desconhecida: {requisicao.get('op')!r}.")
+            if self._acompanhar is None:
+                resposta = operacao(sessao, requisicao)
+            else:
+                resposta = self._operar_confirmando(operacao, sessao, requisicao)
+            resposta['ok'] = True
+        except json.JSONDecodeError:
+            resposta = {'ok': False, 'erro': 'ErroProtocolo', 'mensagem': "JSON inválido."}
+        except _ERROS_NEGOCIO as e:
+            resposta = {'ok': False, 'erro': type(e).__name__, 'mensagem': str(e)}
+        except (ErroProtocolo, KeyError, TypeError) as e:
+            mensagem = f"Campo obrigatório ausente: {e}." if isinstance(e, KeyError) else str(e)
+            resposta = {'ok': False, 'erro': 'ErroProtocolo', 'mensagem': mensagem}
+        except ErroPersistencia as e:
+            resposta = {'ok': False, 'erro': 'ErroPersistencia', 'mensagem': str(e)}
+        return json.dumps(resposta, ensure_ascii=False).encode() + b'\n'
+
+    def _operar_confirmando(self, operacao, sessao: Sessao, requisicao: dict) -> dict:
+        with self._acompanhar() as sequencias:
+            resposta = operacao(sessao, requisicao)
+        confirmar = self.registro.diario.confirmar
+        for sequencia in sequencias:
+            try:
+                confirmar(sequencia)
+            except Exception as e:
+                raise ErroPersistencia(f"Falha ao gravar a operação: {e}") from e
+        return resposta
+
+    def _criar_usuario(self, sessao: Sessao, requisicao: dict) -> dict:
+        usuario = PessoaFisica(_campo(requisicao, 'cpf', str), _campo(requisicao, 'nome', str),
+                               _campo(requisicao, 'data_nascimento', str), _campo(requisicao, 'endereco', str))
+        self.registro.adicionar_usuario(usuario)
+        return {'cpf': usuario.cpf}
+
+    def _login(self, sessao: Sessao, requisicao: dict) -> dict:
+        usuario = self.registro.buscar_usuario(_campo(requisicao, 'cpf', str))
+        if usuario is None:
+            raise ErroProtocolo("Usuário não encontrado.")
+        sessao.usuario = usuario
+        return {'nome': usuario.nome, 'contas': [conta.numero for conta in usuario.contas]}
+
+    def _usuario(self, sessao: Sessao):
+        if sessao.usuario is None:
+            raise ErroProtocolo("É necessário fazer login.")
+        return sessao.usuario
+
+    def _criar_conta(self, sessao: Sessao, requisicao: dict) -> dict:
+        conta = self.registro.criar_conta(self._usuario(sessao), _campo(requisicao, 'agencia', str, '0001', False))
+        return {'conta': conta.numero}
+
+    def _conta(self, sessao: Sessao, requisicao: dict):
+        usuario = self._usuario(sessao)
+        conta = self.registro.buscar_conta(_campo(requisicao, 'conta', int))
+        if conta is None or conta.cliente is not usuario:
+            raise ErroProtocolo("Conta não encontrada para este usuário.")
+        return conta
+
+    @staticmethod
+    def _centavos(requisicao: dict) -> int:
+        if 'centavos' in requisicao:
+            return _campo(requisicao, 'centavos', int)
+        return converter_para_centavos(_campo(requisicao, 'valor', str))
+
+    def _depositar(self, sessao: Sessao, requisicao: dict) -> dict:
+        conta = self._conta(sessao, requisicao)
+        conta.depositar_centavos(self._centavos(requisicao))
+        return {'saldo_centavos': conta.saldo_centavos}
+
+    def _sacar(self, sessao: Sessao, requisicao: dict) -> dict:
+        conta = self._conta(sessao, requisicao)
+        conta.sacar_centavos(self._centavos(requisicao))
+        return {'saldo_centavos': conta.saldo_centavos}
+
+    def _extrato(self, sessao: Sessao, requisicao: dict) -> dict:
+        conta = self._conta(sessao, requisicao)
+        tamanho = max(1, min(_campo(requisicao, 'tamanho', int, TAMANHO_EXTRATO, False), TAMANHO_EXTRATO))
+        itens, proximo = conta.historico.pagina(cursor=self._cursor(requisicao), tamanho=tamanho)
+        return {
+            'saldo_centavos': conta.saldo_centavos,
+            'movimentacoes': [[t.__class__.__name__, t.valor_centavos, t.microssegundos] for t in itens],
+            'proximo': proximo,
+        }
+
+    @staticmethod
+    def _cursor(requisicao: dict):
+        # O cursor volta como o servidor o entregou: posição (inteiro) ou chave [instante, id] do SQLite.
+        cursor = requisicao.get('cursor')
+        if cursor is None or type(cursor) is int and cursor >= 0:
+            return cursor
+        if type(cursor) is list and len(cursor) == 2 and all(type(parte) is int for parte in cursor):
+            return cursor
+        raise ErroProtocolo("Cursor inválido.")
+
+    def _metricas(self, sessao: Sessao, requisicao: dict) -> dict:
+        metricas = obter_metricas()
+        if metricas is None:
+            raise ErroProtocolo("Métricas desativadas (inicie o servidor com --metricas).")
+        return {'texto': metricas.exportar()}
+
+async def _executar(porta: int, registro: Registro = None):
+    servidor = ServidorBanco(registro)
+    porta = await servidor.iniciar(porta=porta)
+    print(f"Servidor ouvindo em 127.0.0.1:{porta}", flush=True)
+    # O cliente recebe o resultado na resposta; os eventos das transações são descartados.
+    definir_saida(SaidaNula())
+    await servidor.servir()
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Servidor TCP (JSON por linha) do sistema bancário.")
+    parser.add_argument('--porta', type=int, default=8765, help="0 escolhe uma porta livre")
+    parser.add_argument('--metricas', action='store_true', help="ativa as métricas (operação 'metricas')")
+    parser.add_argument('--sqlite', help="persiste usuários, contas e movimentações neste banco SQLite")
+    opcoes = parser.parse_args(argumentos)
+    if opcoes.metricas:
+        ativar_metricas()
+    registro = None
+    if opcoes.sqlite:
+        from .repositorio import RegistroSqlite
+        registro = RegistroSqlite(opcoes.sqlite)
+    try:
+        asyncio.run(_executar(opcoes.porta, registro))
+    except KeyboardInterrupt:
+        print("Servidor encerrado.", file=sys.stderr)
+    finally:
+        if registro is not None:
+            registro.fechar()
+
+if __name__ == '__main__':
+    main()
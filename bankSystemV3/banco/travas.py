@@ -0,0 +1,42 @@
+# O RLock em C que threading.RLock devolve: importar threading (e collections, functools...)
+# custaria mais que o resto do pacote, e estas travas nascem na importação.
+from _thread import RLock
+
+# Travas por faixa: cada conta usa a trava da faixa `numero % total`, então contas diferentes
+# raramente disputam a mesma trava e nenhuma conta precisa guardar a sua. As travas são
+# reentrantes porque Conta.sacar/depositar travam a conta e chamam `registrar`, que trava de novo.
+TOTAL_FAIXAS = 1024
+
+class TravasPorFaixa:
+    __slots__ = ('total', '_travas')
+
+    def __init__(self, total: int = TOTAL_FAIXAS):
+        self.total = total
+        self._travas = [RLock() for _ in range(total)]
+
+    def faixa(self, numero: int) -> int:
+        return numero % self.total
+
+    def trava(self, numero: int):
+        return self._travas[numero % self.total]
+
+    def par(self, numero_a: int, numero_b: int):
+        # Travas de duas contas em ordem crescente de faixa: quem trava sempre nessa ordem não
+        # entra em impasse. Se as contas caem na mesma faixa, a trava reentrante é obtida duas vezes.
+        faixa_a, faixa_b = numero_a % self.total, numero_b % self.total
+        if faixa_a > faixa_b:
+            faixa_a, faixa_b = faixa_b, faixa_a
+        return self._travas[faixa_a], self._travas[faixa_b]
+
+    def todas(self) -> list:
+        # Todas as travas, na mesma ordem crescente de `par`: quem obtém todas (um instantâneo
+        # consistente) não entra em impasse com as transferências.
+        return list(self._travas)
+
+_travas = TravasPorFaixa()
+
+def trava_da_conta(numero: int):
+    return _travas.trava(numero)
+
+def obter_travas() -> TravasPorFaixa:
+    return _travas
@@ -0,0 +1,638 @@
+import argparse
+import asyncio
+import contextlib
+import gc
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from datetime import datetime, timedelta
+
+from banco import (Conta, Deposito, Historico, HistoricoColunar, PessoaFisica, Registro, Saque, SaidaNula,
+                   SaldoInsuficienteError, definir_saida, obter_fuso_horario)
+from banco.diario import Diario, recuperar
+from banco.instantaneo import gravar_instantaneo, restaurar
+
+def _cpf(i: int) -> str:
+    return f"{i:011d}"
+
+def _popular_registro(n: int) -> Registro:
+    registro = Registro()
+    for i in range(n):
+        registro.adicionar_usuario(PessoaFisica(_cpf(i), f"Cliente {i}", '01/01/1990', 'Rua Exemplo, 123'))
+    return registro
+
+def bench_registro(tamanhos, consultas: int = 200_000):
+    print(f"{'usuarios':>12} {'ns/busca':>10} {'ns/busca (cpf formatado)':>26}")
+    for n in tamanhos:
+        registro = _popular_registro(n)
+        aleatorio = random.Random(n)
+        cpfs = [_cpf(aleatorio.randrange(n)) for _ in range(consultas)]
+        formatados = [f"{c[:3]}.{c[3:6]}.{c[6:9]}-{c[9:]}" for c in cpfs[:consultas // 10]]
+
+        inicio = time.perf_counter()
+        for cpf in cpfs:
+            registro.buscar_usuario(cpf)
+        ns_busca = (time.perf_counter() - inicio) / len(cpfs) * 1e9
+
+        inicio = time.perf_counter()
+        for cpf in formatados:
+            registro.buscar_usuario(cpf)
+        ns_formatado = (time.perf_counter() - inicio) / len(formatados) * 1e9
+
+        print(f"{n:>12} {ns_busca:>10.0f} {ns_formatado:>26.0f}")
+
+def _medir_memoria_historico(fabrica, n: int) -> int:
+    inicio = datetime(2024, 1, 1, tzinfo=obter_fuso_horario())
+    um_segundo = timedelta(seconds=1)
+    tracemalloc.start()
+    historico = fabrica()
+    for i in range(n):
+        tipo = Saque if i % 3 == 0 else Deposito
+        historico.adicionar_transacao(tipo(10.0 + i % 1000, inicio + i * um_segundo))
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del historico
+    return atual
+
+def bench_memoria_historico(tamanhos):
+    print(f"{'movimentos':>12} {'lista (MB)':>11} {'colunar (MB)':>13} {'B/mov lista':>12} {'B/mov colunar':>14}")
+    for n in tamanhos:
+        lista = _medir_memoria_historico(Historico, n)
+        colunar = _medir_memoria_historico(HistoricoColunar, n)
+        print(f"{n:>12} {lista / 2**20:>11.1f} {colunar / 2**20:>13.1f} {lista / n:>12.1f} {colunar / n:>14.1f}")
+
+def bench_diario(tamanhos, contas: int = 1000):
+    print(f"{'operacoes':>10} {'politica':>16} {'ops/s':>10} {'fsyncs':>8}")
+    politicas = [('sem diario', None, {}), ('sempre', 'sempre', {}), ('lote (1000)', 'lote', {}),
+                 ('lote (10 ms)', 'lote', {'tamanho_lote': 10**9}), ('nunca', 'nunca', {})]
+    for n in tamanhos:
+        for nome, politica, opcoes in politicas:
+            with tempfile.TemporaryDirectory() as diretorio:
+                diario = Diario(os.path.join(diretorio, 'banco.diario'), politica, **opcoes) if politica else None
+                registro = Registro(diario)
+                usuario = registro.adicionar_usuario(PessoaFisica(_cpf(1), "Cliente", '01/01/1990', 'Rua'))
+                lista = [registro.adicionar_conta(Conta(usuario, i)) for i in range(contas)]
+                operacoes = n if politica != 'sempre' else min(n, 2_000)
+                inicio = time.perf_counter()
+                for i in range(operacoes):
+                    conta = lista[i % contas]
+                    conta.transacoes_realizadas = 0
+                    Deposito.de_centavos(100).registrar(conta)
+                if diario is not None:
+                    diario.fechar()
+                duracao = time.perf_counter() - inicio
+                fsyncs = diario.sincronizacoes if diario is not None else 0
+                print(f"{operacoes:>10} {nome:>16} {operacoes / duracao:>10.0f} {fsyncs:>8}")
+
+def bench_reinicio(tamanhos, contas_por_usuario: int = 10, leituras: int = 10_000):
+    print(f"{'contas':>10} {'MB':>7} {'gravar (s)':>11} {'abrir (ms)':>11} {'us/saldo':>9} "
+          f"{'us/hidratar':>12} {'replay diario (s)':>18}")
+    for n in tamanhos:
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho_diario = os.path.join(diretorio, 'banco.diario')
+            caminho_instantaneo = os.path.join(diretorio, 'banco.inst')
+            registro = Registro(Diario(caminho_diario, 'nunca'))
+            usuario = None
+            for i in range(n):
+                if i % contas_por_usuario == 0:
+                    usuario = registro.adicionar_usuario(PessoaFisica(_cpf(i), f"Cliente {i}", '01/01/1990', 'Rua'))
+                Deposito.de_centavos(100 + i % 1000).registrar(registro.adicionar_conta(Conta(usuario, i + 1)))
+
+            inicio = time.perf_counter()
+            gravar_instantaneo(registro, caminho_instantaneo)
+            gravar = time.perf_counter() - inicio
+            registro.diario.fechar()
+            del registro, usuario
+
+            inicio = time.perf_counter()
+            restaurado = restaurar(caminho_instantaneo)
+            restaurado.saldo_centavos(1)
+            abrir_ms = (time.perf_counter() - inicio) * 1000
+
+            aleatorio = random.Random(n)
+            numeros = [aleatorio.randrange(1, n + 1) for _ in range(leituras)]
+            inicio = time.perf_counter()
+            for numero in numeros:
+                restaurado.saldo_centavos(numero)
+            us_saldo = (time.perf_counter() - inicio) / leituras * 1e6
+
+            amostra = numeros[:1000]
+            inicio = time.perf_counter()
+            for numero in amostra:
+                restaurado.buscar_conta(numero)
+            us_hidratar = (time.perf_counter() - inicio) / len(amostra) * 1e6
+            restaurado.instantaneo.fechar()
+
+            inicio = time.perf_counter()
+            recuperar(caminho_diario)
+            replay = time.perf_counter() - inicio
+
+            megabytes = os.path.getsize(caminho_instantaneo) / 2**20
+            print(f"{n:>10} {megabytes:>7.1f} {gravar:>11.2f} {abrir_ms:>11.2f} {us_saldo:>9.1f} "
+                  f"{us_hidratar:>12.1f} {replay:>18.2f}")
+
+META_IMPORTACAO_MS = 20.0
+
+def _tempo_importacao_ms(modulo: str) -> float:
+    saida = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+                           capture_output=True, text=True, stdin=subprocess.DEVNULL,
+                           cwd=os.path.dirname(os.path.abspath(__file__)))
+    for linha in reversed(saida.stderr.splitlines()):
+        campos = [c.strip() for c in linha.split('|')]
+        if len(campos) == 3 and campos[2] == modulo:
+            return int(campos[1]) / 1000
+    raise RuntimeError(f"Não foi possível medir a importação de {modulo}: {saida.stderr[-200:]}")
+
+def bench_extrato(tamanhos, consultas: int = 2_000):
+    print(f"{'movimentos':>12} {'backend':>8} {'us/pagina (50 itens de 1 dia)':>30}")
+    for n in tamanhos:
+        inicio = datetime(2024, 1, 1, tzinfo=obter_fuso_horario())
+        for nome, fabrica in (('lista', Historico), ('colunar', HistoricoColunar)):
+            historico = fabrica()
+            for i in range(n):
+                historico.adicionar_transacao(Deposito.de_centavos(100, 1_704_078_000_000_000 + i * 60_000_000))
+            aleatorio = random.Random(n)
+            dias = [inicio + timedelta(minutes=aleatorio.randrange(n)) for _ in range(consultas)]
+            tempo = time.perf_counter()
+            for dia in dias:
+                historico.pagina(dia, dia + timedelta(days=1), tamanho=50)
+            us_pagina = (time.perf_counter() - tempo) / consultas * 1e6
+            print(f"{n:>12} {nome:>8} {us_pagina:>30.1f}")
+
+def bench_importacao(tamanhos):
+    print(f"{'modulo':>8} {'execucoes':>10} {'mediana (ms)':>13} {'meta (ms)':>10}")
+    for execucoes in tamanhos:
+        for modulo in ('banco', 'main'):
+            tempos = [_tempo_importacao_ms(modulo) for _ in range(execucoes)]
+            mediana = statistics.median(tempos)
+            meta = f"{META_IMPORTACAO_MS:.0f}" if modulo == 'banco' else '-'
+            print(f"{modulo:>8} {execucoes:>10} {mediana:>13.2f} {meta:>10}")
+
+def bench_servidor(tamanhos, operacoes: int = 20):
+    from cliente_carga import executar_carga, imprimir_resultado, iniciar_servidor
+
+    processo, porta = iniciar_servidor()
+    try:
+        print(f"{'sessoes':>8} {'requisicoes':>11} {'falhas':>7} {'req/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+        proximo_cpf = 0
+        for sessoes in tamanhos:
+            imprimir_resultado(asyncio.run(executar_carga('127.0.0.1', porta, sessoes, operacoes, proximo_cpf)))
+            proximo_cpf += sessoes
+    finally:
+        processo.terminate()
+        processo.wait()
+
+def bench_concorrencia(tamanhos, contas: int = 50_000):
+    import threading
+
+    usuario = PessoaFisica(_cpf(1), 'Cliente', '01/01/1990', 'Rua Exemplo, 123')
+    print(f"{'threads':>8} {'operacoes':>10} {'ops/s':>10}")
+    for threads in tamanhos:
+        lista = [Conta(usuario, numero) for numero in range(1, contas + 1)]
+        for conta in lista:
+            conta.saldo_centavos = 1_000_000
+            conta.historico.definir_saldo_inicial(1_000_000)
+        # 6 depósitos e 3 saques por conta, embaralhados entre as threads (contas e faixas compartilhadas).
+        operacoes = [(conta, tipo) for conta in lista for tipo in (0,) * 6 + (1,) * 3]
+        random.Random(threads).shuffle(operacoes)
+        blocos = [operacoes[i::threads] for i in range(threads)]
+
+        def executar(bloco):
+            for conta, tipo in bloco:
+                if tipo:
+                    conta.sacar_centavos(1_000)
+                else:
+                    conta.depositar_centavos(1_000)
+
+        inicio = time.perf_counter()
+        trabalhadores = [threading.Thread(target=executar, args=(bloco,)) for bloco in blocos]
+        for trabalhador in trabalhadores:
+            trabalhador.start()
+        for trabalhador in trabalhadores:
+            trabalhador.join()
+        duracao = time.perf_counter() - inicio
+        assert all(conta.verificar_consistencia() for conta in lista)
+        print(f"{threads:>8} {len(operacoes):>10} {len(operacoes) / duracao:>10.0f}")
+
+def bench_particionado(tamanhos, contas: int = 100_000):
+    from banco.particionado import LivroParticionado
+
+    # Seis depósitos e depois três saques por conta, intercalados entre as contas.
+    numeros = array('q', list(range(1, contas + 1)) * 9)
+    codigos = array('b', [Deposito.codigo] * (contas * 6) + [Saque.codigo] * (contas * 3))
+    centavos = array('q', [1_000] * len(numeros))
+    print(f"{'particoes':>10} {'operacoes':>10} {'ops/s':>10} {'aceleracao':>11}")
+    base = None
+    for particoes in tamanhos:
+        with LivroParticionado(particoes) as livro:
+            livro.abrir_contas(range(1, contas + 1))
+            inicio = time.perf_counter()
+            status = livro.executar(numeros, codigos, centavos)
+            duracao = time.perf_counter() - inicio
+            assert not any(status) and livro.resumo() == (contas, contas * 3_000)
+        vazao = len(numeros) / duracao
+        base = base or vazao
+        print(f"{particoes:>10} {len(numeros):>10} {vazao:>10.0f} {vazao / base:>10.2f}x")
+
+def bench_transferencias(tamanhos):
+    from banco.lote import executar_transferencias
+
+    usuario = PessoaFisica(_cpf(1), 'Cliente', '01/01/1990', 'Rua Exemplo, 123')
+    print(f"{'transferencias':>15} {'contas':>8} {'transf/s':>10} {'us/transf':>10}")
+    for n in tamanhos:
+        # Cada conta envia 3 e recebe 3 transferências: fica dentro dos limites diários de saques
+        # (a transferência enviada conta como saque) e de transações.
+        total_contas = max(-(-n // 3), 2)
+        contas = [Conta(usuario, numero) for numero in range(1, total_contas + 1)]
+        for conta in contas:
+            conta.saldo_centavos = 1_000_000
+            conta.historico.definir_saldo_inicial(1_000_000)
+        lote = ((contas[i % total_contas], contas[(i + 1) % total_contas], 1_000) for i in range(n))
+        inicio = time.perf_counter()
+        status = executar_transferencias(lote)
+        duracao = time.perf_counter() - inicio
+        assert not any(status) and all(conta.verificar_consistencia() for conta in contas)
+        print(f"{n:>15} {total_contas:>8} {n / duracao:>10.0f} {duracao / n * 1e6:>10.2f}")
+
+def bench_lote(tamanhos):
+    from banco.lote import aplicar_lote
+
+    # Por conta: 6 depósitos e 4 saques (o quarto é recusado pelo limite de saques diários).
+    padrao = [(Deposito.codigo, 10_000)] * 6 + [(Saque.codigo, 5_000)] * 4
+    print(f"{'operacoes':>10} {'por objeto (ops/s)':>19} {'lote (ops/s)':>13} {'aceleracao':>11}")
+    for n in tamanhos:
+        total_contas = max(n // len(padrao), 1)
+        numeros = array('q', (numero for _ in padrao for numero in range(1, total_contas + 1)))
+        codigos = array('b', (codigo for codigo, _ in padrao for _ in range(total_contas)))
+        centavos = array('q', (valor for _, valor in padrao for _ in range(total_contas)))
+        registros = []
+        for _ in range(2):
+            registro = _popular_registro(1)
+            usuario = registro.buscar_usuario(_cpf(0))
+            for _ in range(total_contas):
+                registro.criar_conta(usuario)
+            registros.append(registro)
+
+        por_objeto, em_lote = registros
+        inicio = time.perf_counter()
+        for numero, codigo, valor in zip(numeros, codigos, centavos):
+            conta = por_objeto.buscar_conta(numero)
+            try:
+                if codigo == Saque.codigo:
+                    conta.sacar_centavos(valor)
+                else:
+                    conta.depositar_centavos(valor)
+            except Exception:
+                pass
+        duracao_objeto = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        aplicar_lote(em_lote, numeros, codigos, centavos)
+        duracao_lote = time.perf_counter() - inicio
+        print(f"{len(numeros):>10} {len(numeros) / duracao_objeto:>19.0f} {len(numeros) / duracao_lote:>13.0f} "
+              f"{duracao_objeto / duracao_lote:>10.2f}x")
+
+# Custo relativo máximo das métricas ativas com a amostragem padrão.
+META_METRICAS = 0.05
+
+def bench_metricas(tamanhos, rodadas: int = 15):
+    from banco import ativar_metricas, desativar_metricas
+    from banco.metricas import AMOSTRAGEM_PADRAO, Metricas
+
+    usuario = PessoaFisica(_cpf(1), 'Cliente', '01/01/1990', 'Rua Exemplo, 123')
+
+    def medir(n):
+        conta = Conta(usuario, 1)
+        depositos = [Deposito.de_centavos(100) for _ in range(n)]
+        gc.collect()
+        gc.disable()
+        try:
+            inicio = time.perf_counter()
+            for deposito in depositos:
+                conta.transacoes_realizadas = 0
+                deposito.registrar(conta)
+            return (time.perf_counter() - inicio) / n * 1e9
+        finally:
+            gc.enable()
+
+    padrao = f"amostragem {AMOSTRAGEM_PADRAO} (ns)"
+    print(f"{'operacoes':>10} {'desativadas (ns)':>17} {padrao:>19} {'amostragem 1 (ns)':>18}")
+    excedidos = []
+    for n in tamanhos:
+        # Os modos se alternam a cada rodada e cada custo é a razão para a medida desativada da
+        # mesma rodada; a mediana das razões resiste melhor à variação da máquina que os mínimos.
+        tempos, razoes = [[] for _ in range(3)], [[] for _ in range(2)]
+        for _ in range(rodadas):
+            for i, amostragem in enumerate((None, AMOSTRAGEM_PADRAO, 1)):
+                if amostragem is None:
+                    desativar_metricas()
+                else:
+                    ativar_metricas(Metricas(amostragem=amostragem))
+                tempos[i].append(medir(n))
+            for i in (1, 2):
+                razoes[i - 1].append(tempos[i][-1] / tempos[0][-1] - 1)
+        desativar_metricas()
+        base, padrao, todas = (statistics.median(t) for t in tempos)
+        custo_padrao, custo_todas = (statistics.median(r) for r in razoes)
+        print(f"{n:>10} {base:>17.0f} {padrao:>12.0f} ({custo_padrao:+.0%}) "
+              f"{todas:>11.0f} ({custo_todas:+.0%})")
+        if custo_padrao > META_METRICAS:
+            excedidos.append(n)
+    if excedidos:
+        raise SystemExit(f"Métricas com amostragem {AMOSTRAGEM_PADRAO} acima da meta de "
+                         f"{META_METRICAS:.0%} em {excedidos} operações.")
+
+def bench_eventos(tamanhos, rodadas: int = 5):
+    from banco import SaidaConsole, SaidaEmLote
+
+    # Depósitos registrados com cada saída de eventos; stdout vai para /dev/null, então a
+    # diferença para a saída nula é formatação e chamadas de escrita, não o terminal.
+    usuario = PessoaFisica(_cpf(1), 'Cliente', '01/01/1990', 'Rua Exemplo, 123')
+    print(f"{'operacoes':>10} {'saida':>8} {'ns/deposito':>12}")
+    for n in tamanhos:
+        with open(os.devnull, 'w') as nulo:
+            for nome, saida in (('console', SaidaConsole()), ('lote', SaidaEmLote()), ('nula', SaidaNula())):
+                tempo = float('inf')
+                for _ in range(rodadas):
+                    conta = Conta(usuario, 1)
+                    depositos = [Deposito.de_centavos(100) for _ in range(n)]
+                    definir_saida(saida)
+                    try:
+                        with contextlib.redirect_stdout(nulo):
+                            inicio = time.perf_counter()
+                            for deposito in depositos:
+                                conta.transacoes_realizadas = 0
+                                deposito.registrar(conta)
+                            if isinstance(saida, SaidaEmLote):
+                                saida.descarregar()
+                            tempo = min(tempo, time.perf_counter() - inicio)
+                    finally:
+                        definir_saida(SaidaNula())
+                print(f"{n:>10} {nome:>8} {tempo / n * 1e9:>12.0f}")
+
+def bench_recusas(tamanhos, operacoes: int = 100_000):
+    # Saques em que uma fração `tamanho`% é recusada por saldo insuficiente (ex.: sondagens de
+    # fraude): exceção com mensagem formatada (sacar_centavos) contra código (tentar_sacar_centavos).
+    usuario = PessoaFisica(_cpf(1), 'Cliente', '01/01/1990', 'Rua Exemplo, 123')
+    print(f"{'recusas (%)':>12} {'excecao (ns)':>13} {'codigo (ns)':>12} {'aceleracao':>11}")
+    for percentual in tamanhos:
+        aleatorio = random.Random(percentual)
+        valores = [10**9 if aleatorio.random() * 100 < percentual else 100 for _ in range(operacoes)]
+        tempos = []
+        for excecoes in (True, False):
+            conta = Conta(usuario, 1)
+            gc.collect()
+            inicio = time.perf_counter()
+            for valor in valores:
+                conta.saldo_centavos = 1_000
+                conta.saques_realizados = conta.transacoes_realizadas = 0
+                if excecoes:
+                    try:
+                        conta.sacar_centavos(valor)
+                    except SaldoInsuficienteError:
+                        pass
+                else:
+                    conta.tentar_sacar_centavos(valor)
+            tempos.append((time.perf_counter() - inicio) / operacoes * 1e9)
+        print(f"{percentual:>12} {tempos[0]:>13.0f} {tempos[1]:>12.0f} {tempos[0] / tempos[1]:>10.2f}x")
+
+def bench_limitador(tamanhos, consultas: int = 1_000_000):
+    from banco.limitador import UM_DIA, LimitadorDiario, LimitadorMovel
+
+    # Um saque por conta (de `tamanho` contas) e depois consultas+registros em contas aleatórias
+    # ao longo de um dia; a memória é medida numa segunda montagem, com tracemalloc ligado.
+    inicio_dia = 1_715_914_800_000_000
+    print(f"{'contas':>10} {'janela':>8} {'ns/registro':>12} {'ns/tentar':>10} {'B/conta':>8}")
+    for n in tamanhos:
+        aleatorio = random.Random(n)
+        chaves = [aleatorio.randrange(n) for _ in range(consultas)]
+        instantes = [inicio_dia + i * (UM_DIA // consultas) for i in range(consultas)]
+        for nome, fabrica in (('diaria', lambda: LimitadorDiario(max_eventos=3, max_valor=500_000)),
+                              ('movel', lambda: LimitadorMovel(max_eventos=3, max_valor=500_000))):
+            limitador = fabrica()
+            gc.collect()
+            inicio = time.perf_counter()
+            for numero in range(n):
+                limitador.registrar(numero, inicio_dia, 10_000)
+            ns_registro = (time.perf_counter() - inicio) / n * 1e9
+            tentar = limitador.tentar
+            inicio = time.perf_counter()
+            for chave, instante in zip(chaves, instantes):
+                tentar(chave, instante, 10_000)
+            ns_tentar = (time.perf_counter() - inicio) / consultas * 1e9
+            del limitador, tentar
+            gc.collect()
+
+            tracemalloc.start()
+            limitador = fabrica()
+            for numero in range(n):
+                limitador.registrar(numero, inicio_dia, 10_000)
+            memoria = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del limitador
+            print(f"{n:>10} {nome:>8} {ns_registro:>12.0f} {ns_tentar:>10.0f} {memoria / n:>8.0f}")
+
+def _cpf_valido(i: int) -> str:
+    digitos = [int(d) for d in f"{i:09d}"]
+    for pesos in (range(10, 1, -1), range(11, 1, -1)):
+        digitos.append(sum(d * p for d, p in zip(digitos, pesos)) * 10 % 11 % 10)
+    return ''.join(map(str, digitos))
+
+def bench_carga(tamanhos, tamanho_lote: int = 10_000):
+    import resource
+    from banco.carga import carregar, carregar_no_diario
+    from banco.diario import Diario
+
+    # Arquivo CSV gerado com metade das linhas abrindo conta, 1% de CPFs com dígito errado e
+    # 1% de linhas repetidas; mede linhas/s da carga direto num diário e num Registro e o pico
+    # de memória do processo. O pico só cresce: o diário (que não guarda clientes) vem antes.
+    print(f"{'destino':>9} {'linhas':>10} {'linhas/s':>10} {'clientes':>10} {'contas':>9} {'recusadas':>10} "
+          f"{'pico RSS (MB)':>14}")
+    for destino in ('diario', 'registro'):
+        for n in tamanhos:
+            with tempfile.TemporaryDirectory() as diretorio:
+                caminho = os.path.join(diretorio, 'clientes.csv')
+                with open(caminho, 'w', encoding='utf-8') as arquivo:
+                    arquivo.write("cpf,nome,data_nascimento,endereco,conta,agencia\n")
+                    for i in range(n):
+                        base = i - 1 if i % 100 == 99 else i
+                        cpf = _cpf_valido(base + 1)
+                        if i % 100 == 50:
+                            cpf = cpf[:10] + str((int(cpf[10]) + 1) % 10)
+                        conta = i + 1 if i % 2 else ''
+                        arquivo.write(f"{cpf},Cliente {base},{base % 28 + 1:02d}/{base % 12 + 1:02d}/"
+                                      f"{1940 + base % 60},Rua Exemplo {base},{conta},0001\n")
+                registro = Registro() if destino == 'registro' else None
+                gc.collect()
+                inicio = time.perf_counter()
+                with open(caminho, newline='', encoding='utf-8') as arquivo:
+                    if registro is not None:
+                        resultado = carregar(registro, arquivo, tamanho_lote=tamanho_lote)
+                    else:
+                        with Diario(os.path.join(diretorio, 'carga.diario'), 'nunca') as diario:
+                            resultado = carregar_no_diario(diario, arquivo, tamanho_lote=tamanho_lote)
+                duracao = time.perf_counter() - inicio
+                pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+                print(f"{destino:>9} {n:>10} {n / duracao:>10.0f} {resultado.clientes:>10} {resultado.contas:>9} "
+                      f"{resultado.rejeitadas:>10} {pico:>14.0f}")
+                del registro, resultado
+
+def bench_cache_extrato(tamanhos, consultas: int = 20_000, movimentos: int = 2_000):
+    from banco import CacheExtrato, ativar_cache_extrato, desativar_cache_extrato
+
+    # `tamanho` contas com `movimentos` movimentações cada; consultas das últimas 50 linhas
+    # (o extrato que o cliente atualiza) com 80% delas em 10% das contas e um depósito novo a
+    # cada 10 consultas. Mede us/extrato sem e com o cache (orçamento de 8 MB), a taxa de
+    # acerto e a memória das linhas guardadas.
+    print(f"{'contas':>8} {'us sem cache':>13} {'us com cache':>13} {'acerto':>7} {'MB':>6} {'despejos':>9}")
+    for n in tamanhos:
+        historicos = []
+        for _ in range(n):
+            historico = Historico()
+            for i in range(movimentos):
+                historico.adicionar_transacao(Deposito.de_centavos(100 + i, 1_704_078_000_000_000 + i * 60_000_000))
+            historicos.append(historico)
+        aleatorio = random.Random(n)
+        quentes = max(n // 10, 1)
+        alvos = [aleatorio.randrange(quentes) if aleatorio.random() < 0.8 else aleatorio.randrange(n)
+                 for _ in range(consultas)]
+        tempos, cache = [], None
+        for com_cache in (False, True):
+            if com_cache:
+                cache = ativar_cache_extrato(CacheExtrato(orcamento=8 * 1024 * 1024, max_linhas=200))
+            try:
+                with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+                    inicio = time.perf_counter()
+                    for consulta, alvo in enumerate(alvos):
+                        historico = historicos[alvo]
+                        if consulta % 10 == 9:
+                            historico.adicionar_transacao(Deposito.de_centavos(100, 1_800_000_000_000_000 + consulta))
+                        historico.listar_transacoes(cursor=len(historico) - 50)
+                    tempos.append((time.perf_counter() - inicio) / consultas * 1e6)
+            finally:
+                desativar_cache_extrato()
+        estatisticas = cache.estatisticas()
+        print(f"{n:>8} {tempos[0]:>13.1f} {tempos[1]:>13.1f} {estatisticas['taxa_acerto']:>7.1%} "
+              f"{estatisticas['bytes'] / 1e6:>6.1f} {estatisticas['despejos']:>9}")
+
+def bench_numeracao(tamanhos, contas: int = 200_000):
+    import threading
+    from banco import AlocadorNumeros
+
+    # `contas` contas criadas por `tamanho` threads (duas agências), com o alocador em memória
+    # e com reservas gravadas em arquivo; confere que nenhum número se repete.
+    print(f"{'threads':>8} {'alocador':>9} {'contas/s':>10} {'reservas':>9} {'repetidos':>10}")
+    usuario = PessoaFisica(_cpf(1), 'Cliente', '01/01/1990', 'Rua Exemplo, 123')
+    for n in tamanhos:
+        for nome in ('memoria', 'arquivo'):
+            with tempfile.TemporaryDirectory() as diretorio:
+                caminho = os.path.join(diretorio, 'numeros') if nome == 'arquivo' else None
+                registro = Registro(alocador=AlocadorNumeros(caminho))
+                registro.adicionar_usuario(usuario)
+                usuario.contas = []
+
+                def criar(agencia, quantidade=contas // n):
+                    criar_conta = registro.criar_conta
+                    for _ in range(quantidade):
+                        criar_conta(usuario, agencia)
+                threads = [threading.Thread(target=criar, args=(('0001', '0002')[i % 2],)) for i in range(n)]
+                gc.collect()
+                inicio = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                duracao = time.perf_counter() - inicio
+                total = registro.total_contas
+                repetidos = len(usuario.contas) - total
+                print(f"{n:>8} {nome:>9} {total / duracao:>10.0f} {registro.alocador.reservas:>9} {repetidos:>10}")
+
+def bench_sqlite(tamanhos, contas: int = 1_000, consultas: int = 2_000):
+    from banco.repositorio import HistoricoSqlite, RegistroSqlite
+
+    # `tamanho` depósitos, um por minuto, espalhados por `contas` contas (10 por usuário), enviados
+    # ao escritor em lote; mede movimentos/s até o último estar gravado, o tamanho do arquivo e a
+    # latência de consultas indexadas: login (usuário + contas pelo CPF) e página de extrato de
+    # um dia (até 50 itens) de uma conta aleatória.
+    print(f"{'movimentos':>11} {'mov/s':>9} {'lotes':>6} {'MB':>6} {'login p50/p99 (us)':>19} "
+          f"{'extrato p50/p99 (us)':>21}")
+    for n in tamanhos:
+        with tempfile.TemporaryDirectory() as diretorio:
+            registro = RegistroSqlite(os.path.join(diretorio, 'banco.db'))
+            usuarios = [registro.adicionar_usuario(PessoaFisica(_cpf(i), f"Cliente {i}", '01/01/1990', 'Rua Exemplo'))
+                        for i in range(contas // 10)]
+            todas = [registro.criar_conta(usuarios[i // 10]) for i in range(contas)]
+            registro.diario.sincronizar()
+            escritor, inicio_us = registro.diario, 1_704_078_000_000_000
+            gc.collect()
+            inicio = time.perf_counter()
+            for i in range(n):
+                escritor.registrar_transacao(todas[i % contas], Deposito.de_centavos(100, inicio_us + i * 60_000_000))
+            escritor.sincronizar()
+            duracao = time.perf_counter() - inicio
+            megabytes = sum(os.path.getsize(os.path.join(diretorio, nome)) for nome in os.listdir(diretorio)) / 1e6
+
+            aleatorio = random.Random(n)
+            repositorio, dias = registro.repositorio, max(n // 1440, 1)
+            tempos_login, tempos_extrato = [], []
+            for _ in range(consultas):
+                cpf = _cpf(aleatorio.randrange(len(usuarios)))
+                tempo = time.perf_counter()
+                repositorio.usuario(cpf)
+                repositorio.contas_do_usuario(cpf)
+                tempos_login.append(time.perf_counter() - tempo)
+                historico = HistoricoSqlite(repositorio, todas[aleatorio.randrange(contas)].numero)
+                dia = inicio_us + aleatorio.randrange(dias) * 86_400_000_000
+                tempo = time.perf_counter()
+                historico.pagina(datetime.fromtimestamp(dia / 1e6, obter_fuso_horario()),
+                                 datetime.fromtimestamp((dia + 86_400_000_000) / 1e6, obter_fuso_horario()))
+                tempos_extrato.append(time.perf_counter() - tempo)
+            lotes = escritor.lotes
+            registro.fechar()
+            login = statistics.quantiles(tempos_login, n=100)
+            extrato = statistics.quantiles(tempos_extrato, n=100)
+            login = f"{login[49] * 1e6:.0f}/{login[98] * 1e6:.0f}"
+            extrato = f"{extrato[49] * 1e6:.0f}/{extrato[98] * 1e6:.0f}"
+            print(f"{n:>11} {n / duracao:>9.0f} {lotes:>6} {megabytes:>6.0f} {login:>19} {extrato:>21}")
+
+BENCHMARKS = {
+    'cache_extrato': (bench_cache_extrato, [100, 1_000]),
+    'carga': (bench_carga, [100_000, 1_000_000]),
+    'concorrencia': (bench_concorrencia, [1, 2, 4, 8, 16]),
+    'diario': (bench_diario, [100_000]),
+    'eventos': (bench_eventos, [100_000]),
+    'extrato': (bench_extrato, [10_000, 100_000, 1_000_000]),
+    'importacao': (bench_importacao, [20]),
+    'limitador': (bench_limitador, [1_000_000, 5_000_000]),
+    'lote': (bench_lote, [100_000, 1_000_000]),
+    'memoria_historico': (bench_memoria_historico, [100_000, 1_000_000]),
+    'metricas': (bench_metricas, [100_000]),
+    'numeracao': (bench_numeracao, [1, 2, 4, 8]),
+    'particionado': (bench_particionado, [1, 2, 4, 8]),
+    'reinicio': (bench_reinicio, [1_000_000, 10_000_000]),
+    'recusas': (bench_recusas, [0, 50, 90, 100]),
+    'registro': (bench_registro, [1_000, 10_000, 100_000, 1_000_000]),
+    'servidor': (bench_servidor, [100, 1_000, 5_000]),
+    'sqlite': (bench_sqlite, [100_000, 1_000_000]),
+    'transferencias': (bench_transferencias, [100_000, 500_000]),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do sistema bancário V3.")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--tamanhos', type=int, nargs='+',
+                        help="Tamanhos a medir (ex.: --tamanhos 1000 10000000).")
+    args = parser.parse_args()
+
+    # Os benchmarks medem o modelo, não a saída: os eventos das transações são descartados.
+    definir_saida(SaidaNula())
+    funcao, tamanhos_padrao = BENCHMARKS[args.benchmark]
+    funcao(args.tamanhos or tamanhos_padrao)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Cada sessão abre sua própria conexão, cadastra um usuário e repete o ciclo abaixo. Cada
+# conta recebe no máximo 9 movimentações, abaixo do limite diário de transações.
+CICLO = ['criar_conta'] + ['depositar'] * 5 + ['sacar'] * 3 + ['extrato']
+
+def _cpf(i: int) -> str:
+    return f"9{i:010d}"
+
+async def _sessao(host: str, porta: int, indice: int, operacoes: int, latencias: list, falhas: list):
+    leitor, escritor = await asyncio.open_connection(host, porta)
+
+    async def enviar(requisicao: dict) -> dict:
+        inicio = time.perf_counter()
+        escritor.write(json.dumps(requisicao).encode() + b'\n')
+        resposta = json.loads(await leitor.readline())
+        latencias.append(time.perf_counter() - inicio)
+        if not resposta['ok']:
+            falhas.append(resposta['erro'])
+        return resposta
+
+    cpf = _cpf(indice)
+    await enviar({'op': 'criar_usuario', 'cpf': cpf, 'nome': f"Cliente {indice}",
+                  'data_nascimento': '01/01/1990', 'endereco': 'Rua Exemplo, 123'})
+    await enviar({'op': 'login', 'cpf': cpf})
+    conta = None
+    for i in range(operacoes):
+        op = CICLO[i % len(CICLO)]
+        if op == 'criar_conta':
+            conta = (await enviar({'op': op})).get('conta')
+        elif op == 'extrato':
+            await enviar({'op': op, 'conta': conta})
+        else:
+            await enviar({'op': op, 'conta': conta, 'centavos': 10_000 if op == 'depositar' else 2_500})
+    escritor.close()
+    await escritor.wait_closed()
+
+async def executar_carga(host: str, porta: int, sessoes: int, operacoes: int, inicio_cpf: int = 0) -> dict:
+    latencias, falhas = [], []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(_sessao(host, porta, inicio_cpf + i, operacoes, latencias, falhas)
+                           for i in range(sessoes)))
+    duracao = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        'sessoes': sessoes,
+        'requisicoes': len(latencias),
+        'falhas': len(falhas),
+        'duracao_s': duracao,
+        'vazao_rps': len(latencias) / duracao,
+        'p50_ms': statistics.median(latencias) * 1000,
+        'p99_ms': latencias[int(len(latencias) * 0.99) - 1] * 1000,
+    }
+
+def iniciar_servidor():
+    # Sobe `python -m banco.servidor` numa porta livre e devolve (processo, porta).
+    processo = subprocess.Popen([sys.executable, '-m', 'banco.servidor', '--porta', '0'],
+                                stdout=subprocess.PIPE, text=True)
+    linha = processo.stdout.readline()
+    return processo, int(linha.rsplit(':', 1)[1])
+
+def imprimir_resultado(resultado: dict):
+    print(f"{resultado['sessoes']:>8} {resultado['requisicoes']:>11} {resultado['falhas']:>7} "
+          f"{resultado['vazao_rps']:>10.0f} {resultado['p50_ms']:>9.2f} {resultado['p99_ms']:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Cliente de carga para o servidor do sistema bancário.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, help="porta de um servidor já em execução; "
+                                                  "sem ela, um servidor local é iniciado")
+    parser.add_argument('--sessoes', type=int, nargs='+', default=[100, 1_000, 5_000])
+    parser.add_argument('--operacoes', type=int, default=20, help="requisições por sessão após o login")
+    opcoes = parser.parse_args()
+
+    processo = None
+    porta = opcoes.porta
+    if porta is None:
+        processo, porta = iniciar_servidor()
+    try:
+        print(f"{'sessoes':>8} {'requisicoes':>11} {'falhas':>7} {'req/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+        proximo_cpf = 0
+        for sessoes in opcoes.sessoes:
+            imprimir_resultado(asyncio.run(executar_carga(opcoes.host, porta, sessoes, opcoes.operacoes,
+                                                          proximo_cpf)))
+            proximo_cpf += sessoes
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+
+if __name__ == '__main__':
+    main()
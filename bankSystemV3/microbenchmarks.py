@@ -0,0 +1,223 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from banco import (Conta, Deposito, Historico, HistoricoColunar, PessoaFisica, Registro, RelogioManual, Saque,
+                   SaidaNula, definir_relogio, definir_saida, obter_fuso_horario)
+
+# Microbenchmarks dos caminhos quentes do V3. Cada caso monta o estado para um tamanho
+# (movimentações no histórico ou usuários no registro) e devolve uma função que executa
+# `operacoes` vezes a operação medida. O relógio é fixo e as sementes são determinísticas,
+# então duas execuções na mesma máquina medem exatamente o mesmo trabalho.
+INICIO = datetime(2024, 5, 17, 12, 0, tzinfo=obter_fuso_horario())
+TAMANHOS_PADRAO = [10, 1_000, 100_000]
+TOLERANCIA_PADRAO = 0.10
+
+def _cpf(i: int) -> str:
+    return f"{i:011d}"
+
+def _conta_com_historico(n: int, historico=None) -> Conta:
+    conta = Conta(PessoaFisica(_cpf(1), 'Cliente', '01/01/1990', 'Rua Exemplo, 123'), 1, historico=historico)
+    um_segundo = timedelta(seconds=1)
+    inicio = INICIO - n * um_segundo
+    for i in range(n):
+        conta.historico.adicionar_transacao(Deposito(10.0 + i % 100, inicio + i * um_segundo))
+    conta.saldo_centavos = conta.historico.agregados.saldo_final
+    return conta
+
+def caso_deposito_registrar(n: int, operacoes: int):
+    conta = _conta_com_historico(n)
+    depositos = [Deposito.de_centavos(1_000) for _ in range(operacoes)]
+
+    def executar():
+        # Os contadores diários são zerados a cada chamada para não esbarrar nos limites.
+        for deposito in depositos:
+            conta.transacoes_realizadas = 0
+            deposito.registrar(conta)
+    return executar
+
+def caso_saque_registrar(n: int, operacoes: int):
+    conta = _conta_com_historico(n)
+    saques = [Saque.de_centavos(1_000) for _ in range(operacoes)]
+
+    def executar():
+        conta.saldo_centavos += operacoes * 1_000
+        for saque in saques:
+            conta.transacoes_realizadas = conta.saques_realizados = 0
+            saque.registrar(conta)
+    return executar
+
+def caso_validar_saque(n: int, operacoes: int):
+    conta = _conta_com_historico(n)
+    conta.saldo_centavos += 1_000
+    saque = Saque.de_centavos(1_000)
+
+    def executar():
+        verificar = saque.verificar
+        for _ in range(operacoes):
+            verificar(conta)
+    return executar
+
+def caso_saque_recusado(n: int, operacoes: int):
+    # Recusa por limite de saques diários sem exceção: só o código, nenhuma mensagem montada.
+    conta = _conta_com_historico(n)
+    conta.saques_realizados = 3
+    saque = Saque.de_centavos(1_000)
+
+    def executar():
+        tentar = saque.tentar_registrar
+        for _ in range(operacoes):
+            tentar(conta)
+    return executar
+
+def _caso_historico_adicionar(fabrica):
+    def caso(n: int, operacoes: int):
+        historico = _conta_com_historico(n, fabrica()).historico
+        transacoes = [Deposito(10.0, INICIO) for _ in range(operacoes)]
+
+        def executar():
+            adicionar = historico.adicionar_transacao
+            for transacao in transacoes:
+                adicionar(transacao)
+        return executar
+    return caso
+
+def caso_listar_transacoes(n: int, operacoes: int):
+    # Uma página de até 20 movimentações a partir do meio do histórico (busca binária + formatação).
+    historico = _conta_com_historico(n).historico
+    meio = INICIO - (n // 2) * timedelta(seconds=1)
+
+    def executar():
+        # A página vai para um buffer: o terminal não entra na medida nem recebe as linhas.
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(operacoes):
+                historico.listar_transacoes(inicio=meio, tamanho=20)
+    return executar
+
+def caso_pessoa_fisica(n: int, operacoes: int):
+    cpfs = [f"{c[:3]}.{c[3:6]}.{c[6:9]}-{c[9:]}" for c in map(_cpf, range(operacoes))]
+
+    def executar():
+        for cpf in cpfs:
+            PessoaFisica(cpf, 'Cliente', '01/01/1990', 'Rua Exemplo, 123')
+    return executar
+
+def caso_registro_buscar_usuario(n: int, operacoes: int):
+    registro = Registro()
+    for i in range(n):
+        registro.adicionar_usuario(PessoaFisica(_cpf(i), f"Cliente {i}", '01/01/1990', 'Rua Exemplo, 123'))
+    cpfs = [_cpf((i * 7919) % n) for i in range(operacoes)]
+
+    def executar():
+        buscar = registro.buscar_usuario
+        for cpf in cpfs:
+            buscar(cpf)
+    return executar
+
+# nome -> (caso, operações por rodada)
+CASOS = {
+    'deposito_registrar': (caso_deposito_registrar, 10_000),
+    'saque_registrar': (caso_saque_registrar, 10_000),
+    'validar_saque': (caso_validar_saque, 100_000),
+    'saque_recusado': (caso_saque_recusado, 100_000),
+    'historico_adicionar': (_caso_historico_adicionar(Historico), 100_000),
+    'historico_colunar_adicionar': (_caso_historico_adicionar(HistoricoColunar), 100_000),
+    'listar_transacoes': (caso_listar_transacoes, 1_000),
+    'pessoa_fisica': (caso_pessoa_fisica, 10_000),
+    'registro_buscar_usuario': (caso_registro_buscar_usuario, 100_000),
+}
+
+def medir(nome: str, n: int, rodadas: int = 5) -> dict:
+    caso, operacoes = CASOS[nome]
+    anterior = definir_relogio(RelogioManual(INICIO))
+    saida_anterior = definir_saida(SaidaNula())
+    tempos = []
+    try:
+        # O estado é montado uma vez por tamanho (montar 10M movimentações domina o tempo);
+        # cada rodada acrescenta no máximo `operacoes` itens, desprezível perto de `n`.
+        executar = caso(n, operacoes)
+        for _ in range(rodadas):
+            # O coletor de lixo fica fora da medição.
+            gc.collect()
+            gc.disable()
+            try:
+                inicio = time.perf_counter_ns()
+                executar()
+                tempos.append((time.perf_counter_ns() - inicio) / operacoes)
+            finally:
+                gc.enable()
+    finally:
+        definir_relogio(anterior)
+        definir_saida(saida_anterior)
+    return {'caso': nome, 'tamanho': n, 'operacoes': operacoes, 'rodadas': rodadas,
+            'ns_por_op': min(tempos), 'ns_por_op_mediana': statistics.median(tempos)}
+
+def executar_suite(casos, tamanhos, rodadas: int = 5) -> dict:
+    resultados = []
+    for nome in casos:
+        for n in tamanhos:
+            resultado = medir(nome, n, rodadas)
+            resultados.append(resultado)
+            print(f"{nome:>28} {n:>10} {resultado['ns_por_op']:>12.0f} {resultado['ns_por_op_mediana']:>12.0f}",
+                  flush=True)
+    return {
+        'maquina': {'python': sys.version.split()[0], 'implementacao': platform.python_implementation(),
+                    'plataforma': platform.platform(), 'processador': platform.machine(),
+                    'cpus': os.cpu_count()},
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'resultados': resultados,
+    }
+
+def comparar(atual: dict, base: dict, tolerancia: float = TOLERANCIA_PADRAO) -> list:
+    # Retorna as regressões: casos em que o tempo por operação (mínimo das rodadas) piorou
+    # além da tolerância relativa. Casos ausentes da base são ignorados.
+    referencia = {(r['caso'], r['tamanho']): r['ns_por_op'] for r in base['resultados']}
+    regressoes = []
+    print(f"\n{'caso':>28} {'tamanho':>10} {'base (ns)':>12} {'atual (ns)':>12} {'variacao':>9}")
+    for resultado in atual['resultados']:
+        chave = (resultado['caso'], resultado['tamanho'])
+        if chave not in referencia:
+            continue
+        variacao = resultado['ns_por_op'] / referencia[chave] - 1
+        marca = "  REGRESSÃO" if variacao > tolerancia else ""
+        print(f"{chave[0]:>28} {chave[1]:>10} {referencia[chave]:>12.0f} {resultado['ns_por_op']:>12.0f} "
+              f"{variacao:>+8.1%}{marca}")
+        if marca:
+            regressoes.append({**resultado, 'ns_por_op_base': referencia[chave], 'variacao': variacao})
+    return regressoes
+
+def main(argumentos=None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks dos caminhos quentes do V3.")
+    parser.add_argument('--casos', nargs='+', choices=sorted(CASOS), default=list(CASOS))
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO,
+                        help="movimentações no histórico / usuários no registro (ex.: 10 1000 10000000)")
+    parser.add_argument('--rodadas', type=int, default=5)
+    parser.add_argument('--saida', help="grava os resultados em JSON (ex.: base.json)")
+    parser.add_argument('--comparar', metavar='BASE', help="compara com um JSON gravado antes por --saida")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO,
+                        help="piora relativa aceita antes de acusar regressão (padrão: 0.10)")
+    opcoes = parser.parse_args(argumentos)
+
+    print(f"{'caso':>28} {'tamanho':>10} {'ns/op (min)':>12} {'ns/op (med)':>12}")
+    atual = executar_suite(opcoes.casos, opcoes.tamanhos, opcoes.rodadas)
+    if opcoes.saida:
+        with open(opcoes.saida, 'w') as arquivo:
+            json.dump(atual, arquivo, indent=2)
+    if opcoes.comparar:
+        with open(opcoes.comparar) as arquivo:
+            regressoes = comparar(atual, json.load(arquivo), opcoes.tolerancia)
+        if regressoes:
+            print(f"\n{len(regressoes)} regressão(ões) acima de {opcoes.tolerancia:.0%}.")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
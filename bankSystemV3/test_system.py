@@ -1,6 +1,10 @@
+import os
+import subprocess
+import sys
+import tracemalloc
 import pytest
 from datetime import datetime, timedelta
-from main import PessoaFisica, Conta, SaldoInsuficienteError, LimiteSaqueExcedidoError, LimiteSaquesDiariosError, ValorInvalidoError, LimiteTransacoesDiariasError, Deposito, Saque, formatar_moeda, Historico, fuso_horario
+from banco import PessoaFisica, Conta, SaldoInsuficienteError, LimiteSaqueExcedidoError, LimiteSaquesDiariosError, ValorInvalidoError, LimiteTransacoesDiariasError, Deposito, Saque, formatar_moeda, Historico, fuso_horario, Registro, CpfDuplicadoError
 
 @pytest.fixture
 def usuario_exemplo():
@@ -66,3 +70,1197 @@ def test_limite_transacoes_diarias(conta_exemplo):
 
 def test_formatar_moeda():
     assert formatar_moeda(1234.567) == "R$ 1234.57"
+
+
+def test_registro_busca_por_cpf(usuario_exemplo):
+    registro = Registro()
+    registro.adicionar_usuario(usuario_exemplo)
+    assert registro.buscar_usuario('12345678901') is usuario_exemplo
+    assert registro.buscar_usuario('123.456.789-01') is usuario_exemplo
+    assert registro.buscar_usuario('98765432100') is None
+    assert registro.buscar_usuario('abc') is None
+
+def test_registro_rejeita_cpf_duplicado(usuario_exemplo):
+    registro = Registro()
+    registro.adicionar_usuario(usuario_exemplo)
+    duplicado = PessoaFisica(cpf='123.456.789-01', nome='Outro', data_nascimento='02/02/1992', endereco='Rua B, 1')
+    with pytest.raises(CpfDuplicadoError):
+        registro.adicionar_usuario(duplicado)
+    assert len(registro) == 1
+
+def test_registro_indexa_contas_por_titular(usuario_exemplo):
+    registro = Registro()
+    outro = PessoaFisica(cpf='98765432100', nome='Maria', data_nascimento='02/02/1992', endereco='Rua B, 1')
+    registro.adicionar_usuario(usuario_exemplo)
+    registro.adicionar_usuario(outro)
+    conta_1 = registro.adicionar_conta(Conta(usuario_exemplo, 1))
+    registro.adicionar_conta(Conta(outro, 2))
+    conta_3 = registro.adicionar_conta(Conta(usuario_exemplo, 3))
+
+    assert usuario_exemplo.contas == [conta_1, conta_3]
+    assert registro.buscar_conta(3) is conta_3
+    assert registro.buscar_conta(4) is None
+    assert registro.total_contas == 3
+    with pytest.raises(ValueError):
+        registro.adicionar_conta(Conta(outro, 3))
+
+def test_importar_banco_nao_bloqueia_nem_carrega_dependencias_pesadas():
+    codigo = ("import sys, banco; "
+              "print(sorted(m for m in ('enum', 're', 'typing', 'zoneinfo', 'pytz', 'banco.eventos', 'banco.extrato', "
+              "'banco.limitador', 'banco.metricas') if m in sys.modules))")
+    saida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, timeout=30,
+                           stdin=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert saida.returncode == 0, saida.stderr
+    assert saida.stdout.strip() == '[]'
+
+def test_saida_padrao_no_console_sem_importar_eventos_antes():
+    # A primeira emissão carrega banco.eventos; a mensagem sai no console como sempre.
+    codigo = ("import banco; "
+              "conta = banco.Conta(banco.PessoaFisica('12345678901', 'A', '01/01/1990', 'R'), 1); "
+              "conta.depositar(10.0); conta.depositar(5.0)")
+    saida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, timeout=30,
+                           stdin=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert saida.returncode == 0, saida.stderr
+    assert saida.stdout == "Depósito de R$ 10.00 realizado com sucesso!\nDepósito de R$ 5.00 realizado com sucesso!\n"
+
+def test_fuso_horario_carregado_sob_demanda():
+    from banco import fuso_horario as fuso
+    assert str(fuso) == 'America/Sao_Paulo'
+
+def test_historico_colunar_preserva_transacoes(usuario_exemplo):
+    from banco import HistoricoColunar
+    conta = Conta(cliente=usuario_exemplo, numero=1, historico=HistoricoColunar())
+    Deposito(100.0).registrar(conta)
+    saque = Saque(30.5)
+    saque.registrar(conta)
+
+    transacoes = conta.historico.transacoes
+    assert len(transacoes) == 2
+    assert [type(t) for t in transacoes] == [Deposito, Saque]
+    assert transacoes[1].valor == 30.5
+    assert transacoes[1].data_hora == saque.data_hora
+    assert conta.saldo == 69.5
+
+def test_historico_colunar_listagem_igual_a_historico(capsys):
+    from banco import HistoricoColunar
+    data_hora = datetime(2024, 5, 17, 14, 30, tzinfo=fuso_horario)
+    historicos = (Historico(), HistoricoColunar())
+    for historico in historicos:
+        historico.adicionar_transacao(Deposito(250.0, data_hora))
+        historico.adicionar_transacao(Saque(99.99, data_hora + timedelta(minutes=1)))
+    saidas = []
+    for historico in historicos:
+        historico.listar_transacoes()
+        saidas.append(capsys.readouterr().out)
+    assert saidas[0] == saidas[1]
+    assert "2024-05-17 14:31:00 - Saque: R$ 99.99" in saidas[1]
+
+LIMITE_BYTES_POR_CONTA = 300
+LIMITE_BYTES_POR_TRANSACAO = 180
+
+def _bytes_por_item(fabrica, n=10_000):
+    tracemalloc.start()
+    itens = [fabrica(i) for i in range(n)]
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del itens
+    return atual / n
+
+def test_modelo_sem_dict_por_instancia(usuario_exemplo, conta_exemplo):
+    for objeto in (usuario_exemplo, conta_exemplo, conta_exemplo.historico, Saque(1.0), Deposito(1.0)):
+        assert not hasattr(objeto, '__dict__'), type(objeto).__name__
+
+def test_memoria_por_conta(usuario_exemplo):
+    assert _bytes_por_item(lambda i: Conta(usuario_exemplo, i)) <= LIMITE_BYTES_POR_CONTA
+
+def test_memoria_por_transacao():
+    assert _bytes_por_item(lambda i: Saque(10.0 + i)) <= LIMITE_BYTES_POR_TRANSACAO
+
+@pytest.mark.parametrize('texto, centavos', [
+    ('100', 10000), ('100.5', 10050), ('0,01', 1), ('1.234,56', 123456), ('1,234.56', 123456),
+    ('R$ 12,30', 1230), ('-5', -500),
+])
+def test_converter_para_centavos(texto, centavos):
+    from banco import converter_para_centavos
+    assert converter_para_centavos(texto) == centavos
+
+@pytest.mark.parametrize('texto', ['', 'abc', '1.234', '10,001', '1x'])
+def test_converter_para_centavos_invalido(texto):
+    from banco import converter_para_centavos
+    with pytest.raises(ValorInvalidoError):
+        converter_para_centavos(texto)
+
+def test_saldo_em_centavos_sem_erro_de_arredondamento(conta_exemplo):
+    for _ in range(9):
+        Deposito(0.1).registrar(conta_exemplo)
+    assert conta_exemplo.saldo_centavos == 90
+    assert conta_exemplo.saldo == 0.9
+    Saque.de_centavos(1).registrar(conta_exemplo)
+    assert conta_exemplo.saldo_centavos == 89
+
+def test_formatar_centavos():
+    from banco import formatar_centavos
+    assert formatar_centavos(123457) == "R$ 1234.57"
+    assert formatar_centavos(-5) == "R$ -0.05"
+
+@pytest.fixture
+def relogio_manual():
+    from banco import RelogioManual, definir_relogio
+    relogio = RelogioManual(datetime(2024, 5, 17, 23, 0, tzinfo=fuso_horario))
+    anterior = definir_relogio(relogio)
+    yield relogio
+    definir_relogio(anterior)
+
+def test_relogio_recalcula_dia_somente_na_virada(relogio_manual):
+    from datetime import date
+    assert relogio_manual.hoje() == date(2024, 5, 17)
+    assert relogio_manual.segundos_ate_virada() == 3600
+    relogio_manual.avancar(minutes=59, seconds=59)
+    assert relogio_manual.hoje() == date(2024, 5, 17)
+    relogio_manual.avancar(seconds=1)
+    assert relogio_manual.hoje() == date(2024, 5, 18)
+    assert relogio_manual.segundos_ate_virada() == 24 * 3600
+
+def test_limites_diarios_reiniciam_na_virada_do_dia(relogio_manual, conta_exemplo):
+    conta_exemplo.saldo = 1000.0
+    for _ in range(3):
+        conta_exemplo.sacar(10.0)
+    with pytest.raises(LimiteSaquesDiariosError, match="01:00:00"):
+        conta_exemplo.sacar(10.0)
+
+    relogio_manual.avancar(hours=1)
+    conta_exemplo.sacar(10.0)
+    assert conta_exemplo.saques_realizados == 1
+    assert conta_exemplo.historico.transacoes[-1].data_hora == datetime(2024, 5, 18, 0, 0, tzinfo=fuso_horario)
+
+def test_diario_recupera_estado(tmp_path, relogio_manual):
+    from banco.diario import abrir
+    caminho = str(tmp_path / 'banco.diario')
+    registro = abrir(caminho, politica='sempre')
+    usuario = registro.adicionar_usuario(
+        PessoaFisica(cpf='12345678901', nome='João da Silva', data_nascimento='01/01/1990', endereco='Rua Exemplo, 123'))
+    conta = registro.adicionar_conta(Conta(usuario, 1))
+    conta.depositar(100.0)
+    relogio_manual.avancar(hours=2)
+    conta.depositar(50.0)
+    conta.sacar(30.25)
+    with pytest.raises(SaldoInsuficienteError):
+        conta.sacar(500.0)
+    registro.diario.fechar()
+
+    recuperado = abrir(caminho)
+    conta_recuperada = recuperado.buscar_conta(1)
+    assert recuperado.buscar_usuario('12345678901').nome == 'João da Silva'
+    assert conta_recuperada.cliente.contas == [conta_recuperada]
+    assert conta_recuperada.saldo_centavos == conta.saldo_centavos == 11975
+    assert [t.data_hora for t in conta_recuperada.historico.transacoes] == [t.data_hora for t in conta.historico.transacoes]
+    assert (conta_recuperada.saques_realizados, conta_recuperada.transacoes_realizadas) == (1, 2)
+
+    conta_recuperada.depositar(1.0)
+    recuperado.diario.fechar()
+    assert abrir(caminho).buscar_conta(1).saldo_centavos == 11975 + 100
+
+def test_diario_descarta_registro_incompleto(tmp_path):
+    from banco.diario import recuperar
+    caminho = tmp_path / 'banco.diario'
+    caminho.write_bytes(b'U ["12345678901", "Ana", "01/01/1990", "Rua A"]\n'
+                        b'C [1, "0001", "12345678901"]\n'
+                        b'T 1 0 1000 1700000000000000\n'
+                        b'T 1 0 99')
+    registro = recuperar(str(caminho))
+    assert registro.buscar_conta(1).saldo_centavos == 1000
+    assert caminho.read_bytes().endswith(b'1700000000000000\n')
+
+def test_diario_agrupa_sincronizacoes(tmp_path, usuario_exemplo):
+    from banco.diario import Diario
+    with Diario(str(tmp_path / 'banco.diario'), politica='lote', tamanho_lote=4, intervalo=3600) as diario:
+        conta = Conta(usuario_exemplo, 1)
+        for _ in range(8):
+            diario.registrar_transacao(conta, Deposito(1.0))
+        assert diario.sincronizacoes == 2
+
+def test_diario_grava_sem_buffer_e_descarrega_na_pausa(tmp_path, usuario_exemplo):
+    import time
+    from banco.diario import Diario
+    caminho = tmp_path / 'banco.diario'
+    with Diario(str(caminho), politica='lote', tamanho_lote=1000, intervalo=0.01) as diario:
+        diario.registrar_transacao(Conta(usuario_exemplo, 1), Deposito(1.0))
+        # Já no arquivo (não num buffer do processo), e sincronizado sem esperar outra escrita.
+        assert caminho.read_bytes().startswith(b'T 1 0 100 ')
+        limite = time.monotonic() + 5
+        while diario.sincronizacoes == 0 and time.monotonic() < limite:
+            time.sleep(0.005)
+        assert diario.sincronizacoes == 1
+
+def test_instantaneo_serve_saldos_e_hidrata_sob_demanda(tmp_path, relogio_manual):
+    from banco.diario import abrir
+    from banco.instantaneo import Instantaneo, gravar_instantaneo, restaurar
+    caminho_diario, caminho_instantaneo = str(tmp_path / 'banco.diario'), str(tmp_path / 'banco.inst')
+    registro = abrir(caminho_diario)
+    for i, cpf in enumerate(['12345678901', '98765432100'], start=1):
+        usuario = registro.adicionar_usuario(PessoaFisica(cpf, f'Cliente {i}', '01/01/1990', 'Rua A'))
+        registro.adicionar_conta(Conta(usuario, i)).depositar(100.0 * i)
+    registro.buscar_conta(2).sacar(10.0)
+    gravar_instantaneo(registro, caminho_instantaneo)
+    registro.buscar_conta(1).depositar(5.0)
+    registro.diario.fechar()
+
+    instantaneo = Instantaneo(caminho_instantaneo)
+    assert len(instantaneo) == 2
+    assert instantaneo.saldo_centavos(2) == 19000
+    assert instantaneo.saldo_centavos(3) is None
+    instantaneo.fechar()
+
+    restaurado = restaurar(caminho_instantaneo, caminho_diario)
+    assert restaurado.saldo_centavos(2) == 19000
+    assert restaurado.buscar_conta(1).saldo_centavos == 10500
+    assert restaurado.buscar_conta(1).verificar_consistencia()
+    conta_2 = restaurado.buscar_conta(2)
+    assert (conta_2.saques_realizados, conta_2.transacoes_realizadas) == (1, 2)
+    assert conta_2.cliente.nome == 'Cliente 2' and conta_2.cliente.contas == [conta_2]
+    assert restaurado.total_contas == 2 and len(restaurado) == 2
+    with pytest.raises(CpfDuplicadoError):
+        restaurado.adicionar_usuario(PessoaFisica('12345678901', 'Outro', '01/01/1990', 'Rua B'))
+    restaurado.diario.fechar()
+
+def test_instantaneo_de_instantaneo_sem_hidratar_e_contadores_do_dia(tmp_path, capsys, relogio_manual):
+    from banco.instantaneo import Instantaneo, RegistroInstantaneo, gravar_instantaneo
+    registro = Registro()
+    for i, cpf in enumerate(['12345678901', '98765432100'], start=1):
+        usuario = registro.adicionar_usuario(PessoaFisica(cpf, f'Cliente {i}', '01/01/1990', 'Rua A'))
+        conta = registro.adicionar_conta(Conta(usuario, i))
+        conta.depositar(100.0)
+        for _ in range(3):
+            conta.sacar(1.0)
+    gravar_instantaneo(registro, str(tmp_path / 'ontem.inst'))
+
+    relogio_manual.avancar(days=1)
+    servido = RegistroInstantaneo(Instantaneo(str(tmp_path / 'ontem.inst')))
+    conta_1 = servido.buscar_conta(1)
+    assert (conta_1.saques_realizados, conta_1.transacoes_realizadas) == (0, 0)
+    Saque(1.0).registrar(conta_1)
+    gravar_instantaneo(servido, str(tmp_path / 'hoje.inst'))
+    assert list(servido._contas) == [1]
+
+    novo = Instantaneo(str(tmp_path / 'hoje.inst'))
+    assert (novo.saldo_centavos(1), novo.saldo_centavos(2)) == (9_600, 9_700)
+    assert novo.ler_conta(1)['saques_realizados'] == 1
+    assert novo.ler_usuario('98765432100') == ['Cliente 2', '01/01/1990', 'Rua A', [2]]
+    novo.fechar()
+
+@pytest.fixture(params=['lista', 'colunar'])
+def historico_de_maio(request):
+    from banco import HistoricoColunar
+    historico = Historico() if request.param == 'lista' else HistoricoColunar()
+    inicio = datetime(2024, 5, 1, 12, 0, tzinfo=fuso_horario)
+    for dia in range(31):
+        historico.adicionar_transacao(Deposito(100.0 + dia, inicio + timedelta(days=dia)))
+        historico.adicionar_transacao(Saque(10.0, inicio + timedelta(days=dia, hours=1)))
+    return historico
+
+def test_consultar_historico_por_periodo_e_tipo(historico_de_maio):
+    from datetime import date
+    semana = list(historico_de_maio.consultar(date(2024, 5, 10), date(2024, 5, 17)))
+    assert len(semana) == 14
+    assert semana[0].data_hora == datetime(2024, 5, 10, 12, 0, tzinfo=fuso_horario)
+    depositos = list(historico_de_maio.consultar(date(2024, 5, 10), date(2024, 5, 17), tipo=Deposito))
+    assert [d.valor for d in depositos] == [109.0 + i for i in range(7)]
+    assert list(historico_de_maio.consultar(date(2024, 6, 1))) == []
+
+def test_paginar_historico_com_cursor(historico_de_maio):
+    vistos, cursor = [], None
+    while True:
+        itens, cursor = historico_de_maio.pagina(tipo=Saque, cursor=cursor, tamanho=7)
+        vistos.extend(itens)
+        if cursor is None:
+            break
+    assert len(vistos) == 31 and all(isinstance(t, Saque) for t in vistos)
+
+def test_mostrar_extrato_por_periodo(capsys, conta_exemplo, relogio_manual):
+    conta_exemplo.depositar(100.0)
+    relogio_manual.avancar(hours=2)
+    conta_exemplo.depositar(50.0)
+    capsys.readouterr()
+    proximo = conta_exemplo.mostrar_extrato(inicio=relogio_manual.hoje(), tamanho=5)
+    saida = capsys.readouterr().out
+    assert proximo is None
+    assert "2024-05-18 01:00:00 - Deposito: R$ 50.00" in saida and "R$ 100.00" not in saida
+    assert "Saldo atual: R$ 150.00" in saida
+
+def test_agregados_saldo_no_tempo_e_totais(historico_de_maio):
+    from datetime import date
+    assert historico_de_maio.saldo_em(date(2024, 5, 1)) == 0
+    assert historico_de_maio.saldo_em(date(2024, 5, 3)) == 10000 - 1000 + 10100 - 1000
+    assert historico_de_maio.saldo_em(datetime(2024, 5, 1, 12, 30, tzinfo=fuso_horario)) == 10000
+    assert historico_de_maio.totais_dia(date(2024, 5, 2)) == (10100, 1, 1000, 1)
+    assert historico_de_maio.totais_dia(date(2024, 4, 30)) == (0, 0, 0, 0)
+    depositos_maio = sum(10000 + 100 * dia for dia in range(31))
+    assert historico_de_maio.totais_mes(2024, 5) == (depositos_maio, 31, 31000, 31)
+    assert historico_de_maio.agregados.saldo_final == depositos_maio - 31000
+
+@pytest.mark.parametrize('classe', ['Historico', 'HistoricoColunar'])
+def test_historico_ordena_acrescimo_fora_de_ordem(capsys, usuario_exemplo, classe):
+    import banco
+    from banco import CacheExtrato, Transferencia, ativar_cache_extrato, desativar_cache_extrato
+    historico, outra = getattr(banco, classe)(), Conta(usuario_exemplo, 2)
+    maio = lambda dia, hora: datetime(2024, 5, dia, hora, tzinfo=fuso_horario)
+    cache = ativar_cache_extrato(CacheExtrato())
+    try:
+        historico.adicionar_transacao(Deposito(100.0, maio(1, 10)))
+        historico.adicionar_transacao(Transferencia(10.0, outra, maio(3, 10)))
+        historico.adicionar_transacao(Saque(20.0, maio(4, 10)))
+        historico.listar_transacoes()
+        # Instante tomado antes da trava por outra thread: chega depois de movimentações mais recentes.
+        historico.adicionar_transacao(Deposito(50.0, maio(2, 10)))
+        assert len(cache) == 0
+        historico.listar_transacoes()
+    finally:
+        desativar_cache_extrato()
+    assert [(type(t), t.valor_centavos) for t in historico.transacoes] == [
+        (Deposito, 10_000), (Deposito, 5_000), (Transferencia, 1_000), (Saque, 2_000)]
+    assert historico.transacoes[2].contraparte is outra
+    assert [historico.saldo_em(maio(dia, 12)) for dia in range(1, 5)] == [10_000, 15_000, 14_000, 12_000]
+    assert list(historico.agregados.saldos) == [10_000, 15_000, 14_000, 12_000]
+    assert historico.totais_mes(2024, 5) == (15_000, 2, 3_000, 2)
+    assert [t.valor_centavos for t in historico.consultar(maio(2, 0), maio(3, 12))] == [5_000, 1_000]
+    # A segunda listagem, refeita depois do descarte do cache, já sai na ordem dos instantes.
+    assert capsys.readouterr().out.splitlines()[-4:-2] == [
+        "2024-05-01 10:00:00 - Deposito: R$ 100.00", "2024-05-02 10:00:00 - Deposito: R$ 50.00"]
+
+def test_verificar_consistencia_do_saldo(conta_exemplo):
+    conta_exemplo.depositar(100.0)
+    conta_exemplo.sacar(40.0)
+    assert conta_exemplo.verificar_consistencia()
+    conta_exemplo.saldo_centavos += 1
+    assert not conta_exemplo.verificar_consistencia()
+
+def test_servidor_sessoes_concorrentes():
+    import asyncio
+    import json
+    from banco.servidor import ServidorBanco
+
+    async def sessao(porta, cpf):
+        leitor, escritor = await asyncio.open_connection('127.0.0.1', porta)
+
+        async def enviar(**requisicao):
+            escritor.write(json.dumps(requisicao).encode() + b'\n')
+            return json.loads(await leitor.readline())
+
+        assert (await enviar(op='criar_conta'))['erro'] == 'ErroProtocolo'
+        await enviar(op='criar_usuario', cpf=cpf, nome='Maria', data_nascimento='01/01/1990', endereco='Rua A')
+        assert (await enviar(op='login', cpf=cpf))['contas'] == []
+        conta = (await enviar(op='criar_conta'))['conta']
+        assert (await enviar(op='depositar', conta=conta, valor='R$ 100,50'))['saldo_centavos'] == 10050
+        assert (await enviar(op='sacar', conta=conta, centavos=50))['saldo_centavos'] == 10000
+        falha = await enviar(op='sacar', conta=conta, centavos=20000)
+        assert not falha['ok'] and falha['erro'] == 'SaldoInsuficienteError'
+        extrato = await enviar(op='extrato', conta=conta, tamanho=1)
+        assert extrato['movimentacoes'][0][:2] == ['Deposito', 10050] and extrato['proximo'] == 1
+        escritor.close()
+        return conta
+
+    async def cenario():
+        servidor = ServidorBanco()
+        porta = await servidor.iniciar()
+        contas = await asyncio.gather(*(sessao(porta, f"{i:011d}") for i in range(50)))
+        await servidor.encerrar()
+        return servidor, contas
+
+    servidor, contas = asyncio.run(cenario())
+    assert sorted(contas) == list(range(1, 51))
+    assert len(servidor.registro) == 50
+    assert servidor.processar(None, b'{"op": "apagar_tudo"}\n').startswith(b'{"ok": false')
+    assert b'"ErroProtocolo"' in servidor.processar(None, b'nao e json\n')
+
+def test_servidor_sqlite_nao_bloqueia_o_laco(tmp_path):
+    import asyncio
+    import json
+    import threading
+    from banco.repositorio import RegistroSqlite
+    from banco.servidor import ServidorBanco
+
+    registro = RegistroSqlite(str(tmp_path / 'banco.db'))
+    liberar = threading.Event()
+    consultar_usuario = registro.repositorio.usuario
+
+    def usuario_lento(cpf):
+        # A busca deste CPF fica presa no "banco" até a outra sessão terminar.
+        if cpf == '99999999999':
+            liberar.wait(5)
+        return consultar_usuario(cpf)
+
+    registro.repositorio.usuario = usuario_lento
+
+    async def conectar(porta):
+        leitor, escritor = await asyncio.open_connection('127.0.0.1', porta)
+
+        async def enviar(**requisicao):
+            escritor.write(json.dumps(requisicao).encode() + b'\n')
+            return json.loads(await leitor.readline())
+        return escritor, enviar
+
+    async def cenario():
+        servidor = ServidorBanco(registro)
+        assert servidor.em_threads
+        porta = await servidor.iniciar()
+        escritor_a, enviar_a = await conectar(porta)
+        escritor_b, enviar_b = await conectar(porta)
+        presa = asyncio.ensure_future(enviar_a(op='login', cpf='99999999999'))
+        await enviar_b(op='criar_usuario', cpf='12345678901', nome='Ana', data_nascimento='01/01/1990',
+                       endereco='Rua A')
+        await enviar_b(op='login', cpf='12345678901')
+        conta = (await enviar_b(op='criar_conta'))['conta']
+        deposito = await enviar_b(op='depositar', conta=conta, centavos=100)
+        assert not presa.done()
+        liberar.set()
+        resposta = await presa
+        escritor_a.close()
+        escritor_b.close()
+        await servidor.encerrar()
+        return deposito, resposta
+
+    try:
+        deposito, resposta = asyncio.run(cenario())
+    finally:
+        liberar.set()
+        registro.fechar()
+    assert deposito == {'saldo_centavos': 100, 'ok': True}
+    assert resposta['mensagem'] == "Usuário não encontrado."
+
+def test_servidor_sqlite_falha_de_gravacao_volta_so_para_a_sessao_dela(tmp_path):
+    import json
+    import sqlite3
+    from banco.repositorio import RegistroSqlite
+    from banco.servidor import ServidorBanco, Sessao
+
+    registro = RegistroSqlite(str(tmp_path / 'banco.db'))
+    servidor = ServidorBanco(registro)
+    gravar = registro.diario._gravar
+
+    def gravar_falhando(lote):
+        # O disco "recusa" qualquer movimentação de 13 centavos.
+        if any(item[0] == 'T' and item[-1] == 13 for item in lote):
+            raise sqlite3.OperationalError("disk I/O error")
+        gravar(lote)
+
+    registro.diario._gravar = gravar_falhando
+    try:
+        sessoes = {}
+        for cpf in ('12345678901', '98765432100'):
+            sessao = sessoes[cpf] = Sessao()
+            for requisicao in ({'op': 'criar_usuario', 'cpf': cpf, 'nome': 'Ana', 'data_nascimento': '01/01/1990',
+                                'endereco': 'Rua A'}, {'op': 'login', 'cpf': cpf}, {'op': 'criar_conta'}):
+                assert json.loads(servidor.processar(sessao, json.dumps(requisicao).encode()))['ok']
+        # As duas sessões rodam na mesma thread: o erro de A não pode aparecer para B.
+        falha = json.loads(servidor.processar(sessoes['12345678901'], b'{"op": "depositar", "conta": 1, "centavos": 13}'))
+        certo = json.loads(servidor.processar(sessoes['98765432100'], b'{"op": "depositar", "conta": 2, "centavos": 14}'))
+    finally:
+        registro.fechar()
+    assert falha['erro'] == 'ErroPersistencia' and 'disk I/O error' in falha['mensagem']
+    assert certo == {'saldo_centavos': 14, 'ok': True}
+
+def test_servidor_valida_tipos_e_tamanho_do_extrato(capsys):
+    import json
+    from banco.servidor import ServidorBanco, Sessao
+
+    servidor, sessao = ServidorBanco(), Sessao()
+
+    def enviar(**requisicao):
+        return json.loads(servidor.processar(sessao, json.dumps(requisicao).encode() + b'\n'))
+
+    # Tipos errados respondem ErroProtocolo sem derrubar a conexão.
+    assert enviar(op='criar_usuario', cpf=12345678901, nome='Ana', data_nascimento='01/01/1990',
+                  endereco='Rua A')['erro'] == 'ErroProtocolo'
+    assert enviar(op='login', cpf=12345678901)['erro'] == 'ErroProtocolo'
+    enviar(op='criar_usuario', cpf='12345678901', nome='Ana', data_nascimento='01/01/1990', endereco='Rua A')
+    enviar(op='login', cpf='12345678901')
+    assert enviar(op='criar_conta', agencia=1)['erro'] == 'ErroProtocolo'
+    conta = enviar(op='criar_conta')['conta']
+    assert enviar(op='depositar', conta=conta, valor=100)['erro'] == 'ErroProtocolo'
+    assert enviar(op='depositar', conta=str(conta), valor='100,00')['erro'] == 'ErroProtocolo'
+    assert enviar(op='sacar', conta=conta, centavos=True)['erro'] == 'ErroProtocolo'
+    for _ in range(3):
+        enviar(op='depositar', conta=conta, centavos=100)
+
+    # tamanho fica entre 1 e 50; um tamanho negativo não devolve o histórico inteiro.
+    for tamanho, itens in ((0, 1), (-5, 1), (2, 2), (10_000, 3)):
+        resposta = enviar(op='extrato', conta=conta, tamanho=tamanho)
+        assert len(resposta['movimentacoes']) == itens, tamanho
+    for tamanho in ('x', 2.5, None, True):
+        assert enviar(op='extrato', conta=conta, tamanho=tamanho)['erro'] == 'ErroProtocolo'
+    assert enviar(op='extrato', conta=conta, cursor='1')['erro'] == 'ErroProtocolo'
+    assert enviar(op='extrato', conta=conta, cursor=-1)['erro'] == 'ErroProtocolo'
+    assert enviar(op='extrato', conta=conta, tamanho=1, cursor=2)['proximo'] is None
+
+def test_concorrencia_preserva_invariantes_da_conta(capsys, relogio_manual, monkeypatch):
+    import random
+    import threading
+    import time
+
+    # Cede a vez entre a validação e a atualização, onde uma corrida estouraria saldo ou limites.
+    verificar_saque, verificar_deposito = Saque.verificar, Deposito.verificar
+    monkeypatch.setattr(Saque, 'verificar', lambda self, conta: (verificar_saque(self, conta), time.sleep(0))[0])
+    monkeypatch.setattr(Deposito, 'verificar', lambda self, conta: (verificar_deposito(self, conta), time.sleep(0))[0])
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    usuario = PessoaFisica('12345678901', 'Ana', '01/01/1990', 'Rua A')
+    contas = [Conta(usuario, numero) for numero in range(1, 21)]
+
+    def trabalhador(semente):
+        aleatorio = random.Random(semente)
+        for _ in range(300):
+            conta = aleatorio.choice(contas)
+            try:
+                if aleatorio.random() < 0.5:
+                    conta.depositar_centavos(100)
+                else:
+                    conta.sacar_centavos(150)
+            except (SaldoInsuficienteError, LimiteSaquesDiariosError, LimiteTransacoesDiariasError):
+                pass
+
+    try:
+        threads = [threading.Thread(target=trabalhador, args=(i,)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(intervalo)
+
+    for conta in contas:
+        saques = sum(1 for t in conta.historico.transacoes if isinstance(t, Saque))
+        assert conta.saldo_centavos >= 0 and min(conta.historico.agregados.saldos, default=0) >= 0
+        assert saques == conta.saques_realizados <= 3
+        assert len(conta.historico) == conta.transacoes_realizadas <= 10
+        assert conta.verificar_consistencia()
+        assert conta.saldo_centavos == sum(t.sinal * t.valor_centavos for t in conta.historico.transacoes)
+
+def test_livro_particionado_roteia_e_agrega():
+    from banco import ACEITA, CONTA_INEXISTENTE, SaldoInsuficienteError, codigo_do_erro
+    from banco.particionado import LivroParticionado
+
+    with LivroParticionado(particoes=3) as livro:
+        livro.abrir_contas(range(1, 11))
+        numeros = [1, 2, 3, 1, 2, 99]
+        codigos = [Deposito.codigo, Deposito.codigo, Saque.codigo, Saque.codigo, Deposito.codigo, Deposito.codigo]
+        status = livro.executar(numeros, codigos, [1000, 500, 100, 400, 250, 10])
+        assert list(status) == [ACEITA, ACEITA, codigo_do_erro(SaldoInsuficienteError()), ACEITA, ACEITA,
+                                CONTA_INEXISTENTE]
+        assert livro.saldo_centavos(1) == 600 and livro.saldo_centavos(2) == 750
+        transacoes, proximo = livro.extrato(1)
+        assert [(type(t), t.valor_centavos) for t in transacoes] == [(Deposito, 1000), (Saque, 400)]
+        assert proximo is None and livro.extrato(99) is None
+        assert livro.resumo() == (10, 1350)
+
+def test_transferencia_atomica_nos_dois_historicos(usuario_exemplo, relogio_manual):
+    from banco import HistoricoColunar, Transferencia, TransferenciaRecebida
+    origem, destino = Conta(usuario_exemplo, 1), Conta(usuario_exemplo, 2, historico=HistoricoColunar())
+    origem.depositar_centavos(10_000)
+    origem.transferir_centavos(destino, 2_500)
+    assert (origem.saldo_centavos, destino.saldo_centavos) == (7_500, 2_500)
+    debito, credito = origem.historico.transacoes[-1], destino.historico.transacoes[-1]
+    assert type(debito) is Transferencia and debito.contraparte is destino
+    assert type(credito) is TransferenciaRecebida and credito.contraparte is origem
+    assert debito.microssegundos == credito.microssegundos
+    with pytest.raises(SaldoInsuficienteError):
+        origem.transferir_centavos(destino, 9_000)
+    with pytest.raises(ValorInvalidoError):
+        origem.transferir_centavos(origem, 100)
+    assert (origem.saldo_centavos, destino.saldo_centavos) == (7_500, 2_500)
+    assert (len(origem.historico), len(destino.historico)) == (2, 1)
+    assert origem.verificar_consistencia() and destino.verificar_consistencia()
+
+def test_diario_reaplica_transferencia(tmp_path, relogio_manual):
+    from banco.diario import abrir
+    caminho = str(tmp_path / 'banco.diario')
+    registro = abrir(caminho, politica='sempre')
+    usuario = registro.adicionar_usuario(PessoaFisica('12345678901', 'Ana', '01/01/1990', 'Rua A'))
+    origem, destino = registro.criar_conta(usuario), registro.criar_conta(usuario)
+    origem.depositar(100.0)
+    origem.transferir(destino, 40.0)
+    registro.diario.fechar()
+
+    recuperado = abrir(caminho)
+    origem_recuperada, destino_recuperado = recuperado.buscar_conta(1), recuperado.buscar_conta(2)
+    assert (origem_recuperada.saldo_centavos, destino_recuperado.saldo_centavos) == (6_000, 4_000)
+    assert destino_recuperado.historico.transacoes[0].contraparte is origem_recuperada
+    assert (origem_recuperada.transacoes_realizadas, destino_recuperado.transacoes_realizadas) == (2, 1)
+    assert (origem_recuperada.saques_realizados, destino_recuperado.saques_realizados) == (1, 0)
+    recuperado.diario.fechar()
+
+def test_transferencia_conta_como_saque_e_lotes_emitem_eventos(capsys, usuario_exemplo, relogio_manual):
+    from banco import (LIMITE_SAQUE_EXCEDIDO, LIMITE_SAQUES_DIARIOS_ATINGIDO, SaidaEmLote, Transferencia,
+                       definir_saida)
+    from banco.lote import aplicar_lote, executar_transferencias
+    registro = Registro()
+    registro.adicionar_usuario(usuario_exemplo)
+    origem, destino = registro.criar_conta(usuario_exemplo), registro.criar_conta(usuario_exemplo)
+    origem.depositar(2_000.0)
+    with pytest.raises(LimiteSaqueExcedidoError):
+        origem.transferir(destino, 600.0)
+    origem.sacar(10.0)
+    origem.transferir(destino, 10.0)
+    assert list(executar_transferencias([(origem, destino, 1_000), (origem, destino, 1_000),
+                                         (origem, destino, 60_000)])) == [0, LIMITE_SAQUES_DIARIOS_ATINGIDO,
+                                                                          LIMITE_SAQUE_EXCEDIDO]
+    with pytest.raises(LimiteSaquesDiariosError, match="Tente novamente em 01:00:00"):
+        Transferencia.de_centavos(1_000, contraparte=destino).registrar(origem)
+    assert origem.saques_realizados == 3
+    relogio_manual.avancar(hours=1)
+    capsys.readouterr()
+
+    # Os lotes entregam à saída ativa os mesmos eventos do caminho por transação, só das aceitas.
+    lotes = []
+    anterior = definir_saida(SaidaEmLote(lotes.append, capacidade=1))
+    try:
+        executar_transferencias([(origem, destino, 500), (origem, destino, -1)])
+        aplicar_lote(registro, [2, 1, 2], [Deposito.codigo, Saque.codigo, Saque.codigo], [300, 200, 10**9])
+    finally:
+        definir_saida(anterior)
+    assert [(numero, type(t), t.valor_centavos) for lote in lotes for numero, t in lote] == [
+        (1, Transferencia, 500), (2, Deposito, 300), (1, Saque, 200)]
+    assert capsys.readouterr().out == ""
+
+def test_transferencias_em_lote_concorrentes_sem_impasse(usuario_exemplo, relogio_manual):
+    import threading
+    from banco import ACEITA, SaldoInsuficienteError, codigo_do_erro
+    from banco.lote import executar_transferencias
+
+    contas = [Conta(usuario_exemplo, numero) for numero in (1, 2, 1025, 1026)]
+    for conta in contas:
+        conta.saldo_centavos = 1_000
+        conta.historico.definir_saldo_inicial(1_000)
+    # Sentidos opostos entre as mesmas contas (1 e 1025 dividem a faixa 1; 2 e 1026, a faixa 2).
+    ida = [(contas[0], contas[1], 100), (contas[2], contas[3], 100)] * 2
+    volta = [(contas[1], contas[0], 100), (contas[3], contas[2], 100)] * 2
+    resultados = []
+    threads = [threading.Thread(target=lambda lote: resultados.append(executar_transferencias(iter(lote))), args=(lote,))
+               for lote in (ida, volta)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert not any(thread.is_alive() for thread in threads)
+    assert all(list(status) == [ACEITA] * 4 for status in resultados)
+    assert sum(conta.saldo_centavos for conta in contas) == 4_000
+    assert all(conta.verificar_consistencia() for conta in contas)
+    assert list(executar_transferencias([(contas[0], contas[1], 50_000)])) == [
+        codigo_do_erro(SaldoInsuficienteError())]
+
+def test_lote_equivale_ao_caminho_por_objeto(capsys, usuario_exemplo, relogio_manual):
+    import random
+    from array import array
+    from banco import CONTA_INEXISTENTE, codigo_do_erro
+    from banco.lote import aplicar_lote
+
+    aleatorio = random.Random(7)
+    linhas = [(aleatorio.choice((1, 2, 3)), aleatorio.choice((Deposito.codigo, Saque.codigo)),
+               aleatorio.choice((-100, 0, 5_000, 20_000, 60_000))) for _ in range(60)]
+    registro = Registro()
+    registro.adicionar_usuario(usuario_exemplo)
+    for _ in range(3):
+        registro.criar_conta(usuario_exemplo)
+    status = aplicar_lote(registro, array('q', [n for n, _, _ in linhas] + [99]),
+                          array('b', [c for _, c, _ in linhas] + [0]), array('q', [v for _, _, v in linhas] + [1]))
+
+    referencia = {numero: Conta(usuario_exemplo, numero) for numero in (1, 2, 3)}
+    esperado = []
+    for numero, codigo, valor in linhas:
+        conta = referencia[numero]
+        try:
+            (conta.sacar_centavos if codigo == Saque.codigo else conta.depositar_centavos)(valor)
+            esperado.append(0)
+        except Exception as erro:
+            esperado.append(codigo_do_erro(erro))
+    assert list(status) == esperado + [CONTA_INEXISTENTE]
+    for numero, conta in referencia.items():
+        em_lote = registro.buscar_conta(numero)
+        assert (em_lote.saldo_centavos, em_lote.saques_realizados, em_lote.transacoes_realizadas) == (
+            conta.saldo_centavos, conta.saques_realizados, conta.transacoes_realizadas)
+        assert [(type(t), t.valor_centavos) for t in em_lote.historico.transacoes] == [
+            (type(t), t.valor_centavos) for t in conta.historico.transacoes]
+        assert em_lote.verificar_consistencia()
+
+def test_metricas_contam_resultados_e_exportam_prometheus(tmp_path, conta_exemplo):
+    from banco import Registro, ativar_metricas, desativar_metricas
+    from banco.metricas import Metricas
+    registro = Registro()
+    registro.adicionar_usuario(conta_exemplo.cliente)
+    metricas = ativar_metricas(Metricas(amostragem=1))
+    try:
+        conta_exemplo.depositar(100.0)
+        conta_exemplo.sacar(30.0)
+        with pytest.raises(SaldoInsuficienteError):
+            conta_exemplo.sacar(500.0)
+        registro.buscar_usuario('12345678901')
+        registro.buscar_conta(42)
+    finally:
+        desativar_metricas()
+    conta_exemplo.depositar(1.0)
+
+    texto = metricas.exportar()
+    assert 'banco_transacoes_total{tipo="Deposito",resultado="ok"} 1' in texto
+    assert 'banco_transacoes_total{tipo="Saque",resultado="SaldoInsuficienteError"} 1' in texto
+    assert 'banco_registrar_segundos_bucket{tipo="Saque",le="+Inf"} 2' in texto
+    assert 'banco_registrar_segundos_count{tipo="Deposito"} 1' in texto
+    assert 'banco_buscas_total{alvo="usuario",resultado="encontrado"} 1' in texto
+    assert 'banco_buscas_total{alvo="conta",resultado="ausente"} 1' in texto
+    metricas.gravar(str(tmp_path / 'banco.prom'))
+    assert (tmp_path / 'banco.prom').read_text() == texto
+
+def test_metricas_amostram_por_chamada_e_contam_lotes(capsys, usuario_exemplo, relogio_manual):
+    from array import array
+    from banco import Registro, ativar_metricas, desativar_metricas
+    from banco.lote import aplicar_lote, executar_transferencias
+    from banco.metricas import Metricas
+    registro = Registro()
+    registro.adicionar_usuario(usuario_exemplo)
+    origem, destino = registro.criar_conta(usuario_exemplo), registro.criar_conta(usuario_exemplo)
+    metricas = ativar_metricas(Metricas(amostragem=4))
+    try:
+        # Recusas também avançam a amostragem: 8 chamadas, 2 amostras.
+        for _ in range(7):
+            origem.tentar_sacar_centavos(100)
+        origem.tentar_depositar_centavos(50_000)
+        aplicar_lote(registro, array('q', [origem.numero, origem.numero, 99]),
+                     array('b', [Deposito.codigo, Saque.codigo, Deposito.codigo]), array('q', [100, 900_000, 100]))
+        executar_transferencias([(origem, destino, 1_000), (origem, destino, 10**9)])
+    finally:
+        desativar_metricas()
+
+    texto = metricas.exportar()
+    assert 'banco_transacoes_total{tipo="Saque",resultado="SaldoInsuficienteError"} 8' in texto
+    assert 'banco_registrar_segundos_count{tipo="Saque"} 2' in texto
+    assert 'banco_transacoes_total{tipo="Deposito",resultado="ok"} 2' in texto
+    assert 'banco_transacoes_total{tipo="Deposito",resultado="ContaInexistente"} 1' in texto
+    assert 'banco_transacoes_total{tipo="Transferencia",resultado="ok"} 1' in texto
+    assert 'banco_transacoes_total{tipo="Transferencia",resultado="SaldoInsuficienteError"} 1' in texto
+
+def test_saidas_de_eventos(capsys, conta_exemplo):
+    from banco import SaidaEmLote, SaidaNula, definir_saida
+    conta_exemplo.depositar(100.0)
+    assert capsys.readouterr().out == "Depósito de R$ 100.00 realizado com sucesso!\n"
+
+    lotes = []
+    saida = SaidaEmLote(lotes.append, capacidade=2)
+    anterior = definir_saida(saida)
+    try:
+        conta_exemplo.depositar(10.0)
+        assert lotes == [] and len(saida) == 1
+        conta_exemplo.sacar(5.0)
+        assert [[(numero, type(t), t.valor_centavos) for numero, t in lote] for lote in lotes] == [
+            [(conta_exemplo.numero, Deposito, 1_000), (conta_exemplo.numero, Saque, 500)]]
+        conta_exemplo.depositar(1.0)
+        saida.descarregar()
+        assert len(lotes) == 2 and len(saida) == 0
+
+        definir_saida(SaidaNula())
+        conta_exemplo.depositar(1.0)
+        assert len(lotes) == 2
+    finally:
+        definir_saida(anterior)
+    assert capsys.readouterr().out == ""
+
+def test_tentar_registrar_devolve_codigos_sem_excecao(capsys, conta_exemplo, relogio_manual):
+    from banco import (ACEITA, LIMITE_SAQUE_EXCEDIDO, LIMITE_SAQUES_DIARIOS_ATINGIDO, SALDO_INSUFICIENTE,
+                       VALOR_INVALIDO, Transferencia)
+    conta_exemplo.depositar(1_000.0)
+    assert conta_exemplo.tentar_sacar_centavos(200_000) == SALDO_INSUFICIENTE
+    assert conta_exemplo.tentar_sacar_centavos(60_000) == LIMITE_SAQUE_EXCEDIDO
+    assert conta_exemplo.tentar_depositar_centavos(0) == VALOR_INVALIDO
+    assert conta_exemplo.tentar_transferir_centavos(conta_exemplo, 100) == VALOR_INVALIDO
+    assert [conta_exemplo.tentar_sacar_centavos(100) for _ in range(4)] == [ACEITA] * 3 + [
+        LIMITE_SAQUES_DIARIOS_ATINGIDO]
+    assert (conta_exemplo.saldo_centavos, len(conta_exemplo.historico)) == (99_700, 4)
+
+    saque = Saque.de_centavos(100)
+    assert saque.verificar(conta_exemplo) == LIMITE_SAQUES_DIARIOS_ATINGIDO
+    erro = saque.erro(LIMITE_SAQUES_DIARIOS_ATINGIDO)
+    assert isinstance(erro, LimiteSaquesDiariosError) and "Tente novamente em" in str(erro)
+    with pytest.raises(LimiteSaquesDiariosError, match="Tente novamente em"):
+        saque.registrar(conta_exemplo)
+    with pytest.raises(ValorInvalidoError, match="diferente da conta de origem"):
+        Transferencia.de_centavos(100, contraparte=conta_exemplo).registrar(conta_exemplo)
+    assert conta_exemplo.verificar_consistencia()
+
+def test_limitador_movel_janela_exata_e_memoria_limitada():
+    from banco.limitador import EXCEDE_EVENTOS, EXCEDE_VALOR, LIVRE, LimitadorMovel
+    limitador = LimitadorMovel(max_eventos=2, max_valor=1_000, janela=100)
+    assert limitador.tentar('a', 0, 400) == LIVRE and limitador.tentar('a', 10, 500) == LIVRE
+    assert limitador.tentar('a', 20, 1) == EXCEDE_EVENTOS and limitador.liberado_em('a', 20) == 100
+    assert limitador.uso('a', 99) == (2, 900) and limitador.uso('a', 100) == (1, 500)
+    assert limitador.verificar('a', 100, 600) == EXCEDE_VALOR and limitador.liberado_em('a', 100, 600) == 110
+    assert limitador.liberado_em('a', 100, 2_000) is None
+    for instante in range(100, 100_000, 7):
+        limitador.tentar('a', instante, 1)
+    assert len(limitador._estados['a']) <= 2 + 3 * 2
+    assert limitador.compactar(10**9) == 1 and len(limitador) == 0
+
+    so_valor = LimitadorMovel(max_valor=100, janela=60, resolucao=10)
+    for instante in range(50):
+        so_valor.registrar('b', instante, 1)
+    assert len(so_valor._estados['b']) == 2 + 3 * 5 and so_valor.uso('b', 59) == (50, 50)
+    assert so_valor.uso('b', 69) == (40, 40)
+
+def test_limites_conta_dia_civil_e_janela_movel(capsys, conta_exemplo, relogio_manual):
+    from banco import LimitadorDiario, LimitadorMovel, LimitesConta, LimiteValorTransacoesError, definir_limites
+    conta_exemplo.depositar(1_000.0)
+    anteriores = definir_limites(LimitesConta(saques=LimitadorDiario(max_valor=30_000)))
+    try:
+        conta_exemplo.sacar(200.0)
+        with pytest.raises(LimiteValorTransacoesError, match=r"total sacado excederia o limite de R\$ 300.00 por dia"):
+            conta_exemplo.sacar(200.0)
+        relogio_manual.avancar(hours=1)
+        conta_exemplo.sacar(200.0)
+
+        definir_limites(LimitesConta(transacoes=LimitadorMovel(max_eventos=2)))
+        conta_exemplo.depositar(1.0)
+        conta_exemplo.depositar(1.0)
+        relogio_manual.avancar(hours=23)
+        with pytest.raises(LimiteTransacoesDiariasError):
+            conta_exemplo.depositar(1.0)
+        relogio_manual.avancar(hours=1)
+        conta_exemplo.depositar(1.0)
+    finally:
+        definir_limites(anteriores)
+    assert conta_exemplo.saldo_centavos == 100_000 - 40_000 + 300
+    assert conta_exemplo.verificar_consistencia()
+
+def test_limites_conta_cobram_transferencias_e_recusam_deposito_pelo_valor(capsys, usuario_exemplo, relogio_manual):
+    from banco import (LIMITE_SAQUES_DIARIOS_ATINGIDO, LimitadorDiario, LimitesConta, LimiteValorTransacoesError,
+                       Transferencia, definir_limites)
+    from banco.lote import executar_transferencias
+    origem, destino = Conta(cliente=usuario_exemplo, numero=1), Conta(cliente=usuario_exemplo, numero=2)
+    origem.depositar(1_000.0)
+    anteriores = definir_limites(LimitesConta(saques=LimitadorDiario(max_eventos=2),
+                                              transacoes=LimitadorDiario(max_valor=50_000)))
+    try:
+        # Transferência e saque dividem o limitador de saques: é débito nos dois casos.
+        Transferencia(10.0, destino).registrar(origem)
+        origem.sacar(10.0)
+        with pytest.raises(LimiteSaquesDiariosError, match="Tente novamente em 01:00:00"):
+            Transferencia(10.0, destino).registrar(origem)
+        assert list(executar_transferencias([(origem, destino, 1_000)])) == [LIMITE_SAQUES_DIARIOS_ATINGIDO]
+        # A recusa pelo valor movimentado não fala em saque num depósito.
+        with pytest.raises(LimiteValorTransacoesError, match="valor movimentado excederia o limite de R\\$ 500.00"):
+            destino.depositar(491.0)
+        destino.depositar(480.0)
+    finally:
+        definir_limites(anteriores)
+    assert origem.saldo_centavos == 100_000 - 2_000 and destino.saldo_centavos == 1_000 + 48_000
+
+def test_limite_de_valor_sacado_no_periodo_nao_fala_do_limite_por_saque(capsys, usuario_exemplo, relogio_manual):
+    from banco import (LIMITE_VALOR_TRANSACOES_EXCEDIDO, LimitadorDiario, LimitadorMovel, LimitesConta,
+                       LimiteValorTransacoesError, definir_limites)
+    from banco.lote import aplicar_lote
+    registro = Registro()
+    registro.adicionar_usuario(usuario_exemplo)
+    conta = registro.criar_conta(usuario_exemplo)
+    conta.depositar(1_000.0)
+    anteriores = definir_limites(LimitesConta(saques=LimitadorDiario(max_valor=40_000)))
+    try:
+        conta.sacar(300.0)
+        with pytest.raises(LimiteValorTransacoesError) as erro:
+            conta.sacar(200.0)
+        assert str(erro.value) == "O total sacado excederia o limite de R$ 400.00 por dia."
+        assert list(aplicar_lote(registro, [1, 1], [Saque.codigo, Saque.codigo], [20_000, 10_000])) == [
+            LIMITE_VALOR_TRANSACOES_EXCEDIDO, 0]
+        definir_limites(LimitesConta(saques=LimitadorMovel(max_valor=10_000, janela=6 * 3_600_000_000)))
+        with pytest.raises(LimiteValorTransacoesError, match="limite de R\\$ 100.00 nas últimas 6 h"):
+            conta.sacar(150.0)
+    finally:
+        definir_limites(anteriores)
+    assert conta.saldo_centavos == 100_000 - 40_000
+
+def test_carga_em_massa_valida_deduplica_e_relata_erros(tmp_path):
+    import json
+    from banco.carga import carregar
+    linhas = [
+        "cpf,nome,data_nascimento,endereco,conta,agencia",
+        "529.982.247-25,Ana,17/05/1990,Rua A,1,0002",
+        "52998224725,Ana de Novo,17/05/1990,Rua A,2,",
+        "52998224725,Ana Outra Vez,17/05/1990,Rua A,,",
+        "52998224724,Dígito Errado,01/01/1990,Rua B,,",
+        "11111111111,Repetido,01/01/1990,Rua C,,",
+        "11144477735,Data Ruim,29/02/2023,Rua D,3,",
+        "11144477735,Bruno,29/02/2024,Rua D,1,",
+        "11144477735,Bruno,29/02/2024,Rua D,x,",
+        "11144477735,Bruno,29/02/2024,Rua D,4,",
+    ]
+    caminho = tmp_path / 'clientes.csv'
+    caminho.write_text('\n'.join(linhas) + '\n', encoding='utf-8')
+    registro = Registro()
+    recusadas = []
+    with open(caminho, newline='', encoding='utf-8') as arquivo:
+        resultado = carregar(registro, arquivo, tamanho_lote=4,
+                             ao_rejeitar=lambda linha, motivo: recusadas.append((linha, motivo)))
+    assert (resultado.linhas, resultado.clientes, resultado.contas, resultado.rejeitadas) == (9, 2, 3, 6)
+    assert resultado.erros == recusadas == [
+        (4, "CPF duplicado."), (5, "CPF inválido."), (6, "CPF inválido."), (7, "Data de nascimento inválida."),
+        (8, "Conta 1 já existe."), (9, "Número de conta inválido.")]
+    ana, bruno = registro.buscar_usuario('52998224725'), registro.buscar_usuario('11144477735')
+    assert ana.nome == 'Ana' and ana.data_nascimento.isoformat() == '1990-05-17'
+    assert [(c.numero, c.agencia) for c in ana.contas] == [(1, '0002'), (2, '0001')]
+    assert [c.numero for c in bruno.contas] == [4]
+
+    jsonl = tmp_path / 'clientes.jsonl'
+    jsonl.write_text(json.dumps({'cpf': '39053344705', 'nome': 'Caio', 'data_nascimento': '01/01/2000',
+                                 'endereco': 'Rua E', 'conta': 7, 'agencia': None}) + '\nnao e json\n')
+    with open(jsonl, encoding='utf-8') as arquivo:
+        resultado = carregar(registro, arquivo, 'jsonl')
+    assert (resultado.clientes, resultado.contas, resultado.erros) == (1, 1, [(2, "Linha mal formada.")])
+    assert registro.buscar_conta(7).cliente.nome == 'Caio'
+
+def test_carga_recusa_agencia_invalida_e_usa_o_relogio_do_banco(tmp_path, relogio_manual):
+    from banco import AlocadorNumeros
+    from banco.carga import carregar
+    linhas = [
+        "cpf,nome,data_nascimento,endereco,conta,agencia",
+        "52998224725,Ana,17/05/1990,Rua A,1,12",
+        "52998224725,Ana,17/05/1990,Rua A,2,ABCD",
+        "52998224725,Ana,17/05/1990,Rua A,3,0009",
+        "52998224725,Ana,17/05/1990,Rua A,4, 0002 ",
+        "11144477735,Bruno,18/05/2024,Rua B,5,",
+        "11144477735,Bruno,17/05/2024,Rua B,6,",
+    ]
+    caminho = tmp_path / 'clientes.csv'
+    caminho.write_text('\n'.join(linhas) + '\n', encoding='utf-8')
+    registro = Registro(alocador=AlocadorNumeros(agencias=('0001', '0002')))
+    with open(caminho, newline='', encoding='utf-8') as arquivo:
+        resultado = carregar(registro, arquivo)
+    # A linha recusada pela agência não deixa cliente nem conta para trás.
+    assert resultado.erros == [(2, "Agência inválida."), (3, "Agência inválida."),
+                               (4, "Agência 0009 não cadastrada."), (6, "Data de nascimento inválida.")]
+    assert [(c.numero, c.agencia) for c in registro.buscar_usuario('52998224725').contas] == [(4, '0002')]
+    assert [(c.numero, c.agencia) for c in registro.buscar_usuario('11144477735').contas] == [(6, '0001')]
+
+def test_carga_direto_no_diario_recupera_o_mesmo_registro(tmp_path):
+    from banco.carga import carregar, carregar_no_diario, main
+    from banco.diario import Diario, recuperar
+    linhas = [
+        "cpf,nome,data_nascimento,endereco,conta,agencia",
+        "529.982.247-25,Ana,17/05/1990,\"Rua A, 1\",1,0002",
+        "52998224725,Ana de Novo,17/05/1990,Rua A,2,",
+        "52998224725,Ana Outra Vez,17/05/1990,Rua A,,",
+        "11144477735,Bruno,29/02/2024,Rua D,1,",
+        "11144477735,Bruno,29/02/2024,Rua D,4,",
+        "39053344705,Caio,01/01/2000,Rua E,,",
+    ]
+    caminho = tmp_path / 'clientes.csv'
+    caminho.write_text('\n'.join(linhas) + '\n', encoding='utf-8')
+    registro = Registro()
+    with open(caminho, newline='', encoding='utf-8') as arquivo:
+        em_memoria = carregar(registro, arquivo, tamanho_lote=2)
+    with Diario(str(tmp_path / 'carga.diario'), 'nunca') as diario, \
+            open(caminho, newline='', encoding='utf-8') as arquivo:
+        no_diario = carregar_no_diario(diario, arquivo, tamanho_lote=2)
+    assert (no_diario.linhas, no_diario.clientes, no_diario.contas) == (6, 3, 3)
+    assert no_diario.erros == em_memoria.erros == [(4, "CPF duplicado."), (5, "Conta 1 já existe.")]
+
+    recuperado = recuperar(str(tmp_path / 'carga.diario'))
+    for cpf in ('52998224725', '11144477735', '39053344705'):
+        original, lido = registro.buscar_usuario(cpf), recuperado.buscar_usuario(cpf)
+        assert (lido.nome, lido.data_nascimento, lido.endereco) == (original.nome, original.data_nascimento,
+                                                                    original.endereco)
+        assert [(c.numero, c.agencia) for c in lido.contas] == [(c.numero, c.agencia) for c in original.contas]
+
+    # A linha de comando grava pelo mesmo caminho; sem --diario, só valida.
+    main([str(caminho), '--diario', str(tmp_path / 'cli.diario')])
+    # Mesmos registros; a ordem entre clientes e contas acompanha os lotes.
+    assert (sorted((tmp_path / 'cli.diario').read_bytes().splitlines())
+            == sorted((tmp_path / 'carga.diario').read_bytes().splitlines()))
+    main([str(caminho)])
+
+def test_cache_de_extrato_igual_ao_sem_cache_e_respeita_orcamento(capsys, historico_de_maio):
+    from banco import CacheExtrato, ativar_cache_extrato, desativar_cache_extrato
+    consultas = [{}, {'tamanho': 5}, {'cursor': 55, 'tamanho': 5}, {'tipo': Saque, 'cursor': 40},
+                 {'inicio': datetime(2024, 5, 31, tzinfo=fuso_horario)}]
+
+    def listar():
+        saidas = []
+        for consulta in consultas:
+            historico_de_maio.listar_transacoes(**consulta)
+            saidas.append(capsys.readouterr().out)
+        return saidas
+
+    esperado = listar()
+    cache = ativar_cache_extrato(CacheExtrato(max_linhas=20))
+    try:
+        assert listar() == esperado
+        assert cache.formatadas < 2 * len(historico_de_maio)
+        historico_de_maio.adicionar_transacao(Deposito(1.0, datetime(2024, 6, 1, tzinfo=fuso_horario)))
+        antes = cache.formatadas
+        historico_de_maio.listar_transacoes(cursor=len(historico_de_maio) - 3)
+        assert cache.formatadas == antes + 1
+        assert capsys.readouterr().out.endswith("2024-06-01 00:00:00 - Deposito: R$ 1.00\n")
+        estatisticas = cache.estatisticas()
+        assert estatisticas['historicos'] == 1 and 0 < estatisticas['taxa_acerto'] < 1
+        assert estatisticas['linhas'] <= 20 + 20 // 4
+
+        # Orçamento para um histórico só: consultar outro despeja o menos recente.
+        cache.orcamento = estatisticas['bytes']
+        outro = Historico()
+        outro.adicionar_transacao(Deposito(5.0, datetime(2024, 5, 1, tzinfo=fuso_horario)))
+        outro.listar_transacoes()
+        assert capsys.readouterr().out == "2024-05-01 00:00:00 - Deposito: R$ 5.00\n"
+        assert len(cache) == 1 and cache.despejos == 1 and cache.estatisticas()['bytes'] <= cache.orcamento
+    finally:
+        desativar_cache_extrato()
+
+def test_cache_de_extrato_nao_le_o_historico_sob_a_trava():
+    import threading
+    from banco import CacheExtrato
+
+    class HistoricoLento(Historico):
+        # Como um histórico em banco: buscar as linhas espera (aqui, até ser liberado).
+        __slots__ = ('liberar',)
+
+        def _transacoes_nas(self, posicoes):
+            self.liberar.wait(5)
+            return super()._transacoes_nas(posicoes)
+
+    cache = CacheExtrato()
+    lento, rapido = HistoricoLento(), Historico()
+    lento.liberar = threading.Event()
+    for historico in (lento, rapido):
+        historico.adicionar_transacao(Deposito(1.0, datetime(2024, 5, 1, tzinfo=fuso_horario)))
+    resultado = []
+    leitor = threading.Thread(target=lambda: resultado.append(cache.linhas(lento, range(1))))
+    leitor.start()
+    try:
+        # Enquanto o lento espera, outro histórico é servido e o cache aceita esquecer (o que
+        # Historico faz sob a trava da conta): nem fila nem impasse.
+        assert cache.linhas(rapido, range(1)) == ["2024-05-01 00:00:00 - Deposito: R$ 1.00"]
+        cache.esquecer(rapido)
+        assert not resultado
+    finally:
+        lento.liberar.set()
+        leitor.join()
+    assert resultado == [["2024-05-01 00:00:00 - Deposito: R$ 1.00"]] and len(cache) == 1
+
+def test_alocador_de_numeros_em_blocos_sem_repeticao(tmp_path, usuario_exemplo):
+    import threading
+    from banco import AlocadorNumeros, Registro
+    caminho = str(tmp_path / 'numeros')
+    registro = Registro(alocador=AlocadorNumeros(caminho, tamanho_bloco=50))
+    registro.adicionar_usuario(usuario_exemplo)
+    assert registro.criar_conta(usuario_exemplo).numero == 1
+    registro.adicionar_conta(Conta(usuario_exemplo, 2))
+    assert [registro.criar_conta(usuario_exemplo).numero for _ in range(2)] == [3, 4]
+
+    def criar(agencia):
+        for _ in range(120):
+            registro.criar_conta(usuario_exemplo, agencia)
+    threads = [threading.Thread(target=criar, args=(agencia,)) for agencia in ('0001', '0002') * 3]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    numeros = [conta.numero for conta in usuario_exemplo.contas]
+    assert len(numeros) == len(set(numeros)) == 4 + 6 * 120
+    assert {conta.agencia for conta in usuario_exemplo.contas} == {'0001', '0002'}
+    with pytest.raises(ValueError):
+        registro.criar_conta(usuario_exemplo, '1')
+
+    # Reinício: outro alocador no mesmo arquivo começa depois de tudo o que já foi reservado.
+    reiniciado = AlocadorNumeros(caminho, tamanho_bloco=50)
+    assert reiniciado.proximo() > max(numeros)
+    restrito = AlocadorNumeros(agencias=['0001'])
+    with pytest.raises(ValueError):
+        restrito.proximo('0002')
+
+def test_registro_sqlite_persiste_e_consulta_por_indice(capsys, tmp_path, relogio_manual):
+    from banco.repositorio import RegistroSqlite
+    caminho = str(tmp_path / 'banco.db')
+    registro = RegistroSqlite(caminho)
+    usuario = registro.adicionar_usuario(PessoaFisica('12345678901', 'Ana', '01/01/1990', 'Rua A'))
+    origem, destino = registro.criar_conta(usuario), registro.criar_conta(usuario, '0002')
+    origem.depositar(100.0)
+    relogio_manual.avancar(minutes=1)
+    origem.sacar(30.0)
+    origem.transferir(destino, 20.0)
+    registro.fechar()
+    capsys.readouterr()
+
+    registro = RegistroSqlite(caminho)
+    try:
+        with registro.repositorio.pool.conexao() as conexao:
+            plano = ' '.join(linha[-1] for linha in conexao.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM movimentos WHERE conta = 1 AND microssegundos >= 0 "
+                "ORDER BY microssegundos, rowid"))
+        assert 'movimentos_por_conta' in plano and 'TEMP B-TREE' not in plano
+        ana = registro.buscar_usuario('123.456.789-01')
+        assert [(c.numero, c.agencia, c.saldo_centavos) for c in ana.contas] == [(1, '0001', 5_000), (1001, '0002', 2_000)]
+        origem = ana.contas[0]
+        assert (origem.transacoes_realizadas, origem.saques_realizados) == (3, 2)
+        assert registro.criar_conta(ana).numero == 1002
+
+        proximo = origem.mostrar_extrato(tamanho=2)
+        saida = capsys.readouterr().out
+        assert "2024-05-17 23:00:00 - Deposito: R$ 100.00" in saida and "Transferencia" not in saida
+        assert origem.mostrar_extrato(cursor=proximo, tamanho=2) is None
+        assert "2024-05-17 23:01:00 - Transferencia: R$ 20.00" in capsys.readouterr().out
+        origem.depositar(1.0)
+        itens, _ = origem.historico.pagina(tipo=Deposito)
+        assert [t.valor_centavos for t in itens] == [10_000, 100]
+        assert origem.verificar_consistencia() and registro.total_contas == 3
+    finally:
+        registro.fechar()
+
+def test_registro_sqlite_historico_agregados_cache_e_falhas(capsys, tmp_path, relogio_manual):
+    import sqlite3
+    import threading
+    from datetime import date
+    from banco import HistoricoBase, ativar_cache_extrato, desativar_cache_extrato
+    from banco.repositorio import RegistroSqlite
+    caminho = str(tmp_path / 'banco.db')
+    registro = RegistroSqlite(caminho)
+    usuario = registro.adicionar_usuario(PessoaFisica('12345678901', 'Ana', '01/01/1990', 'Rua A'))
+    conta = registro.criar_conta(usuario)
+    conta.depositar(100.0)
+    relogio_manual.avancar(hours=2)
+    conta.sacar(30.0)
+    # Um cadastro repetido falha sozinho; o erro vai para quem o enfileirou e o resto do lote fica.
+    escritor = registro.diario
+    repetido = escritor.registrar_usuario(usuario)
+    depois = escritor.registrar_transacao(conta, Deposito.de_centavos(1))
+    # Esperar a fila não entrega o erro de ninguém: ele é só de quem confirmar a sequência.
+    escritor.sincronizar()
+    with pytest.raises(sqlite3.IntegrityError):
+        escritor.confirmar(repetido)
+    escritor.confirmar(depois)
+    registro.fechar()
+    capsys.readouterr()
+
+    registro = RegistroSqlite(caminho)
+    try:
+        contas = []
+        threads = [threading.Thread(target=lambda: contas.append(registro.buscar_conta(1))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len({id(c) for c in contas}) == 1
+        conta = contas[0]
+        historico = conta.historico
+        assert isinstance(historico, HistoricoBase) and len(historico) == 3
+        conta.depositar(5.0)
+        assert len(historico) == 4 and historico.pagina()[0][-1].valor_centavos == 500
+        assert historico.saldo_em(datetime(2024, 5, 18, 0, 30, tzinfo=fuso_horario)) == 10_000
+        assert historico.saldo_em(datetime(2024, 5, 18, 2, 0, tzinfo=fuso_horario)) == 7_501
+        assert historico.totais_dia(date(2024, 5, 17)) == (10_000, 1, 0, 0)
+        assert historico.totais_dia(date(2024, 5, 18)) == (501, 2, 3_000, 1)
+        assert historico.totais_mes(2024, 5) == (10_501, 3, 3_000, 1)
+
+        capsys.readouterr()
+        sem_cache = [conta.historico.listar_transacoes(tamanho=2), capsys.readouterr().out]
+        cache = ativar_cache_extrato()
+        try:
+            com_cache = [conta.historico.listar_transacoes(tamanho=2), capsys.readouterr().out]
+            conta.historico.listar_transacoes(cursor=com_cache[0])
+            assert "R$ 5.00" in capsys.readouterr().out
+        finally:
+            desativar_cache_extrato()
+        assert com_cache == sem_cache and cache.estatisticas()['linhas'] > 0
+    finally:
+        registro.fechar()